@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ShengHang.settings')
+# 读接口使用异步视图 (见 app/views/asyncDb.py)，流式 JSON 返回异步迭代器 (见 app/views/jsonStream.py，
+# 同步迭代器在 ASGI 下会被整个读进内存)
+os.environ.setdefault('SHENGHANG_ASGI', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.CompressionMiddleware',    # 压缩较大的 JSON 响应 (gzip / brotli)
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,7 +71,27 @@ SESSION_COOKIE_SAMESITE = None  # 允许跨域携带
 SESSION_COOKIE_SECURE = False   # 开发环境 False，生产环境 HTTPS 改为 True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 86400  # 24小时
-SESSION_SAVE_EVERY_REQUEST = True  # 每次请求都更新 session
+SESSION_SAVE_EVERY_REQUEST = True  # 每次请求都更新 session (内容未变时由 session 后端合并写入，见下)
+SESSION_ENGINE = 'app.backends.sessions'  # 两级缓存 session，不再每个请求都写数据库
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_LOCAL_TTL = 5           # 进程内缓存 session 的秒数 (其他进程对 session 的修改最多延迟这么久可见)
+SESSION_WRITE_INTERVAL = 300    # session 内容未变时，最多每隔多少秒写一次共享缓存以顺延过期时间
+
+# 缓存
+# 多台服务器部署时把 sessions 换成共享缓存，如:
+#   {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        # 满了之后按过期时间淘汰 (最久没有活动的 session)，不随机淘汰，见 app/backends/filecache.py
+        'BACKEND': 'app.backends.filecache.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'sessions',
+        'TIMEOUT': SESSION_COOKIE_AGE,
+        'OPTIONS': {'MAX_ENTRIES': 200000},     # 大于 SESSION_COOKIE_AGE 内预计的活跃 session 数
+    },
+}
 
 ROOT_URLCONF = 'ShengHang.urls'
 
@@ -97,7 +119,8 @@ WSGI_APPLICATION = 'ShengHang.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # 带连接池的 MySQL 后端 (app/backends/mysqlpool)，请求结束时连接归还连接池而不是断开
+        'ENGINE': 'app.backends.mysqlpool',
         'HOST': '124.70.86.207',
         'PORT': 3306,
         'USER': 'u23373273',
@@ -106,6 +129,14 @@ DATABASES = {
         'OPTIONS': {
             'charset': 'utf8mb4',
         },
+        'POOL': {
+            'MIN_SIZE': 2,        # 至少保留的空闲连接数
+            'MAX_SIZE': 20,       # 每个进程最多打开的连接数
+            'TIMEOUT': 10,        # 连接都被占用时最多等待多少秒
+            'MAX_IDLE': 300,      # 空闲超过多少秒的连接被关闭
+            'MAX_LIFETIME': 3600, # 连接最长使用多少秒后重建
+            'PING_AFTER': 30,     # 空闲超过多少秒的连接借出前先 ping 一次
+        },
     }
 }
 
@@ -150,3 +181,97 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# 名称搜索索引 (app/views/searchIndex.py)
+SEARCH_INDEX_ENABLED = True         # 关闭后搜索全部使用 SQL LIKE
+SEARCH_INDEX_MAX_AGE = 600          # 索引建好后每隔多少秒整体重建一次 (兜底漏掉的失效通知)
+SEARCH_INDEX_MAX_RESULTS = 5000     # 命中数超过该值时回退到 SQL (IN 列表过长)
+
+# 播放记录延迟写 (app/views/playBuffer.py)
+PLAY_FLUSH_INTERVAL = 2.0   # 最长每隔多少秒批量写一次库
+PLAY_FLUSH_SIZE = 500       # 缓冲的播放记录达到多少条时立即写库
+PLAY_SPILL_DIR = BASE_DIR / 'spill'  # 未写库的播放记录落盘目录，进程崩溃重启后从这里补写
+PLAY_MAX_PENDING = 20000    # 缓冲上限，满了之后记录播放的请求等待写库 (背压)
+PLAY_BLOCK_TIMEOUT = 0.5    # 缓冲满时最多等待多少秒，超时后照常入队 (已落盘，不丢弃)
+
+# 播放防刷窗口 (app/views/recentPlays.py)
+# 配置 Redis 地址 (如 'redis://127.0.0.1:6379/0') 后多个进程共享窗口；
+# 否则使用进程内存储，本进程内没播放过时再查 PlayHistory (其他进程尚未写库的播放查不到)
+RECENT_PLAY_REDIS_URL = None
+RECENT_PLAY_MAX_ENTRIES = 100000  # 进程内存储最多记录多少个 (用户, 歌曲)
+
+# 播放量分片计数 (app/views/playCounter.py)
+PLAY_COUNTER_SLOTS = 16             # 每首歌的分片数
+PLAY_COUNTER_ROLLUP_INTERVAL = 30   # 每隔多少秒把分片汇总进 Song.play_count
+
+# 平台收藏排行榜 (app/views/favoriteLeaderboard.py)
+FAVORITE_LEADERBOARD_SIZE = 200         # 每种类型在内存中保存前多少名
+FAVORITE_LEADERBOARD_RECONCILE = 60     # 每隔多少秒从 Favorite_Count 重新加载一次
+
+# 歌手 / 专辑 / 歌曲详情缓存 (app/views/profileCache.py)
+PROFILE_CACHE_TTL = 300             # 缓存秒数，管理员修改曲库时经失效总线立即失效，TTL 兜底漏掉的失效消息
+PROFILE_CACHE_MAX_ENTRIES = 5000    # 最多缓存多少个详情页
+PROFILE_CACHE_LOAD_TIMEOUT = 10     # 等待其他请求查库的最长秒数，超时后自己查
+
+# 缓存失效总线 (app/views/invalidationBus.py)
+# 配置 Redis 地址后经 Redis pub/sub 通知其他进程，否则同一台机器上的进程通过 CACHE_BUS_DIR 下的日志文件互相通知
+CACHE_BUS_REDIS_URL = None
+CACHE_BUS_DIR = BASE_DIR / 'cache' / 'bus'
+CACHE_BUS_POLL_INTERVAL = 0.5   # 本地 pub/sub 轮询日志文件的间隔 (秒)
+
+# 评论楼 (app/views/commentThread.py)
+COMMENT_THREAD_MAX_DEPTH = 10   # 评论详情最多返回几层回复
+COMMENT_THREAD_MAX_SIZE = 500   # 评论详情最多返回多少条回复
+
+# 评论审核队列 (app/views/moderationQueue.py)
+MODERATION_LEASE_SECONDS = 300  # 管理员领取审核任务的默认租约时长 (秒)
+MODERATION_LEASE_MAX = 3600     # 租约时长上限 (秒)
+MODERATION_BATCH_MAX = 500      # 批量审核一次最多处理的评论数
+MODERATION_COUNT_SLOTS = 16     # 待审核计数 (Moderation_Count) 每个原因的分片数
+
+# 评论列表分页 (app/views/commentFeed.py)
+PROFILE_COMMENT_PAGE_SIZE = 20  # 歌曲 / 专辑 / 歌单详情附带的第一页评论条数
+
+# 评论统计与热门评论 (app/views/commentStats.py)
+COMMENT_HOT_SIZE = 50               # 每个目标在内存中保存的热门评论条数
+COMMENT_HOT_MAX_TARGETS = 10000     # 内存中最多保存多少个目标的热门评论
+COMMENT_HOT_RECONCILE = 60          # 每隔多少秒从数据库重新加载一次 (同步其他进程的修改)
+
+# 点赞去重与延迟写 (app/views/likeBuffer.py)
+LIKE_FLUSH_INTERVAL = 2.0           # 最长每隔多少秒批量写一次库
+LIKE_FLUSH_SIZE = 500               # 缓冲的点赞达到多少条时立即写库
+LIKE_SPILL_DIR = BASE_DIR / 'spill' # 未写库的点赞落盘目录，进程崩溃重启后从这里补写
+LIKE_TRACKER_MAX_USERS = 100000     # 内存中最多缓存多少个 (用户, 类型) 的已点赞集合
+
+# 系统日志异步写入 (app/views/systemLog.py)
+SYSTEM_LOG_FLUSH_INTERVAL = 1.0         # 最长每隔多少秒批量写一次库
+SYSTEM_LOG_FLUSH_SIZE = 200             # 缓冲的日志达到多少条时立即写库
+SYSTEM_LOG_MAX_PENDING = 10000          # 缓冲上限，满了之后记日志的请求等待写库 (背压)
+SYSTEM_LOG_BLOCK_TIMEOUT = 0.5          # 缓冲满时最多等待多少秒，超时后照常入队 (已落盘，不丢弃)
+SYSTEM_LOG_SPILL_DIR = BASE_DIR / 'spill'   # 未写库的日志落盘目录，数据库不可达或进程重启后从这里补写
+
+# 流式 JSON 响应 (app/views/jsonStream.py)
+STREAM_CHUNK_SIZE = 500             # 每次从数据库读取的行数
+STREAM_BUFFER_SIZE = 64 * 1024      # 攒够多少字符发送一次
+# ASGI 下返回异步迭代器 (Django 会把同步迭代器整个读进内存再发送)；asgi.py 启动时设置，WSGI 下必须关闭
+STREAM_ASYNC = os.environ.get('SHENGHANG_ASGI') == '1'
+STREAM_ASYNC_MAX_STREAMS = 8        # ASGI 下同时生成的流式响应数 (每个占一个线程和数据库连接)，多出的排队等待
+
+# JSON 编码与响应压缩 (app/views/fastJson.py, app/middleware.py)
+JSON_BACKEND = 'orjson'             # 'orjson' 或 'stdlib'，未安装 orjson 时自动使用 'stdlib'
+RESPONSE_COMPRESS_MIN_SIZE = 1024   # 大于多少字节的响应才压缩
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 4         # 安装了 brotli 且客户端支持时优先使用
+
+# 异步读接口 (app/views/asyncDb.py)
+# 搜索、详情、评论列表在 ASGI 部署时使用异步视图 + aiomysql 连接池，等待数据库时不占线程
+ASYNC_READ_VIEWS = os.environ.get('SHENGHANG_ASGI') == '1'    # asgi.py 启动时设置；WSGI 下仍用同步视图
+ASYNC_DB_POOL = {
+    'minsize': 1,
+    'maxsize': 50,          # 同时在途的查询数上限
+    'pool_recycle': 3600,
+}
+# 互不依赖的子查询并发执行 (asyncDb.Gather / fan_out / submit)：同步视图把子查询分到查询线程池，每个线程一个连接
+# 线程数 + WSGI 工作线程数不要超过 DATABASES['default']['POOL']['MAX_SIZE']，0 表示不并发 (全部顺序执行)
+QUERY_FANOUT_WORKERS = 8
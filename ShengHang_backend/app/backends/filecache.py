@@ -0,0 +1,40 @@
+# 按过期时间淘汰的文件缓存 (用于 session)
+# Django 自带的 FileBasedCache 条目数达到 MAX_ENTRIES 时随机删除三分之一，存 session 时等于随机登出用户。
+# 这里改为：先删除已过期的条目，仍然超出时删除最早过期的 (session 每次写入都会顺延过期时间，即最久没有活动的用户)，
+# 一次删到 MAX_ENTRIES 的 CULL_TARGET 比例，避免之后每次写入都要淘汰
+#
+# 用法: CACHES['sessions']['BACKEND'] = 'app.backends.filecache.FileBasedCache'
+import pickle
+import time
+from django.core.cache.backends import filebased
+
+
+# 淘汰后保留 MAX_ENTRIES 的多少比例
+CULL_TARGET = 0.9
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    def _cull(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        entries = sorted((self._expiry(fname), fname) for fname in filelist)
+        excess = len(entries) - int(self._max_entries * CULL_TARGET)
+        now = time.time()
+        for i, (expiry, fname) in enumerate(entries):
+            if i >= excess and expiry >= now:
+                break
+            self._delete(fname)
+
+    @staticmethod
+    def _expiry(fname):
+        "条目的过期时间 (文件开头是 pickle 的过期时间戳，None 表示永不过期)；读不出来的视为已过期"
+        try:
+            with open(fname, "rb") as f:
+                expiry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return 0
+        return float("inf") if expiry is None else expiry
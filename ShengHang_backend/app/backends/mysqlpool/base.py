@@ -0,0 +1,45 @@
+# 带连接池的 MySQL 数据库后端
+# 在 Django 自带的 MySQL 后端上，把 "新建连接 / 关闭连接" 换成 "从连接池借出 / 归还连接池"：
+#   - 每个请求结束时 Django 关闭连接 (CONN_MAX_AGE = 0)，实际上是归还给连接池，下个请求直接复用，
+#     不必每次重新建立到远程 MySQL 的 TCP 连接和认证
+#   - 连接池参数写在 DATABASES['default']['POOL'] 中，见 pool.DEFAULT_POOL_OPTIONS
+#
+# 用法: DATABASES['default']['ENGINE'] = 'app.backends.mysqlpool'
+from django.db.backends.mysql import base as mysql_base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        key = (
+            self.alias,
+            conn_params.get("host") or conn_params.get("unix_socket"),
+            conn_params.get("port"),
+            conn_params.get("user"),
+            conn_params.get("database"),
+        )
+        pool = get_pool(
+            key,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self.settings_dict.get("POOL"),
+        )
+        self._pool = pool
+        return pool.checkout()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = getattr(self, "_pool", None)
+        if pool is None:
+            return super()._close()
+
+        # 事务中途关闭或出过错误的连接状态不可靠，直接丢弃，不放回连接池
+        discard = self.in_atomic_block or self.errors_occurred
+        if not discard and not self.get_autocommit():
+            try:
+                self.connection.rollback()
+            except Exception:
+                discard = True
+        with self.wrap_database_errors:
+            pool.checkin(self.connection, discard=discard)
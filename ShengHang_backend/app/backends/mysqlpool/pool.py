@@ -0,0 +1,214 @@
+# 数据库连接池
+# 与具体数据库驱动无关：只要求连接对象有 ping() 和 close() 方法 (MySQLdb 的连接满足)
+#
+# - 上限 MAX_SIZE：连接都被借出时，借用方最多等待 TIMEOUT 秒，超时抛出 PoolTimeout
+# - 健康检查：空闲超过 PING_AFTER 秒的连接借出前先 ping，失败则丢弃换一个新连接
+# - 空闲回收：空闲超过 MAX_IDLE 秒的连接被关闭，但至少保留 MIN_SIZE 个空闲连接
+# - 连接存活超过 MAX_LIFETIME 秒后归还时直接关闭，避免被服务端 wait_timeout 断开
+# - 统计借用等待时间等指标，见 stats()
+import threading
+import time
+from collections import deque
+
+
+DEFAULT_POOL_OPTIONS = {
+    "MIN_SIZE": 1,
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10,
+    "MAX_IDLE": 300,
+    "MAX_LIFETIME": 3600,
+    "PING_AFTER": 30,
+}
+
+# 计算等待时间分位数时保留最近多少次借用
+WAIT_SAMPLE_SIZE = 1000
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, options=None):
+        """
+        :param connect: 无参函数，创建一个新的数据库连接
+        :param options: 见 DEFAULT_POOL_OPTIONS
+        """
+        options = {**DEFAULT_POOL_OPTIONS, **(options or {})}
+        self._connect = connect
+        self.min_size = options["MIN_SIZE"]
+        self.max_size = max(1, options["MAX_SIZE"])
+        self.timeout = options["TIMEOUT"]
+        self.max_idle = options["MAX_IDLE"]
+        self.max_lifetime = options["MAX_LIFETIME"]
+        self.ping_after = options["PING_AFTER"]
+
+        self._cond = threading.Condition()
+        self._idle = deque()        # (连接, 归还时间)，右端是最近归还的
+        self._created_at = {}       # id(连接) -> 创建时间
+        self._size = 0              # 已打开的连接数 (空闲 + 借出)
+
+        # 统计指标
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+
+    # --------------------------
+    # 借出 / 归还
+    # --------------------------
+    def checkout(self):
+        start = time.monotonic()
+        while True:
+            conn, idle_since = self._reserve(start)
+
+            if conn is None:
+                # 拿到了新建连接的名额
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._created_at[id(conn)] = time.monotonic()
+                    self._created += 1
+                break
+
+            if time.monotonic() - idle_since < self.ping_after or self._ping(conn):
+                break
+            # 健康检查失败：丢弃后重新借
+            self._discard(conn)
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._waits.append(wait)
+        return conn
+
+    def checkin(self, conn, discard=False):
+        "归还连接；discard 为 True 或连接已超过最长存活时间时直接关闭"
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._created_at.get(id(conn), now)
+            if not discard and now - created_at < self.max_lifetime:
+                self._idle.append((conn, now))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def _reserve(self, start):
+        "返回 (空闲连接, 空闲起始时间)；返回 (None, None) 表示可以新建一个连接"
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    # 后进先出：优先复用刚归还的连接，长期不用的留在左端等待回收
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"等待数据库连接超时 ({self.timeout} 秒)，连接池已满 ({self.max_size})")
+                self._cond.wait(remaining)
+
+    def _evict_idle(self):
+        "关闭空闲过久的连接 (调用方持有锁)"
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._close_locked(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._close_locked(conn)
+            self._cond.notify()
+
+    def _close_locked(self, conn):
+        self._size -= 1
+        self._discarded += 1
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    # --------------------------
+    # 管理
+    # --------------------------
+    def close_all(self):
+        "关闭所有空闲连接 (借出中的连接归还后照常处理)"
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._close_locked(conn)
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            idle = len(self._idle)
+            return {
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "wait_ms": {
+                    "avg": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0,
+                    "max": round(self._wait_max * 1000, 3),
+                    "p50": round(_percentile(waits, 0.50) * 1000, 3),
+                    "p95": round(_percentile(waits, 0.95) * 1000, 3),
+                    "p99": round(_percentile(waits, 0.99) * 1000, 3),
+                },
+            }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# ================================
+# 进程内的全部连接池
+# ================================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, options=None):
+    "同一个 key (数据库别名 + 连接参数) 共用一个连接池"
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, options)
+        return pool
+
+
+def all_pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {key[0]: pool.stats() for key, pool in pools.items()}
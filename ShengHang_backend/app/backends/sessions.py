@@ -0,0 +1,141 @@
+# 合并写入的缓存 session 后端
+# 原先使用数据库 session 且 SESSION_SAVE_EVERY_REQUEST = True，每个请求 (哪怕只读) 都会 UPDATE django_session。
+# 这里改为两级缓存存储，并且只在必要时写入：
+#   - 一级：进程内缓存 (LocalRedis)，保存 SESSION_LOCAL_TTL 秒；命中时只检查共享缓存中的键是否还在 (has_key，不读内容)，
+#     其他进程注销 / 删除账号时删掉的 session 立即失效
+#   - 二级：共享缓存 caches[SESSION_CACHE_ALIAS]，多个进程 / 重启后共用
+#   - save() 时 session 内容没变、且距上次写入不到 SESSION_WRITE_INTERVAL 秒则跳过写入；
+#     内容变了立即写入，没变时每隔 SESSION_WRITE_INTERVAL 秒写一次，用来顺延过期时间
+#   - 进程内缓存保存序列化后的内容，每次 load() 解码出新的 dict：同一进程的请求之间不共享可变对象，
+#     一个请求里没保存 (或出错中止) 的原地修改不会被其他请求看到
+#
+# 用法: SESSION_ENGINE = 'app.backends.sessions'
+import threading
+import time
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+
+from app.views.localRedis import LocalRedis
+
+
+KEY_PREFIX = "shenghang.session."
+
+_local = LocalRedis(max_entries=getattr(settings, "SESSION_LOCAL_MAX_ENTRIES", 10000))
+
+# 统计指标，见 session_stats()
+_stats_lock = threading.Lock()
+_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "writes": 0, "skipped_writes": 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def session_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_session_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+class SessionStore(CacheSessionStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._persisted = None      # 最近一次读到 / 写入的 session 内容 (序列化后)
+        self._persisted_at = 0      # 该内容写入共享缓存的时间
+
+    @staticmethod
+    def _local_ttl():
+        return getattr(settings, "SESSION_LOCAL_TTL", 5)
+
+    def _serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        key = self.cache_key
+        entry = _local.get(key)
+        if entry is not None and not self._shared_exists(key):
+            # 已在其他进程中删除
+            _local.delete(key)
+            entry = None
+            _count("misses")
+            self._session_key = None
+            return {}
+        if entry is not None:
+            _count("local_hits")
+            serialized = entry["data"]
+        else:
+            try:
+                entry = self._cache.get(key)
+            except Exception:
+                entry = None
+            if entry is None:
+                _count("misses")
+                self._session_key = None
+                return {}
+            _count("shared_hits")
+            serialized = self._serialize(entry["data"])
+            _local.set(key, {"data": serialized, "saved_at": entry["saved_at"]}, ex=self._local_ttl())
+
+        self._persisted = serialized
+        self._persisted_at = entry["saved_at"]
+        return self.serializer().loads(serialized)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        data = self._get_session(no_load=must_create)
+        serialized = self._serialize(data)
+        now = time.time()
+        write_interval = getattr(settings, "SESSION_WRITE_INTERVAL", 300)
+
+        # 内容没变且最近写过：跳过本次写入
+        if (not must_create and serialized == self._persisted
+                and now - self._persisted_at < write_interval):
+            _count("skipped_writes")
+            return
+
+        key = self.cache_key
+        entry = {"data": data, "saved_at": now}
+        if must_create:
+            if not self._cache.add(key, entry, self.get_expiry_age()):
+                raise CreateError
+        else:
+            # 没读到过已有内容时 (如 session 已在别处被删除)，与 Django 的缓存后端一样报 UpdateError
+            if self._persisted is None and self._cache.get(key) is None:
+                raise UpdateError
+            self._cache.set(key, entry, self.get_expiry_age())
+
+        _local.set(key, {"data": serialized, "saved_at": now}, ex=min(self._local_ttl(), self.get_expiry_age()))
+        self._persisted = serialized
+        self._persisted_at = now
+        _count("writes")
+
+    def _shared_exists(self, key):
+        try:
+            return self._cache.has_key(key)
+        except Exception:
+            return False
+
+    def exists(self, session_key):
+        if not session_key:
+            return False
+        return self._shared_exists(self.cache_key_prefix + session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        key = self.cache_key_prefix + session_key
+        _local.delete(key)
+        self._cache.delete(key)
@@ -0,0 +1,134 @@
+# 同步视图 (WSGI) 与异步视图 (ASGI) 的吞吐量对比
+# 直接调用视图函数 (不经过中间件和 HTTP)，同一批请求分别用两种方式执行：
+#   sync  : --threads 个工作线程执行同步视图，相当于 WSGI 服务器的线程数
+#   async : 一个事件循环里同时执行最多 --concurrency 个异步视图 (aiomysql 连接池，见 asyncDb)
+# 读接口的耗时主要花在等待远程 MySQL 上：同步视图同时在途的查询数受线程数限制，异步视图只受连接池大小限制
+# 没有安装 aiomysql 或数据库不是 MySQL 时异步视图退回到线程里执行，对比没有意义 (会给出提示)
+# 详情接口第一次请求之后都命中 profileCache，测的主要是缓存；搜索和评论列表每次都查库
+#
+# 用法:
+#   python manage.py bench_async_views
+#   python manage.py bench_async_views --endpoint search_song --query 晴天 --requests 2000 --threads 8 --concurrency 200
+#   python manage.py bench_async_views --endpoint get_comments_by_target --target-type song --target-id 1
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.client import RequestFactory
+
+from app.views import comment, favoriteAndSonglist, music
+from app.views.asyncDb import async_db_available, close_pool
+
+
+# 搜索接口 -> (视图, 关键字参数名)
+SEARCH_ENDPOINTS = {
+    "search_song": (music.search_song, "song_title"),
+    "search_singer": (music.search_singer, "singer_name"),
+    "search_album": (music.search_album, "album_title"),
+    "search_songlist": (favoriteAndSonglist.search_songlist, "songlist_title"),
+}
+PROFILE_ENDPOINTS = {
+    "song_profile": music.song_profile,
+    "album_profile": music.album_profile,
+    "singer_profile": music.singer_profile,
+}
+ENDPOINTS = [*SEARCH_ENDPOINTS, *PROFILE_ENDPOINTS, "get_comments_by_target"]
+
+
+class Command(BaseCommand):
+    help = "对比读接口同步视图 (线程) 与异步视图 (事件循环 + aiomysql) 的吞吐量和延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=ENDPOINTS, default="search_song")
+        parser.add_argument("--requests", type=int, default=500, help="每种方式的请求数 (默认 500)")
+        parser.add_argument("--threads", type=int, default=8, help="同步视图的工作线程数 (默认 8)")
+        parser.add_argument("--concurrency", type=int, default=100, help="异步视图同时在途的请求数 (默认 100)")
+        parser.add_argument("--query", default="", help="搜索关键字")
+        parser.add_argument("--target-type", default="song", help="评论列表的目标类型")
+        parser.add_argument("--target-id", type=int, default=1, help="详情 / 评论列表的对象 id")
+        parser.add_argument("--user-id", type=int, default=1, help="模拟登录的用户 id")
+        parser.add_argument("--mode", choices=["both", "sync", "async"], default="both")
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        if total < 1 or options["threads"] < 1 or options["concurrency"] < 1:
+            raise CommandError("请求数、线程数和并发数必须为正整数")
+        if not async_db_available():
+            self.stdout.write("未安装 aiomysql 或数据库不是 MySQL，异步视图会退回到线程执行")
+
+        view, make_request = self._endpoint(options)
+        self.stdout.write(f"{'mode':<6} {'workers':>7} {'requests':>8} {'errors':>6} {'req/s':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8}")
+        if options["mode"] in ("both", "sync"):
+            self._report("sync", options["threads"], *self._run_sync(view, make_request, total, options["threads"]))
+        if options["mode"] in ("both", "async"):
+            self._report("async", options["concurrency"],
+                         *asyncio.run(self._run_async(view.async_view, make_request, total, options["concurrency"])))
+
+    def _endpoint(self, options):
+        "返回 (视图, 生成请求的函数)"
+        factory = RequestFactory()
+        name = options["endpoint"]
+
+        def login(request):
+            request.session = {"user_id": options["user_id"]}
+            return request
+
+        if name in SEARCH_ENDPOINTS:
+            view, key = SEARCH_ENDPOINTS[name]
+            body = json.dumps({key: options["query"], "page_size": 20})
+            return view, lambda: (login(factory.post("/", body, content_type="application/json")), ())
+        if name in PROFILE_ENDPOINTS:
+            return PROFILE_ENDPOINTS[name], lambda: (login(factory.get("/")), (options["target_id"],))
+        params = {"target_type": options["target_type"], "target_id": options["target_id"], "sort_by": "time"}
+        return comment.get_comments_by_target, lambda: (login(factory.get("/", params)), ())
+
+    def _run_sync(self, view, make_request, total, threads):
+        "返回 (耗时秒数, 每个请求的延迟, 出错数)"
+        requests = [make_request() for _ in range(total)]
+
+        def handle(item):
+            request, args = item
+            start = time.perf_counter()
+            try:
+                status = view(request, *args).status_code
+            finally:
+                # 与请求结束时一样关闭 (归还) 数据库连接
+                connection.close()
+            return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(handle, requests))
+        elapsed = time.perf_counter() - start
+        return elapsed, [latency for latency, _ in results], sum(status >= 400 for _, status in results)
+
+    async def _run_async(self, view, make_request, total, concurrency):
+        requests = [make_request() for _ in range(total)]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def handle(item):
+            request, args = item
+            async with semaphore:
+                start = time.perf_counter()
+                status = (await view(request, *args)).status_code
+                return time.perf_counter() - start, status
+
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(handle(item) for item in requests))
+            elapsed = time.perf_counter() - start
+        finally:
+            await close_pool()
+        return elapsed, [latency for latency, _ in results], sum(status >= 400 for _, status in results)
+
+    def _report(self, mode, workers, elapsed, latencies, errors):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{mode:<6} {workers:>7} {len(latencies):>8} {errors:>6} {len(latencies) / elapsed:>8.1f} "
+            f"{statistics.median(latencies) * 1000:>8.2f} {p95 * 1000:>8.2f}"
+        )
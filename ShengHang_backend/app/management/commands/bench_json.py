@@ -0,0 +1,153 @@
+# JSON 编码与压缩对比
+# 按 search_song 和 songlist_profile 的返回格式生成数据，另加一份 dictfetchall 原样返回的行
+# (带 datetime / Decimal，如播放记录)，对比：
+#   - 各编码器 (fastJson.BACKENDS) 每次编码的耗时和输出大小
+#   - 压缩 (gzip / brotli) 后的大小和耗时
+# 数据在内存中生成，不访问数据库
+#
+# 用法:
+#   python manage.py bench_json
+#   python manage.py bench_json --rows 500 --iterations 200
+import datetime
+import gzip
+import random
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.views.fastJson import BACKENDS, orjson
+from app.views.tools import format_time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _singers(rng):
+    return [{"singer_id": rng.randint(1, 5000), "singer_name": rng.choice(["周杰伦", "林俊杰", "陈奕迅", "Taylor Swift"])}
+            for _ in range(rng.choice([1, 1, 1, 2]))]
+
+
+def search_song_payload(rng, rows):
+    songs = []
+    for i in range(rows):
+        duration = rng.randint(120, 360)
+        songs.append({
+            "song_id": i + 1,
+            "song_title": f"晴天 {i}",
+            "duration": duration,
+            "duration_formatted": format_time(duration),
+            "play_count": rng.randint(0, 10 ** 7),
+            "album_title": f"叶惠美 {i % 50}",
+            "singers": _singers(rng),
+        })
+    return {"total": len(songs), "songs": songs, "next_cursor": "eyJvIjoicGxheV9jb3VudDpERVNDIiwiayI6WzEsMl19",
+            "has_more": True}
+
+
+def songlist_profile_payload(rng, rows):
+    songs = []
+    for i in range(rows):
+        duration = rng.randint(120, 360)
+        singers = _singers(rng)
+        songs.append({
+            "song_id": i + 1,
+            "song_title": f"七里香 {i}",
+            "duration": duration,
+            "duration_formatted": format_time(duration),
+            "album_title": f"七里香 {i % 50}",
+            "singer_id": singers[0]["singer_id"],
+            "singer_name": ", ".join(sg["singer_name"] for sg in singers),
+            "singers": singers,
+        })
+    total = sum(song["duration"] for song in songs)
+    return {
+        "songlist_id": 1, "songlist_title": "夏日歌单", "description": "适合夏天听的歌" * 5,
+        "create_time": "2024-07-01 12:00", "cover_url": "/media/cover/1.jpg", "like_count": 1024,
+        "is_public": True, "is_owner": False, "owner_id": 7, "song_count": len(songs),
+        "total_duration": total, "total_duration_formatted": format_time(total), "songs": songs,
+        "comment_count": 0, "comments": [], "comments_next_cursor": None,
+    }
+
+
+def raw_rows_payload(rng, rows):
+    "dictfetchall 原样返回的行：datetime 和 SUM() 得到的 Decimal 交给编码器处理"
+    start = datetime.datetime(2024, 1, 1, 8, 0)
+    history = [{
+        "play_id": i + 1,
+        "play_time": start + datetime.timedelta(minutes=i * 7),
+        "play_duration": Decimal(rng.randint(0, 360)),
+        "song_id": rng.randint(1, 10 ** 5),
+        "song_title": f"稻香 {i}",
+        "file_url": f"/media/song/{i}.mp3",
+        "album_title": "魔杰座",
+        "cover_url": None,
+    } for i in range(rows)]
+    return {"history": history, "count": len(history)}
+
+
+PAYLOADS = {
+    "search_song": search_song_payload,
+    "songlist_profile": songlist_profile_payload,
+    "raw_rows": raw_rows_payload,
+}
+
+
+class Command(BaseCommand):
+    help = "对比 JSON 编码器的耗时与输出大小，以及压缩效果"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="每份数据的歌曲 / 记录条数 (默认 100)")
+        parser.add_argument("--iterations", type=int, default=500, help="每项重复次数 (默认 500)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        iterations = options["iterations"]
+        if rows < 1 or iterations < 1:
+            raise CommandError("条数和重复次数必须为正整数")
+
+        backends = [name for name in BACKENDS if name != "orjson" or orjson is not None]
+        if orjson is None:
+            self.stdout.write("未安装 orjson，只测试 stdlib")
+
+        self.stdout.write(f"{'payload':<17} {'backend':<7} {'bytes':>9} {'us/encode':>10} {'speedup':>8}")
+        encoded = {}
+        for payload_name, build in PAYLOADS.items():
+            payload = build(random.Random(options["seed"]), rows)
+            baseline = None
+            for backend in backends:
+                dumps = BACKENDS[backend]
+                data, elapsed = self._time(lambda: dumps(payload), iterations)
+                baseline = baseline or elapsed
+                encoded[payload_name] = data
+                self.stdout.write(
+                    f"{payload_name:<17} {backend:<7} {len(data):>9} {elapsed * 1e6:>10.1f} "
+                    f"{baseline / elapsed:>7.2f}x"
+                )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'payload':<17} {'encoding':<8} {'bytes':>9} {'ratio':>7} {'us/compress':>12}")
+        compressors = {
+            "gzip": lambda data: gzip.compress(data, compresslevel=getattr(settings, "RESPONSE_GZIP_LEVEL", 6)),
+        }
+        if brotli is not None:
+            compressors["br"] = lambda data: brotli.compress(
+                data, quality=getattr(settings, "RESPONSE_BROTLI_QUALITY", 4))
+        for payload_name, data in encoded.items():
+            for encoding, compress in compressors.items():
+                compressed, elapsed = self._time(lambda: compress(data), max(1, iterations // 10))
+                self.stdout.write(
+                    f"{payload_name:<17} {encoding:<8} {len(compressed):>9} "
+                    f"{len(compressed) / len(data):>7.2f} {elapsed * 1e6:>12.1f}"
+                )
+
+    def _time(self, func, iterations):
+        "返回 (结果, 平均每次耗时秒数)"
+        result = func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return result, (time.perf_counter() - start) / iterations
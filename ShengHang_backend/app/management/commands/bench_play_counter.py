@@ -0,0 +1,103 @@
+# 播放量计数写入压测
+# 多个线程 (各自一个数据库连接) 同时给同一首歌累加播放量，对比两种写法的吞吐量随并发数的变化：
+#   direct  : UPDATE Song SET play_count = play_count + 1 (所有写入争抢同一行锁)
+#   sharded : 写入 Song_Play_Counter 的随机分片 (见 app/views/playCounter.py)
+#
+# 压测结束后会把本次压测加上的播放量从 Song.play_count 中减掉，但请不要在生产库上执行
+#
+# 用法:
+#   python manage.py bench_play_counter --song-id 1
+#   python manage.py bench_play_counter --song-id 1 --writers 1,4,16 --increments 500 --mode sharded
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app.views.playCounter import add_play_counts, rollup_play_counts
+
+
+class Command(BaseCommand):
+    help = "压测同一首歌并发累加播放量时，直接更新 Song 与分片计数两种写法的吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--song-id", type=int, required=True, help="压测使用的歌曲ID")
+        parser.add_argument("--writers", default="1,2,4,8,16", help="并发写入线程数，逗号分隔 (默认 1,2,4,8,16)")
+        parser.add_argument("--increments", type=int, default=200, help="每个线程累加的次数 (默认 200)")
+        parser.add_argument("--mode", choices=["both", "direct", "sharded"], default="both")
+
+    def handle(self, *args, **options):
+        song_id = options["song_id"]
+        increments = options["increments"]
+        try:
+            writer_counts = [int(n) for n in options["writers"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--writers 格式错误，应为逗号分隔的整数")
+        if not writer_counts or min(writer_counts) < 1 or increments < 1:
+            raise CommandError("线程数和累加次数必须为正整数")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM Song WHERE song_id = %s", [song_id])
+            if cursor.fetchone() is None:
+                raise CommandError(f"歌曲 {song_id} 不存在")
+
+        modes = ["direct", "sharded"] if options["mode"] == "both" else [options["mode"]]
+
+        self.stdout.write(f"{'mode':<8} {'writers':>7} {'ops':>8} {'seconds':>8} {'ops/s':>10} {'scale':>6}")
+        for mode in modes:
+            baseline = None
+            for writers in writer_counts:
+                elapsed, errors = self._run(mode, song_id, writers, increments)
+                ops = writers * increments - errors
+                throughput = ops / elapsed if elapsed > 0 else 0
+                baseline = baseline or throughput
+                scale = throughput / baseline if baseline else 0
+                self.stdout.write(
+                    f"{mode:<8} {writers:>7} {ops:>8} {elapsed:>8.2f} {throughput:>10.1f} {scale:>5.2f}x"
+                )
+                if errors:
+                    self.stdout.write(self.style.WARNING(f"    {errors} 次写入失败"))
+                self._restore(song_id, ops)
+
+    def _run(self, mode, song_id, writers, increments):
+        "返回 (耗时秒数, 失败次数)"
+        barrier = threading.Barrier(writers + 1, timeout=60)
+        errors = []
+
+        def worker():
+            failed = 0
+            try:
+                with connection.cursor() as cursor:
+                    barrier.wait()
+                    for _ in range(increments):
+                        try:
+                            if mode == "direct":
+                                cursor.execute(
+                                    "UPDATE Song SET play_count = play_count + 1 WHERE song_id = %s",
+                                    [song_id],
+                                )
+                            else:
+                                add_play_counts(cursor, {song_id: 1})
+                        except Exception:
+                            failed += 1
+            finally:
+                errors.append(failed)
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, sum(errors)
+
+    @staticmethod
+    def _restore(song_id, ops):
+        "把压测加上的播放量减掉 (分片计数先汇总进 Song.play_count)"
+        rollup_play_counts()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE Song SET play_count = GREATEST(play_count - %s, 0) WHERE song_id = %s",
+                [ops, song_id],
+            )
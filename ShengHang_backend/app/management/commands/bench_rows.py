@@ -0,0 +1,112 @@
+# 行适配器对比
+# 按播放记录 (get_my_play_history) 的列生成 --rows 行数据，模拟游标 fetchall 的返回，对比：
+#   dict    : tools.dictfetchall (原来的做法)
+#   slots   : rowAdapter.fetch_rows (__slots__ 行对象)
+#   columns : rowAdapter.fetch_columns (按列)
+#   table   : rowAdapter.fetch_table (列名 + 原始元组)
+# 每种方式统计：转换后结果占用的内存块数 / 字节数 (tracemalloc，按每 1 万行折算)、转换 + 编码 (fastJson) 的峰值内存和耗时
+# 数据在内存中生成，不访问数据库
+#
+# 用法:
+#   python manage.py bench_rows
+#   python manage.py bench_rows --rows 100000 --iterations 5
+import datetime
+import gc
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+
+from app.views.fastJson import dumps, get_backend
+from app.views.rowAdapter import fetch_columns, fetch_rows, fetch_table
+from app.views.tools import dictfetchall
+
+
+COLUMNS = ("play_id", "play_time", "play_duration", "song_id", "song_title", "file_url", "album_title", "cover_url")
+
+ADAPTERS = {
+    "dict": dictfetchall,
+    "slots": fetch_rows,
+    "columns": fetch_columns,
+    "table": fetch_table,
+}
+
+
+class FakeCursor:
+    "只实现 description / fetchall，每次 fetchall 返回同一批元组 (与数据库驱动一样是 tuple 的 tuple)"
+
+    def __init__(self, rows):
+        self.description = [(name, None, None, None, None, None, None) for name in COLUMNS]
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def make_rows(count):
+    start = datetime.datetime(2024, 1, 1, 8, 0)
+    return tuple(
+        (i + 1, start + datetime.timedelta(minutes=i), i % 360, i % 5000 + 1, f"稻香 {i % 5000}",
+         f"/media/song/{i % 5000}.mp3", "魔杰座", None)
+        for i in range(count)
+    )
+
+
+class Command(BaseCommand):
+    help = "对比 dictfetchall 与各种行适配器的内存分配和编码耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="行数 (默认 10000)")
+        parser.add_argument("--iterations", type=int, default=20, help="计时重复次数 (默认 20)")
+
+    def handle(self, *args, **options):
+        count = options["rows"]
+        iterations = options["iterations"]
+        if count < 1 or iterations < 1:
+            raise CommandError("行数和重复次数必须为正整数")
+
+        cursor = FakeCursor(make_rows(count))
+        scale = 10000 / count
+        self.stdout.write(f"{count} 行，编码器 {get_backend()}，内存按每 1 万行折算")
+        self.stdout.write(
+            f"{'adapter':<8} {'blocks/10k':>11} {'KiB/10k':>9} {'peak KiB/10k':>13} {'ms adapt':>9} {'ms encode':>10}"
+        )
+        for name, adapt in ADAPTERS.items():
+            blocks, size = self._retained(lambda: adapt(cursor))
+            peak = self._peak(lambda: dumps(adapt(cursor)))
+            adapt_time = self._time(lambda: adapt(cursor), iterations)
+            result = adapt(cursor)
+            encode_time = self._time(lambda: dumps(result), iterations)
+            self.stdout.write(
+                f"{name:<8} {blocks * scale:>11.0f} {size * scale / 1024:>9.1f} {peak * scale / 1024:>13.1f} "
+                f"{adapt_time * 1000:>9.2f} {encode_time * 1000:>10.2f}"
+            )
+
+    def _retained(self, func):
+        "func 返回的结果占用的内存块数和字节数"
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            result = func()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        del result
+        return sum(stat.count_diff for stat in stats), sum(stat.size_diff for stat in stats)
+
+    def _peak(self, func):
+        "执行 func 期间的峰值内存 (字节)"
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def _time(self, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,105 @@
+# session 后端写入次数对比
+# 用 SessionMiddleware 模拟同一个已登录用户连续发出的请求，对比两种 session 后端每个请求的写入次数：
+#   db    : django.contrib.sessions.backends.db (原来的配置，每个请求 UPDATE django_session)
+#   cache : app.backends.sessions (两级缓存 + 合并写入)
+# 大部分请求只读取 session，每隔 --write-every 个请求修改一次 session 内容 (模拟登录状态变化等)
+#
+# 压测使用单独生成的 session，结束后删除，不影响已有登录状态
+#
+# 用法:
+#   python manage.py bench_sessions
+#   python manage.py bench_sessions --requests 5000 --write-every 100
+import time
+from importlib import import_module
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from app.backends.sessions import reset_session_stats, session_stats
+
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cache": "app.backends.sessions",
+}
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class Command(BaseCommand):
+    help = "对比数据库 session 与缓存 session 后端每个请求的写入次数和耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000, help="模拟的请求数 (默认 1000)")
+        parser.add_argument("--write-every", type=int, default=50,
+                            help="每隔多少个请求修改一次 session 内容 (默认 50)")
+        parser.add_argument("--engine", choices=["both", *ENGINES], default="both")
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        write_every = options["write_every"]
+        if total < 1 or write_every < 1:
+            raise CommandError("请求数和修改间隔必须为正整数")
+
+        engines = list(ENGINES) if options["engine"] == "both" else [options["engine"]]
+
+        self.stdout.write(
+            f"{'engine':<6} {'requests':>8} {'db writes':>10} {'cache writes':>12} "
+            f"{'writes/req':>10} {'ms/req':>8}"
+        )
+        for name in engines:
+            db_writes, cache_writes, elapsed = self._run(ENGINES[name], total, write_every)
+            per_request = (db_writes + cache_writes) / total
+            self.stdout.write(
+                f"{name:<6} {total:>8} {db_writes:>10} {cache_writes:>12} "
+                f"{per_request:>10.3f} {elapsed / total * 1000:>8.3f}"
+            )
+
+    def _run(self, engine, total, write_every):
+        "返回 (数据库写入次数, 缓存写入次数, 耗时秒数)"
+        store_class = import_module(engine).SessionStore
+        factory = RequestFactory()
+        counter = {"n": 0}
+
+        def view(request):
+            # 与视图一样读取登录状态，按间隔修改一次 session
+            request.session.get("user_id")
+            counter["n"] += 1
+            if counter["n"] % write_every == 0:
+                request.session["last_action"] = counter["n"]
+            return HttpResponse()
+
+        middleware = SessionMiddleware(view)
+        middleware.SessionStore = store_class
+
+        # 先建立一个已登录的 session (不计入统计)
+        session = store_class()
+        session["user_id"] = 0
+        session.create()
+        session_key = session.session_key
+
+        reset_session_stats()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(total):
+                    request = factory.get("/")
+                    request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+                    response = middleware(request)
+                    cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+                    if cookie is not None and cookie.value:
+                        session_key = cookie.value
+                elapsed = time.perf_counter() - start
+        finally:
+            store_class().delete(session_key)
+
+        db_writes = sum(
+            1 for query in queries.captured_queries
+            if query["sql"].lstrip().upper().startswith(WRITE_PREFIXES)
+        )
+        cache_writes = session_stats()["writes"] if engine == ENGINES["cache"] else 0
+        return db_writes, cache_writes, elapsed
@@ -0,0 +1,157 @@
+# 热点查询执行计划检查
+# 对视图中的高频查询逐条执行 EXPLAIN，若某条查询在大表上走了全表扫描 (type = ALL) 则失败退出
+#
+# 用法:
+#   python manage.py explain_queries                 # 检查全部已登记的查询
+#   python manage.py explain_queries --min-rows 500  # 表的估计行数达到 500 才算大表
+#   python manage.py explain_queries --query comment.get_comments
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app.views.comment import MY_COMMENTS_SQL, USER_COMMENTS_SQL
+from app.views.commentFeed import comment_page_plan, comments_by_id_query
+from app.views.commentStats import HOT_COMMENTS_SQL, VISIBLE, comment_stats_plan
+from app.views.commentThread import THREAD_IDS_SQL, THREAD_SQL
+from app.views.favoriteAndSonglist import (
+    FAVORITE_CHECK_SQL, FAVORITE_SONGS_DURATION_SQL, FAVORITE_SONGS_SQL, FAVORITES_SQL,
+)
+from app.views.favoriteLeaderboard import LEADERBOARD_SQL
+from app.views.manager import (
+    DAILY_PLAYS_SQL, SYSTEM_LOGS_SQL, USER_SUMMARY_SQL, pending_comments_query, system_log_filter,
+)
+from app.views.moderationQueue import CLAIMABLE_SQL
+from app.views.playhistory import (
+    ACTIVITY_TREND_SQL, REPORT_SUMMARY_SQL, REPORT_TOP_SONG_SQL, TOP_CHART_SQL, play_history_query, report_filter,
+)
+from app.views.tools import dictfetchall, encode_cursor
+
+
+# ================================
+# 已登记的热点查询
+# ================================
+# SQL 全部取自视图模块 (SQL 常量、拼接 SQL 的函数或查询计划)，这里只提供示例参数
+# 新增高频查询时，把视图里的 SQL 提成模块级常量 / 函数，再在这里登记
+def _query(query):
+    return query.sql, query.params
+
+
+def _plan_query(plan):
+    "查询计划 (见 asyncDb) 的第一条查询"
+    query = plan.send(None)
+    plan.close()
+    return _query(query)
+
+
+def _system_logs(**filters):
+    suffix, params = system_log_filter(**filters)
+    return SYSTEM_LOGS_SQL.format(filter=suffix), params + [20, 0]
+
+
+def _play_report(sql):
+    where, params = report_filter(1, "week", {})
+    return sql.format(where=where), params
+
+
+# 示例时间范围
+START, END = "2025-01-01 00:00:00", "2025-01-31 23:59:59"
+
+# 名称 -> (SQL, 示例参数)
+HOT_QUERIES = {
+    # ---------- comment.py ----------
+    # 评论列表按时间 / 热度翻页 (带游标的后续页)
+    "comment.get_comments": _plan_query(comment_page_plan(
+        "song", 1, "time", 20, encode_cursor("comments:time:song:1", ["2030-01-01 00:00:00", 1000000]))),
+    "comment.get_comments.hot": _plan_query(comment_page_plan(
+        "song", 1, "hot", 20, encode_cursor("comments:hot:song:1", [1000000, 1000000]))),
+    "comment.get_comments.count": _plan_query(comment_stats_plan("song", 1)),
+    "comment.get_comments.hot_first_page": _query(comments_by_id_query([1, 2, 3])),
+    "comment.get_comment_detail.thread": (THREAD_SQL, [1, 10, 10, 501]),
+    "comment.delete_comment.thread": (THREAD_IDS_SQL, [1]),
+    "comment.get_my_comments": (MY_COMMENTS_SQL, [1]),
+    "comment.get_comment_stats.hot_load": (HOT_COMMENTS_SQL, ["song", 1, VISIBLE, 50]),
+    **{f"comment.list_comment.{target_type}": (sql, [1]) for target_type, sql in USER_COMMENTS_SQL.items()},
+
+    # ---------- playhistory.py ----------
+    "playhistory.get_my_play_history": play_history_query(1, start_date="2025-01-01", limit=50),
+    "playhistory.get_play_report.summary": _play_report(REPORT_SUMMARY_SQL),
+    "playhistory.get_play_report.top_song": _play_report(REPORT_TOP_SONG_SQL),
+    **{f"playhistory.get_user_top_charts.{chart_type}": (sql, [1, 10]) for chart_type, sql in TOP_CHART_SQL.items()},
+    **{f"playhistory.get_user_activity_trend.{period}": (sql, [1]) for period, sql in ACTIVITY_TREND_SQL.items()},
+
+    # ---------- favoriteAndSonglist.py / favoriteLeaderboard.py ----------
+    **{f"favorite.list_favorite.{target_type}": (sql, [1]) for target_type, sql in FAVORITES_SQL.items()},
+    "favorite.check_favorite": (FAVORITE_CHECK_SQL, [1, "song", 1]),
+    "favorite.get_my_favorite_songs_stats": (FAVORITE_SONGS_SQL, [1]),
+    "favorite.get_my_favorite_songs_stats.duration": (FAVORITE_SONGS_DURATION_SQL, [1]),
+    "favorite.leaderboard": (LEADERBOARD_SQL, ["song", 200]),
+
+    # ---------- manager.py / moderationQueue.py ----------
+    "manager.get_system_logs": _system_logs(),
+    "manager.get_system_logs.by_table": _system_logs(filter_table="Singer"),
+    "manager.get_system_logs.by_result": _system_logs(filter_result="fail"),
+    "manager.admin_get_pending_comments": pending_comments_query(None, [0, 100], 20),
+    "manager.admin_claim_pending_comments": (CLAIMABLE_SQL, [20]),
+    "manager.get_user_behavior_stats.daily_plays": (DAILY_PLAYS_SQL, [START, END]),
+    "manager.get_specific_user_stats.summary": (USER_SUMMARY_SQL, [1, START, END] * 5),
+}
+
+# 表的估计行数达到该值才视为大表，小表全表扫描比走索引更快，不算失败
+DEFAULT_MIN_ROWS = 1000
+
+
+class Command(BaseCommand):
+    help = "对已登记的热点查询执行 EXPLAIN，在大表上出现全表扫描时失败"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-rows", type=int, default=DEFAULT_MIN_ROWS,
+            help=f"估计行数不少于该值的表才检查全表扫描 (默认 {DEFAULT_MIN_ROWS})",
+        )
+        parser.add_argument(
+            "--query", action="append", dest="queries",
+            help="只检查指定名称的查询，可重复使用",
+        )
+
+    def handle(self, *args, **options):
+        min_rows = options["min_rows"]
+        names = options["queries"] or list(HOT_QUERIES)
+
+        unknown = [name for name in names if name not in HOT_QUERIES]
+        if unknown:
+            raise CommandError(f"未登记的查询: {', '.join(unknown)}")
+
+        failures = []
+        with connection.cursor() as cursor:
+            for name in names:
+                sql, params = HOT_QUERIES[name]
+                try:
+                    cursor.execute("EXPLAIN " + sql, params)
+                    plan = dictfetchall(cursor)
+                except Exception as e:
+                    failures.append(f"{name}: EXPLAIN 执行失败: {e}")
+                    self.stdout.write(self.style.ERROR(f"[ERROR] {name}: {e}"))
+                    continue
+
+                scans = [row for row in plan if self._is_full_scan(row, min_rows)]
+                status = self.style.ERROR("[FULL SCAN]") if scans else self.style.SUCCESS("[OK]")
+                self.stdout.write(f"{status} {name}")
+                for row in plan:
+                    self.stdout.write(
+                        f"    table={row.get('table')} type={row.get('type')} "
+                        f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}"
+                    )
+                for row in scans:
+                    failures.append(f"{name}: 表 {row.get('table')} 全表扫描 (估计 {row.get('rows')} 行)")
+
+        if failures:
+            raise CommandError("以下查询存在问题:\n" + "\n".join(failures))
+
+        self.stdout.write(self.style.SUCCESS(f"共检查 {len(names)} 条查询，未发现大表全表扫描"))
+
+    @staticmethod
+    def _is_full_scan(row, min_rows):
+        table = row.get("table") or ""
+        # <derivedN> / <unionM,N> 等是查询内部的临时结果，不是真实的表
+        if table.startswith("<"):
+            return False
+        return row.get("type") == "ALL" and (row.get("rows") or 0) >= min_rows
@@ -0,0 +1,16 @@
+# 从 Comment 表重建评论统计 (Comment_Stats)，并清空内存中的热门评论
+# 评论统计在审核、举报、点赞、删除评论时增量维护，手工修改过 Comment 表后可用它重新对齐
+#
+# 用法:
+#   python manage.py rebuild_comment_stats
+from django.core.management.base import BaseCommand
+
+from app.views.commentStats import rebuild_comment_stats
+
+
+class Command(BaseCommand):
+    help = "从 Comment 表重新统计每个目标的评论数、回复数和点赞总数"
+
+    def handle(self, *args, **options):
+        rows = rebuild_comment_stats()
+        self.stdout.write(self.style.SUCCESS(f"重建完成：Comment_Stats {rows} 行"))
@@ -0,0 +1,16 @@
+# 从 Favorite 表重建收藏计数 (Favorite_Count)
+# 收藏计数在收藏 / 取消收藏时增量维护，手工修改过 Favorite 表后可用它重新对齐
+#
+# 用法:
+#   python manage.py rebuild_favorite_counts
+from django.core.management.base import BaseCommand
+
+from app.views.favoriteLeaderboard import rebuild_favorite_counts
+
+
+class Command(BaseCommand):
+    help = "从 Favorite 表重新统计每个对象的被收藏次数"
+
+    def handle(self, *args, **options):
+        rows = rebuild_favorite_counts()
+        self.stdout.write(self.style.SUCCESS(f"重建完成：Favorite_Count {rows} 行"))
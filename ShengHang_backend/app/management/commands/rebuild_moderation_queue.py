@@ -0,0 +1,17 @@
+# 从 Comment 表重建评论审核队列 (Moderation_Queue / Moderation_Count)
+# 审核队列在发布、举报、审核、删除评论时增量维护，手工修改过评论状态后可用它重新对齐
+# 重建会清空所有管理员当前的领取
+#
+# 用法:
+#   python manage.py rebuild_moderation_queue
+from django.core.management.base import BaseCommand
+
+from app.views.moderationQueue import rebuild_moderation_queue
+
+
+class Command(BaseCommand):
+    help = "按评论当前状态重建审核队列和待审核计数"
+
+    def handle(self, *args, **options):
+        rows = rebuild_moderation_queue()
+        self.stdout.write(self.style.SUCCESS(f"重建完成：Moderation_Queue {rows} 行"))
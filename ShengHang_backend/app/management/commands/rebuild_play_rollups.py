@@ -0,0 +1,22 @@
+# 从 PlayHistory 重建按天聚合的播放数据 (User_Song_Play_Daily / User_Play_Daily)
+# 首次上线、手工修改过 PlayHistory 或删除过歌曲后，用来让聚合表与原始记录重新一致
+#
+# 用法:
+#   python manage.py rebuild_play_rollups              # 重建全部用户 (建议在低峰期执行)
+#   python manage.py rebuild_play_rollups --user-id 3  # 只重建一个用户
+from django.core.management.base import BaseCommand
+
+from app.views.playRollup import rebuild_play_rollups
+
+
+class Command(BaseCommand):
+    help = "从 PlayHistory 重建按天聚合的播放数据"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-id", type=int, default=None, help="只重建指定用户")
+
+    def handle(self, *args, **options):
+        song_rows, user_rows = rebuild_play_rollups(options["user_id"])
+        self.stdout.write(self.style.SUCCESS(
+            f"重建完成：User_Song_Play_Daily {song_rows} 行，User_Play_Daily {user_rows} 行"
+        ))
@@ -0,0 +1,16 @@
+# 手动把播放量分片汇总进 Song.play_count
+# 服务运行时后台线程会定期汇总，停服前或需要立即看到准确播放量时可以手动执行
+#
+# 用法:
+#   python manage.py rollup_play_counts
+from django.core.management.base import BaseCommand
+
+from app.views.playCounter import rollup_play_counts
+
+
+class Command(BaseCommand):
+    help = "把 Song_Play_Counter 中尚未汇总的播放次数汇总进 Song.play_count"
+
+    def handle(self, *args, **options):
+        total = rollup_play_counts()
+        self.stdout.write(self.style.SUCCESS(f"汇总完成，共 {total} 次播放计入 Song.play_count"))
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_rename_singer_id_album_singer_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['target_type', 'target_id', 'status', 'parent_id', 'comment_time'], name='comment_target_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['target_type', 'target_id', 'status', 'like_count'], name='comment_target_like_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent_id', 'status', 'comment_time'], name='comment_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', 'target_type', 'comment_time'], name='comment_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', 'comment_time'], name='comment_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['comment_time'], name='comment_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'target_type', 'favorite_time'], name='favorite_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'target_type', 'target_id'], name='favorite_user_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['target_type', 'target_id'], name='favorite_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['favorite_time'], name='favorite_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playhistory',
+            index=models.Index(fields=['user', 'song', 'play_time'], name='play_user_song_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playhistory',
+            index=models.Index(fields=['user', 'play_time'], name='play_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playhistory',
+            index=models.Index(fields=['play_time'], name='play_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['action_time'], name='syslog_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['target_table', 'action_time'], name='syslog_table_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['result', 'action_time'], name='syslog_result_time_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongPlayCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.SmallIntegerField(verbose_name='分片编号')),
+                ('play_count', models.IntegerField(default=0, verbose_name='未汇总的播放次数')),
+            ],
+            options={
+                'db_table': 'Song_Play_Counter',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['play_count', 'song_id'], name='song_play_count_idx'),
+        ),
+        migrations.AddField(
+            model_name='songplaycounter',
+            name='song',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.song', verbose_name='歌曲ID'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='songplaycounter',
+            unique_together={('song', 'slot')},
+        ),
+    ]
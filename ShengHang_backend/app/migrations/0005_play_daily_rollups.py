@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_song_play_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSongPlayDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('play_date', models.DateField(verbose_name='播放日期')),
+                ('play_count', models.IntegerField(default=0, verbose_name='当天播放次数')),
+                ('total_duration', models.IntegerField(default=0, verbose_name='当天播放总时长（秒）')),
+                ('song', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.song', verbose_name='歌曲ID')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.user', verbose_name='用户ID')),
+            ],
+            options={
+                'db_table': 'User_Song_Play_Daily',
+                'indexes': [models.Index(fields=['user', 'play_date'], name='usp_daily_user_date_idx')],
+                'unique_together': {('user', 'song', 'play_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserPlayDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('play_date', models.DateField(verbose_name='播放日期')),
+                ('play_count', models.IntegerField(default=0, verbose_name='当天播放次数')),
+                ('total_duration', models.IntegerField(default=0, verbose_name='当天播放总时长（秒）')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.user', verbose_name='用户ID')),
+            ],
+            options={
+                'db_table': 'User_Play_Daily',
+                'unique_together': {('user', 'play_date')},
+            },
+        ),
+        # 用已有的播放记录初始化按天聚合表 (与 playRollup.rebuild_play_rollups 相同)
+        migrations.RunSQL(
+            sql=[
+                """
+                INSERT INTO User_Song_Play_Daily (user_id, song_id, play_date, play_count, total_duration)
+                SELECT user_id, song_id, DATE(play_time), COUNT(*), COALESCE(SUM(play_duration), 0)
+                FROM PlayHistory
+                GROUP BY user_id, song_id, DATE(play_time)
+                """,
+                """
+                INSERT INTO User_Play_Daily (user_id, play_date, play_count, total_duration)
+                SELECT user_id, play_date, SUM(play_count), SUM(total_duration)
+                FROM User_Song_Play_Daily
+                GROUP BY user_id, play_date
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_play_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FavoriteCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('song', 'song'), ('album', 'album'), ('songlist', 'songlist')], max_length=10, verbose_name='收藏对象类型')),
+                ('target_id', models.IntegerField(verbose_name='收藏对象ID')),
+                ('fav_count', models.IntegerField(default=0, verbose_name='被收藏次数')),
+            ],
+            options={
+                'db_table': 'Favorite_Count',
+                'indexes': [models.Index(fields=['target_type', 'fav_count', 'target_id'], name='favcount_type_count_idx')],
+                'unique_together': {('target_type', 'target_id')},
+            },
+        ),
+        # 用已有的收藏记录初始化计数
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO Favorite_Count (target_type, target_id, fav_count)
+                SELECT target_type, target_id, COUNT(*)
+                FROM Favorite
+                GROUP BY target_type, target_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_favorite_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationCount',
+            fields=[
+                ('reason', models.CharField(choices=[('审核中', '审核中'), ('举报中', '举报中')], max_length=3, primary_key=True, serialize=False, verbose_name='入队原因')),
+                ('pending', models.IntegerField(default=0, verbose_name='待审核数')),
+            ],
+            options={
+                'db_table': 'Moderation_Count',
+            },
+        ),
+        migrations.CreateModel(
+            name='ModerationQueue',
+            fields=[
+                ('queue_id', models.AutoField(primary_key=True, serialize=False, verbose_name='队列编号')),
+                ('reason', models.CharField(choices=[('审核中', '审核中'), ('举报中', '举报中')], max_length=3, verbose_name='入队原因')),
+                ('priority', models.SmallIntegerField(verbose_name='优先级')),
+                ('report_count', models.IntegerField(default=0, verbose_name='被举报次数')),
+                ('enqueued_at', models.DateTimeField(verbose_name='入队时间')),
+                ('claimed_by', models.IntegerField(blank=True, null=True, verbose_name='领取的管理员ID')),
+                ('claim_token', models.CharField(blank=True, max_length=32, null=True, verbose_name='领取凭证')),
+                ('lease_until', models.DateTimeField(blank=True, null=True, verbose_name='领取到期时间')),
+                ('comment', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.comment', verbose_name='评论ID')),
+            ],
+            options={
+                'db_table': 'Moderation_Queue',
+                'indexes': [models.Index(fields=['priority', 'queue_id'], name='modqueue_priority_idx')],
+            },
+        ),
+        # 用已有的待审核 / 被举报评论初始化队列和计数
+        migrations.RunSQL(
+            sql=[
+                """
+                INSERT INTO Moderation_Queue (comment_id, reason, priority, report_count, enqueued_at)
+                SELECT comment_id, status,
+                       CASE WHEN status = '举报中' THEN 0 ELSE 1 END,
+                       CASE WHEN status = '举报中' THEN 1 ELSE 0 END,
+                       comment_time
+                FROM Comment
+                WHERE status IN ('审核中', '举报中')
+                ORDER BY comment_time, comment_id
+                """,
+                """
+                INSERT INTO Moderation_Count (reason, pending)
+                SELECT '审核中', COUNT(*) FROM Moderation_Queue WHERE reason = '审核中'
+                UNION ALL
+                SELECT '举报中', COUNT(*) FROM Moderation_Queue WHERE reason = '举报中'
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_moderation_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('song', 'song'), ('album', 'album'), ('songlist', 'songlist')], max_length=10, verbose_name='评论目标类型')),
+                ('target_id', models.IntegerField(verbose_name='评论目标ID')),
+                ('comment_count', models.IntegerField(default=0, verbose_name='可见评论数')),
+            ],
+            options={
+                'db_table': 'Comment_Count',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['target_type', 'target_id', 'status', 'parent_id', 'like_count'], name='comment_target_hot_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commentcount',
+            unique_together={('target_type', 'target_id')},
+        ),
+        # 用已有的评论初始化计数
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO Comment_Count (target_type, target_id, comment_count)
+                SELECT target_type, target_id, COUNT(*)
+                FROM Comment
+                WHERE parent_id IS NULL AND status = '正常'
+                GROUP BY target_type, target_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
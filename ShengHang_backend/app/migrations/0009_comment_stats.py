@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_comment_count'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='CommentCount',
+            new_name='CommentStats',
+        ),
+        migrations.AlterModelTable(
+            name='commentstats',
+            table='Comment_Stats',
+        ),
+        migrations.AddField(
+            model_name='commentstats',
+            name='reply_count',
+            field=models.IntegerField(default=0, verbose_name='可见回复数'),
+        ),
+        migrations.AddField(
+            model_name='commentstats',
+            name='like_total',
+            field=models.IntegerField(default=0, verbose_name='点赞总数'),
+        ),
+        # 用已有的评论重新统计
+        migrations.RunSQL(
+            sql=[
+                "DELETE FROM Comment_Stats",
+                """
+                INSERT INTO Comment_Stats (target_type, target_id, comment_count, reply_count, like_total)
+                SELECT target_type, target_id,
+                       SUM(CASE WHEN parent_id IS NULL THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN parent_id IS NULL THEN 0 ELSE 1 END),
+                       SUM(like_count)
+                FROM Comment
+                WHERE status = '正常'
+                GROUP BY target_type, target_id
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
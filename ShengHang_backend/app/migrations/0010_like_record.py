@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_comment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('comment', 'comment'), ('songlist', 'songlist')], max_length=10, verbose_name='点赞对象类型')),
+                ('target_id', models.IntegerField(verbose_name='点赞对象ID')),
+                ('like_time', models.DateTimeField(auto_now_add=True, verbose_name='点赞时间')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='app.user', verbose_name='用户ID')),
+            ],
+            options={
+                'db_table': 'Like_Record',
+                'indexes': [models.Index(fields=['target_type', 'target_id'], name='like_target_idx')],
+                'unique_together': {('user', 'target_type', 'target_id')},
+            },
+        ),
+    ]
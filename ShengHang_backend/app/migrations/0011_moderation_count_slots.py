@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_like_record'),
+    ]
+
+    operations = [
+        # 主键从 reason 改为自增 id + (reason, slot) 唯一，直接重建计数表
+        migrations.DeleteModel(
+            name='ModerationCount',
+        ),
+        migrations.CreateModel(
+            name='ModerationCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('审核中', '审核中'), ('举报中', '举报中')], max_length=3, verbose_name='入队原因')),
+                ('slot', models.SmallIntegerField(default=0, verbose_name='分片编号')),
+                ('pending', models.IntegerField(default=0, verbose_name='待审核数')),
+            ],
+            options={
+                'db_table': 'Moderation_Count',
+                'unique_together': {('reason', 'slot')},
+            },
+        ),
+        # 按当前队列重新计数，写入 0 号分片
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO Moderation_Count (reason, slot, pending)
+                SELECT '审核中', 0, COUNT(*) FROM Moderation_Queue WHERE reason = '审核中'
+                UNION ALL
+                SELECT '举报中', 0, COUNT(*) FROM Moderation_Queue WHERE reason = '举报中'
+                """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -95,6 +95,10 @@ class Song(models.Model):
         db_table = 'Song'
         verbose_name = '歌曲'
         verbose_name_plural = verbose_name
+        indexes = [
+            # 搜索歌曲按播放量排序 (游标分页)
+            models.Index(fields=['play_count', 'song_id'], name='song_play_count_idx'),
+        ]
 
     def __str__(self):
         return self.song_title
@@ -148,11 +152,119 @@ class Comment(models.Model):
         db_table = 'Comment'
         verbose_name = '评论'
         verbose_name_plural = verbose_name
+        indexes = [
+            # 评论列表 / 评论统计：按目标筛选一级评论，再按时间或点赞数排序
+            models.Index(fields=['target_type', 'target_id', 'status', 'parent_id', 'comment_time'], name='comment_target_time_idx'),
+            models.Index(fields=['target_type', 'target_id', 'status', 'like_count'],                name='comment_target_like_idx'),
+            # 评论列表按热度翻页：一级评论按 (like_count, comment_id) 倒序
+            models.Index(fields=['target_type', 'target_id', 'status', 'parent_id', 'like_count'], name='comment_target_hot_idx'),
+            # 评论详情里的回复、级联删除时查子评论
+            models.Index(fields=['parent_id', 'status', 'comment_time'],                             name='comment_parent_idx'),
+            # 我的评论 / 用户主页的评论
+            models.Index(fields=['user', 'target_type', 'comment_time'],                             name='comment_user_time_idx'),
+            # 管理员待审核评论
+            models.Index(fields=['status', 'comment_time'],                                          name='comment_status_time_idx'),
+            # 后台按时间段统计
+            models.Index(fields=['comment_time'],                                                    name='comment_time_idx'),
+        ]
 
     def __str__(self):
         return self.comment_id
 
 
+class CommentStats(models.Model):
+    # 每个目标的评论统计，只统计状态为 '正常' 的评论，审核、举报、点赞、删除评论时同步增减 (app/views/commentStats.py)
+    # 评论列表 / 详情页的评论总数、评论统计接口直接读它；可用 manage.py rebuild_comment_stats 从 Comment 重建
+    target_type     = models.CharField(max_length=10, choices=Comment.TARGET_TYPE_CHOICES,   verbose_name='评论目标类型')
+    target_id       = models.IntegerField(                                                   verbose_name='评论目标ID')
+    comment_count   = models.IntegerField(default=0,                                         verbose_name='可见评论数')
+    reply_count     = models.IntegerField(default=0,                                         verbose_name='可见回复数')
+    like_total      = models.IntegerField(default=0,                                         verbose_name='点赞总数')
+
+    class Meta:
+        db_table = 'Comment_Stats'
+        unique_together = (('target_type', 'target_id'),)
+
+    def __str__(self):
+        return f"{self.target_type} {self.target_id}"
+
+
+
+class LikeRecord(models.Model):
+    # 用户点赞记录 (app/views/likeBuffer.py)，同一用户对同一条评论 / 同一个歌单只能点赞一次
+    TARGET_TYPE_CHOICES = [
+        ('comment', 'comment'),
+        ('songlist', 'songlist'),
+    ]
+
+    user            = models.ForeignKey('User', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='用户ID')
+    target_type     = models.CharField(max_length=10, choices=TARGET_TYPE_CHOICES,                 verbose_name='点赞对象类型')
+    target_id       = models.IntegerField(                                                         verbose_name='点赞对象ID')
+    like_time       = models.DateTimeField(auto_now_add=True,                                      verbose_name='点赞时间')
+
+    class Meta:
+        db_table = 'Like_Record'
+        # 唯一索引同时用于加载用户的已点赞集合、注销账号时删除
+        unique_together = (('user', 'target_type', 'target_id'),)
+        indexes = [
+            # 删除评论 / 歌单时清理点赞记录
+            models.Index(fields=['target_type', 'target_id'], name='like_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.target_type} {self.target_id}"
+
+
+
+class ModerationQueue(models.Model):
+    # 待审核评论队列 (app/views/moderationQueue.py)
+    # 发布评论、举报评论时入队，管理员审核后出队；按 priority、queue_id 升序处理 (被举报的优先，先到先审)
+    # 管理员领取任务后在 lease_until 之前独占，过期未处理的任务可被其他管理员重新领取
+    REASON_CHOICES = [
+        ('审核中', '审核中'),
+        ('举报中', '举报中'),
+    ]
+    PRIORITY_REPORTED = 0
+    PRIORITY_NEW = 1
+
+    queue_id        = models.AutoField(primary_key=True,                                            verbose_name='队列编号')
+    comment         = models.OneToOneField('Comment', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='评论ID')
+    reason          = models.CharField(max_length=3, choices=REASON_CHOICES,                        verbose_name='入队原因')
+    priority        = models.SmallIntegerField(                                                     verbose_name='优先级')
+    report_count    = models.IntegerField(default=0,                                                verbose_name='被举报次数')
+    enqueued_at     = models.DateTimeField(                                                         verbose_name='入队时间')
+    claimed_by      = models.IntegerField(null=True, blank=True,                                    verbose_name='领取的管理员ID')
+    claim_token     = models.CharField(max_length=32, null=True, blank=True,                        verbose_name='领取凭证')
+    lease_until     = models.DateTimeField(null=True, blank=True,                                   verbose_name='领取到期时间')
+
+    class Meta:
+        db_table = 'Moderation_Queue'
+        indexes = [
+            # 待审核列表 / 领取任务：按优先级、入队顺序
+            models.Index(fields=['priority', 'queue_id'], name='modqueue_priority_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.queue_id} {self.comment_id}"
+
+
+
+class ModerationCount(models.Model):
+    # 按入队原因统计队列中的任务数，与 Moderation_Queue 在同一事务中增减
+    # 每个原因 MODERATION_COUNT_SLOTS 个分片，每次随机增减其中一行，避免每条新评论都去锁同一行；
+    # 读取时按原因求和 (单个分片可以是负数，总和不会)
+    reason          = models.CharField(max_length=3, choices=ModerationQueue.REASON_CHOICES,          verbose_name='入队原因')
+    slot            = models.SmallIntegerField(default=0,                                              verbose_name='分片编号')
+    pending         = models.IntegerField(default=0,                                                  verbose_name='待审核数')
+
+    class Meta:
+        db_table = 'Moderation_Count'
+        unique_together = (('reason', 'slot'),)
+
+    def __str__(self):
+        return f"{self.reason}#{self.slot} {self.pending}"
+
+
 
 class Favorite(models.Model):
     TARGET_TYPE_CHOICES = [
@@ -169,12 +281,42 @@ class Favorite(models.Model):
 
     class Meta:
         db_table = 'Favorite'
+        indexes = [
+            # 我的收藏列表：按用户和类型筛选，按收藏时间倒序
+            models.Index(fields=['user', 'target_type', 'favorite_time'], name='favorite_user_time_idx'),
+            # 收藏 / 取消收藏前检查是否已收藏
+            models.Index(fields=['user', 'target_type', 'target_id'],     name='favorite_user_target_idx'),
+            # 收藏排行榜：按类型分组统计各对象的收藏数
+            models.Index(fields=['target_type', 'target_id'],             name='favorite_target_idx'),
+            # 后台按时间段统计
+            models.Index(fields=['favorite_time'],                        name='favorite_time_idx'),
+        ]
 
     def __str__(self):
         return self.favorite_id
 
 
 
+class FavoriteCount(models.Model):
+    # 每个对象被收藏的次数，收藏 / 取消收藏时同步增减，平台收藏排行榜直接按它排序
+    # 可用 manage.py rebuild_favorite_counts 从 Favorite 重建
+    target_type     = models.CharField(max_length=10, choices=Favorite.TARGET_TYPE_CHOICES,  verbose_name='收藏对象类型')
+    target_id       = models.IntegerField(                                                    verbose_name='收藏对象ID')
+    fav_count       = models.IntegerField(default=0,                                          verbose_name='被收藏次数')
+
+    class Meta:
+        db_table = 'Favorite_Count'
+        unique_together = (('target_type', 'target_id'),)
+        indexes = [
+            # 排行榜：按类型取收藏数最多的前 N 个
+            models.Index(fields=['target_type', 'fav_count', 'target_id'], name='favcount_type_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type} {self.target_id}"
+
+
+
 class PlayHistory(models.Model):
     play_id         = models.AutoField(primary_key=True,                verbose_name='播放记录编号')
     user            = models.ForeignKey('User', on_delete=models.CASCADE,   verbose_name='播放用户')
@@ -184,6 +326,14 @@ class PlayHistory(models.Model):
 
     class Meta:
         db_table = 'PlayHistory'
+        indexes = [
+            # 记录播放时的防刷检查：该用户最近一次播放这首歌的时间
+            models.Index(fields=['user', 'song', 'play_time'], name='play_user_song_time_idx'),
+            # 播放历史 / 播放报告：按用户筛选时间段
+            models.Index(fields=['user', 'play_time'],         name='play_user_time_idx'),
+            # 后台按时间段统计
+            models.Index(fields=['play_time'],                 name='play_time_idx'),
+        ]
 
     def __str__(self):
         return self.play_id
@@ -245,6 +395,61 @@ class SongSinger(models.Model):
 
 
 
+class SongPlayCounter(models.Model):
+    # 播放量分片计数：每首歌最多 PLAY_COUNTER_SLOTS 行，每次增量随机写入其中一行，
+    # 避免所有并发播放都去更新 Song 表的同一行；定期汇总进 Song.play_count 后删除
+    # 不建外键约束，歌曲被删除后残留的计数行会在下次汇总时清理掉
+    song        = models.ForeignKey('Song', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='歌曲ID')
+    slot        = models.SmallIntegerField(                                                     verbose_name='分片编号')
+    play_count  = models.IntegerField(default=0,                                                verbose_name='未汇总的播放次数')
+
+    class Meta:
+        db_table = 'Song_Play_Counter'
+        unique_together = (('song', 'slot'),)
+
+    def __str__(self):
+        return f"{self.song_id}#{self.slot}"
+
+
+
+class UserSongPlayDaily(models.Model):
+    # 播放记录按 (用户, 歌曲, 日期) 预聚合，写播放记录时增量维护，供播放报告、个人排行榜使用
+    # 可用 manage.py rebuild_play_rollups 从 PlayHistory 重建
+    user            = models.ForeignKey('User', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='用户ID')
+    song            = models.ForeignKey('Song', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='歌曲ID')
+    play_date       = models.DateField(                                                             verbose_name='播放日期')
+    play_count      = models.IntegerField(default=0,                                                verbose_name='当天播放次数')
+    total_duration  = models.IntegerField(default=0,                                                verbose_name='当天播放总时长（秒）')
+
+    class Meta:
+        db_table = 'User_Song_Play_Daily'
+        unique_together = (('user', 'song', 'play_date'),)
+        indexes = [
+            # 播放报告：按用户和日期范围筛选
+            models.Index(fields=['user', 'play_date'], name='usp_daily_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.song_id} {self.play_date}"
+
+
+
+class UserPlayDaily(models.Model):
+    # 播放记录按 (用户, 日期) 预聚合，供播放报告总数、听歌趋势使用，一年最多 366 行
+    user            = models.ForeignKey('User', on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='用户ID')
+    play_date       = models.DateField(                                                             verbose_name='播放日期')
+    play_count      = models.IntegerField(default=0,                                                verbose_name='当天播放次数')
+    total_duration  = models.IntegerField(default=0,                                                verbose_name='当天播放总时长（秒）')
+
+    class Meta:
+        db_table = 'User_Play_Daily'
+        unique_together = (('user', 'play_date'),)
+
+    def __str__(self):
+        return f"{self.user_id} {self.play_date}"
+
+
+
 class SystemLog(models.Model):   
     RESULT_CHOICES = [
         ('success', 'success'),
@@ -259,6 +464,12 @@ class SystemLog(models.Model):
     result       = models.CharField(max_length=10, choices=RESULT_CHOICES,  verbose_name='操作结果状态')
     class Meta:
         db_table = 'SystemLog'
+        indexes = [
+            # 系统日志：按时间倒序分页，可按表名、结果筛选
+            models.Index(fields=['action_time'],                 name='syslog_time_idx'),
+            models.Index(fields=['target_table', 'action_time'], name='syslog_table_time_idx'),
+            models.Index(fields=['result', 'action_time'],       name='syslog_result_time_idx'),
+        ]
 
 
 #删表sql指令
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from app.backends import sessions
+from app.models import Album, PlayHistory, Singer, Song, SongSinger, User
+from app.views import music
+from app.views.localRedis import LocalRedis
+from app.views.playBuffer import flush_plays
+from app.views.recentPlays import RecentPlayTracker
+from app.views.tools import SINGER_BATCH_SIZE, fetch_singers_by_song_ids
+from app.views.writeBehind import WriteBehindQueue
+
+
+# ================================
+# 延迟写队列 (writeBehind)
+# ================================
+class PlayFlushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_name="tester", password="x")
+        singer = Singer.objects.create(singer_name="歌手", type="男")
+        album = Album.objects.create(album_title="专辑", singer=singer)
+        self.song = Song.objects.create(song_title="歌曲", album=album, duration=200, file_url="/media/1.mp3")
+
+        self.spill_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spill_dir, ignore_errors=True)
+        # 写库间隔足够长，测试中只由 flush() 写库
+        self.queue = WriteBehindQueue("test_play_history", flush_plays, interval=3600, max_size=10 ** 6,
+                                      spill_dir=self.spill_dir)
+
+    def play(self, song_id):
+        return {"user_id": self.user.user_id, "song_id": song_id, "play_duration": 30, "ts": time.time()}
+
+    def test_bad_row_does_not_block_batch(self):
+        bad_song_id = self.song.song_id + 1000
+        for song_id in (self.song.song_id, bad_song_id, self.song.song_id):
+            self.queue.put(self.play(song_id))
+
+        self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(PlayHistory.objects.filter(user=self.user, song=self.song).count(), 2)
+        self.assertEqual(self.queue.pending(), 0)
+
+        # 写不进去的一条移到死信文件，落盘文件已清空
+        with open(os.path.join(self.spill_dir, "test_play_history.dead.jsonl"), encoding="utf-8") as f:
+            dead = [json.loads(line) for line in f]
+        self.assertEqual([entry["item"]["song_id"] for entry in dead], [bad_song_id])
+        self.assertFalse(os.path.exists(os.path.join(self.spill_dir, f"test_play_history.{os.getpid()}.jsonl")))
+
+
+# ================================
+# 两级缓存 session (backends/sessions)
+# ================================
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                           "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                        "LOCATION": "test-sessions"}})
+class SessionStoreTests(SimpleTestCase):
+    def setUp(self):
+        sessions._local.flushall()
+        store = sessions.SessionStore()
+        store["user_id"] = 1
+        store["recent"] = [1]
+        store.create()
+        self.key = store.session_key
+
+    def test_unsaved_change_not_visible_to_other_requests(self):
+        first = sessions.SessionStore(self.key)
+        first["recent"].append(2)       # 原地修改，没有保存
+
+        second = sessions.SessionStore(self.key)
+        self.assertEqual(second["recent"], [1])
+        self.assertIsNot(first["recent"], second["recent"])
+
+    def test_in_place_change_is_saved(self):
+        first = sessions.SessionStore(self.key)
+        first["recent"].append(2)
+        first.modified = True
+        first.save()
+
+        self.assertEqual(sessions.SessionStore(self.key)["recent"], [1, 2])
+
+    def test_delete_in_other_process_is_seen(self):
+        self.assertEqual(sessions.SessionStore(self.key)["user_id"], 1)     # 进程内缓存已有这个 session
+        # 其他进程注销：只删掉了共享缓存中的 session
+        caches[settings.SESSION_CACHE_ALIAS].delete(sessions.KEY_PREFIX + self.key)
+
+        store = sessions.SessionStore(self.key)
+        self.assertNotIn("user_id", store)
+        self.assertIsNone(store.session_key)
+
+
+# ================================
+# 播放防刷窗口 (recentPlays)
+# ================================
+class RecentPlayTrackerTests(SimpleTestCase):
+    def setUp(self):
+        self.tracker = RecentPlayTracker(LocalRedis(), window=0.2)
+
+    def test_duplicate_inside_window(self):
+        self.assertTrue(self.tracker.check_and_mark(1, 10))
+        self.assertFalse(self.tracker.check_and_mark(1, 10))
+        # 其他用户 / 其他歌曲不受影响
+        self.assertTrue(self.tracker.check_and_mark(2, 10))
+        self.assertTrue(self.tracker.check_and_mark(1, 11))
+
+    def test_allowed_after_expiry(self):
+        self.assertTrue(self.tracker.check_and_mark(1, 10))
+        time.sleep(0.3)
+        self.assertTrue(self.tracker.check_and_mark(1, 10))
+
+    def test_forget(self):
+        self.assertTrue(self.tracker.check_and_mark(1, 10))
+        self.tracker.forget(1, 10)
+        self.assertTrue(self.tracker.check_and_mark(1, 10))
+
+
+class RecentPlayHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_name="tester", password="x")
+        singer = Singer.objects.create(singer_name="歌手", type="男")
+        album = Album.objects.create(album_title="专辑", singer=singer)
+        self.song = Song.objects.create(song_title="歌曲", album=album, duration=200, file_url="/media/1.mp3")
+
+    def test_play_from_other_process_counts(self):
+        # 其他进程 (或重启前) 写入的播放记录，本进程的 LocalRedis 里没有标记
+        PlayHistory.objects.create(user=self.user, song=self.song, play_duration=30)
+        tracker = RecentPlayTracker(LocalRedis(), check_history=True)
+        self.assertFalse(tracker.check_and_mark(self.user.user_id, self.song.song_id))
+
+        other = Song.objects.create(song_title="另一首", album=self.song.album, duration=200, file_url="/media/2.mp3")
+        self.assertTrue(tracker.check_and_mark(self.user.user_id, other.song_id))
+        self.assertFalse(tracker.check_and_mark(self.user.user_id, other.song_id))
+
+
+# ================================
+# 批量查询歌手 (tools.singers_plan)
+# ================================
+@override_settings(SEARCH_INDEX_ENABLED=False)
+class SingerBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_name="tester", password="x")
+        singers = [Singer.objects.create(singer_name=f"歌手{i}", type="男") for i in range(2)]
+        album = Album.objects.create(album_title="专辑", singer=singers[0])
+        self.songs = []
+        for i in range(30):
+            song = Song.objects.create(song_title=f"晴天{i}", album=album, duration=200, file_url=f"/media/{i}.mp3")
+            for singer in singers:
+                SongSinger.objects.create(song=song, singer=singer)
+            self.songs.append(song)
+
+    def test_query_count_depends_only_on_batches(self):
+        with self.assertNumQueries(1):
+            singers = fetch_singers_by_song_ids(None, [self.songs[0].song_id])
+        self.assertEqual(len(singers[self.songs[0].song_id]), 2)
+
+        # 不存在的歌曲 id 也算在内，对应空列表
+        song_ids = [song.song_id for song in self.songs] + list(range(10 ** 6, 10 ** 6 + SINGER_BATCH_SIZE))
+        with self.assertNumQueries(math.ceil(len(song_ids) / SINGER_BATCH_SIZE)):
+            singers = fetch_singers_by_song_ids(None, song_ids)
+        self.assertEqual(len(singers[self.songs[-1].song_id]), 2)
+        self.assertEqual(singers[10 ** 6], [])
+
+    def search_song(self, title):
+        request = RequestFactory().post("/", json.dumps({"song_title": title, "page_size": 100}),
+                                        content_type="application/json")
+        request.session = {"user_id": self.user.user_id}
+        return json.loads(music.search_song(request).content)
+
+    def test_search_song_query_count_independent_of_rows(self):
+        with self.assertNumQueries(3):      # 本页、总数、歌手
+            one = self.search_song("晴天0")
+        with self.assertNumQueries(3):
+            many = self.search_song("晴天")
+        self.assertEqual(len(one["songs"]), 1)
+        self.assertEqual(len(many["songs"]), 30)
+        self.assertTrue(all(len(song["singers"]) == 2 for song in many["songs"]))
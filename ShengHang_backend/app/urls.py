@@ -6,6 +6,7 @@ from app.views import favoriteAndSonglist as favorite
 from app.views import comment as comment
 from app.views import playhistory as ph
 from app.views import manager as manager
+from app.views.asyncDb import route
 
 from django.http import HttpResponse
 
@@ -35,12 +36,13 @@ urlpatterns = [
     path("user/update_visibility/", user.update_visibility),
 
     # 歌手与音乐管理模块
-    path("singer/search_singer/", music.search_singer),
-    path("singer/profile/<int:singer_id>/", music.singer_profile),
-    path("album/search_album/", music.search_album),
-    path("album/profile/<int:album_id>/", music.album_profile),
-    path("song/search_song/", music.search_song),
-    path("song/profile/<int:song_id>/", music.song_profile),
+    # route()：ASGI 部署时使用异步版本 (见 app/views/asyncDb.py)
+    path("singer/search_singer/", route(music.search_singer)),
+    path("singer/profile/<int:singer_id>/", route(music.singer_profile)),
+    path("album/search_album/", route(music.search_album)),
+    path("album/profile/<int:album_id>/", route(music.album_profile)),
+    path("song/search_song/", route(music.search_song)),
+    path("song/profile/<int:song_id>/", route(music.song_profile)),
 
     # 收藏与歌单模块
     path("songlist/list_songlists/", favorite.list_songlists),
@@ -51,7 +53,7 @@ urlpatterns = [
     path("songlist/<int:songlist_id>/add_song/", favorite.songlist_add_song),
     path("songlist/<int:songlist_id>/delete_song/<int:song_id>/", favorite.songlist_delete_song),
     path("songlist/sort_songlist/<int:songlist_id>/", favorite.sort_songlist),
-    path("songlist/search_songlist/", favorite.search_songlist),
+    path("songlist/search_songlist/", route(favorite.search_songlist)),
     path("songlist/like_songlist/<int:songlist_id>/", favorite.like_songlist),
     path("favorite/list_favorite/", favorite.list_favorite),
     path("favorite/add_favorite/", favorite.add_favorite),
@@ -64,7 +66,7 @@ urlpatterns = [
     path("comment/publish_comment/", comment.publish_comment),
     path("comment/delete_comment/", comment.delete_comment),
     path("comment/action_comment/", comment.action_comment),
-    path("comment/get_comments_by_target/", comment.get_comments_by_target),
+    path("comment/get_comments_by_target/", route(comment.get_comments_by_target)),
     path("comment/get_comment_detail/", comment.get_comment_detail),
     path("comment/get_my_comments/", comment.get_my_comments),
     path("comment/get_comment_stats/", comment.get_comment_stats),
@@ -93,5 +95,9 @@ urlpatterns = [
     path("Administrator/user/get_specific_user_stats/", manager.get_specific_user_stats),
     path("Administrator/user/get_user_behavior_stats/", manager.get_user_behavior_stats),
     path("Administrator/comment/admin_get_pending_comments/", manager.admin_get_pending_comments),
+    path("Administrator/comment/admin_claim_pending_comments/", manager.admin_claim_pending_comments),
+    path("Administrator/comment/admin_release_pending_comments/", manager.admin_release_pending_comments),
     path("Administrator/comment/admin_audit_comment/", manager.admin_audit_comment),
+    path("Administrator/comment/admin_audit_comments/", manager.admin_audit_comments),
+    path("Administrator/admin_get_db_pool_stats/", manager.admin_get_db_pool_stats),
 ]
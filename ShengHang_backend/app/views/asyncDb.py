@@ -0,0 +1,323 @@
+# 查询计划与异步数据库访问 (ASGI 部署下的只读接口)
+# 同步视图在等待远程 MySQL 时一直占着一个工作线程，并发请求数受线程数限制。这里让读接口可以在事件循环里执行：
+#   - 查询计划：需要查库的代码写成生成器，逐条 yield Query(sql, params)，拿到结果后继续，最后 return 结果；
+#     同一个计划既可以用 run_sync 在 Django 的 connection 上执行 (WSGI / 同步视图)，
+#     也可以用 run_async 在 aiomysql 连接池上执行 (ASGI / 异步视图)，两种视图共用一份 SQL 和数据整理代码
+#     子计划用 yield from 调用，如 singers = yield from singers_plan(song_ids)
+#   - 需要等待其他线程的地方 (如 profileCache 等待正在查库的请求) yield Wait(event, timeout)：
+#     同步执行时直接等待，异步执行时交给线程池等待，不阻塞事件循环
+#   - 异步连接池：每个事件循环一个 aiomysql 连接池，连接参数取自 DATABASES['default']，大小见 ASYNC_DB_POOL；
+#     连接使用 autocommit，每条查询读到的都是最新提交的数据
+#   - 互不依赖的子查询 yield Gather(plan_a, plan_b, Query(...))，得到各自结果的列表：
+#     同步执行时分到查询线程池里、各用一个连接池中的连接同时执行 (见 submit)，异步执行时用 asyncio.gather，
+#     耗时约等于最慢的一个子查询而不是所有子查询之和
+#   - 没有安装 aiomysql、或数据库不是 MySQL (如测试用的 sqlite) 时，run_async 退回到线程里执行 run_sync
+#   - read_view 把计划形式的视图包装成同步视图，异步版本挂在 view.async_view 上；
+#     urls.py 用 route() 按 ASYNC_READ_VIEWS (asgi.py 启动时打开) 选择其中一个
+# 对比见 manage.py bench_async_views
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+
+# ================================
+# 查询计划
+# ================================
+class Query:
+    """
+    计划中的一条查询，yield 之后得到结果：
+        fetch="all"   全部行 (元组)
+        fetch="one"   第一行，没有结果时为 None
+        fetch="dicts" 全部行，每行 {列名: 值} (同 dictfetchall)
+    """
+    __slots__ = ("sql", "params", "fetch")
+
+    def __init__(self, sql, params=None, fetch="all"):
+        self.sql = sql
+        self.params = params
+        self.fetch = fetch
+
+
+class Wait:
+    "等待 threading.Event，yield 之后得到是否在 timeout 秒内等到"
+    __slots__ = ("event", "timeout")
+
+    def __init__(self, event, timeout):
+        self.event = event
+        self.timeout = timeout
+
+
+class Gather:
+    """
+    并发执行多个互不依赖的子计划 (也可以直接写 Query)，yield 之后得到各自结果的列表，顺序与参数一致
+        info, songs = yield Gather(Query(sql_info, [album_id], fetch="one"), songs_plan(album_id))
+    """
+    __slots__ = ("plans",)
+
+    def __init__(self, *plans):
+        self.plans = [_single(plan) if isinstance(plan, Query) else plan for plan in plans]
+
+
+def _single(query):
+    return (yield query)
+
+
+def _rows_as_dicts(description, rows):
+    columns = [col[0] for col in description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def run_sync(plan, cursor=None):
+    """
+    在 Django 的数据库连接上执行查询计划，返回计划的结果
+    :param cursor: 使用已有的游标 (如调用方的事务中)；为 None 时遇到第一条查询才打开游标
+    """
+    own_cursor = None
+    result = None
+    try:
+        while True:
+            request = plan.send(result)
+            if isinstance(request, Wait):
+                result = request.event.wait(request.timeout)
+                continue
+            if isinstance(request, Gather):
+                result = _gather_sync(request.plans, None if cursor is own_cursor else cursor)
+                continue
+            if cursor is None:
+                cursor = own_cursor = connection.cursor()
+            cursor.execute(request.sql, request.params)
+            if request.fetch == "one":
+                result = cursor.fetchone()
+            elif request.fetch == "dicts":
+                result = _rows_as_dicts(cursor.description, cursor.fetchall())
+            else:
+                result = cursor.fetchall()
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        if own_cursor is not None:
+            own_cursor.close()
+
+
+async def run_async(plan):
+    "在 aiomysql 连接池上执行查询计划；不能使用异步驱动时在线程里执行 run_sync"
+    if not async_db_available():
+        return await sync_to_async(run_sync)(plan)
+
+    pool = conn = cursor = None
+    result = None
+    try:
+        while True:
+            request = plan.send(result)
+            if isinstance(request, Wait):
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, request.event.wait, request.timeout)
+                continue
+            if isinstance(request, Gather):
+                # 先归还连接，子计划各自借连接；避免连接都被等待子计划的请求占住
+                if cursor is not None:
+                    await cursor.close()
+                    pool.release(conn)
+                    cursor = conn = None
+                result = list(await asyncio.gather(*(run_async(plan) for plan in request.plans)))
+                continue
+            if cursor is None:
+                # 遇到第一条查询才借连接，全部命中缓存的计划不占用连接
+                pool = await get_pool()
+                conn = await pool.acquire()
+                cursor = await conn.cursor()
+            await cursor.execute(request.sql, request.params)
+            if request.fetch == "one":
+                result = await cursor.fetchone()
+            elif request.fetch == "dicts":
+                result = _rows_as_dicts(cursor.description, await cursor.fetchall())
+            else:
+                result = tuple(await cursor.fetchall())
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        if cursor is not None:
+            await cursor.close()
+        if conn is not None:
+            pool.release(conn)
+
+
+# ================================
+# 查询线程池 (同步执行时的并发子查询)
+# ================================
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, "QUERY_FANOUT_WORKERS", 8)
+                if workers <= 0:
+                    return None
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query-fanout",
+                                               initializer=_mark_worker)
+    return _executor
+
+
+def _mark_worker():
+    _local.worker = True
+
+
+def _can_fan_out():
+    """
+    当前线程能否把查询分到其他连接上执行：
+    事务中 (其他连接看不到未提交的修改)、查询线程自己 (避免线程池被互相等待的任务占满)、
+    内存中的 sqlite (每个线程是一个独立的空数据库) 都只能在当前连接上顺序执行
+    """
+    if getattr(_local, "worker", False) or connection.in_atomic_block:
+        return False
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        return False
+    return _get_executor() is not None
+
+
+def _run_in_worker(func, args):
+    try:
+        return func(*args)
+    finally:
+        # 与请求结束时一样，把这个线程的连接归还连接池
+        connection.close()
+
+
+def submit(func, *args):
+    """
+    在查询线程池中执行 func(*args)，返回 Future；func 中的查询使用该线程自己的数据库连接
+    不能分出去时 (见 _can_fan_out) 直接在当前线程执行，返回已完成的 Future
+    """
+    if _can_fan_out():
+        return _get_executor().submit(_run_in_worker, func, args)
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def fan_out(*plans):
+    "同步代码中并发执行多个子计划 / Query，返回结果列表 (同 yield Gather(...))"
+    return run_sync(_single(Gather(*plans)))
+
+
+def _gather_sync(plans, cursor):
+    """
+    :param cursor: 调用方传入的游标 (在它的事务中)，此时在这个游标上顺序执行
+    """
+    if cursor is not None or len(plans) < 2 or not _can_fan_out():
+        return [run_sync(plan, cursor) for plan in plans]
+    # 第一个子计划在当前线程执行，其余的分到查询线程池
+    futures = [submit(run_sync, plan) for plan in plans[1:]]
+    first = run_sync(plans[0])
+    return [first] + [future.result() for future in futures]
+
+
+# ================================
+# 异步连接池
+# ================================
+DEFAULT_POOL_OPTIONS = {
+    "minsize": 1,
+    "maxsize": 50,          # 同时在途的查询数上限，超出的查询在事件循环里排队等连接，不占线程
+    "pool_recycle": 3600,   # 连接使用超过多少秒后重建 (避免被 MySQL wait_timeout 断开)
+}
+
+_pools = weakref.WeakKeyDictionary()    # 事件循环 -> 创建连接池的 Task
+
+
+def async_db_available():
+    return (aiomysql is not None and connection.vendor == "mysql"
+            and getattr(settings, "ASYNC_DB_ENABLED", True))
+
+
+async def get_pool():
+    "当前事件循环的连接池，首次使用时创建 (同时到达的请求共用同一次创建)"
+    loop = asyncio.get_running_loop()
+    task = _pools.get(loop)
+    if task is None:
+        task = _pools[loop] = loop.create_task(_create_pool())
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        # 创建失败 (如数据库不可达) 时下次重新创建
+        if _pools.get(loop) is task:
+            del _pools[loop]
+        raise
+
+
+async def close_pool():
+    "关闭当前事件循环的连接池 (事件循环结束前调用，如压测结束时)"
+    task = _pools.pop(asyncio.get_running_loop(), None)
+    if task is None:
+        return
+    try:
+        pool = await task
+    except Exception:
+        return
+    pool.close()
+    await pool.wait_closed()
+
+
+async def _create_pool():
+    db = settings.DATABASES["default"]
+    options = {**DEFAULT_POOL_OPTIONS, **getattr(settings, "ASYNC_DB_POOL", {})}
+    return await aiomysql.create_pool(
+        host=db.get("HOST") or "localhost",
+        port=int(db.get("PORT") or 3306),
+        user=db.get("USER"),
+        password=db.get("PASSWORD"),
+        db=db.get("NAME"),
+        charset=db.get("OPTIONS", {}).get("charset", "utf8mb4"),
+        autocommit=True,
+        **options,
+    )
+
+
+# ================================
+# 视图
+# ================================
+def read_view(plan):
+    """
+    把查询计划形式的视图 plan(request, user_id, ...) 包装成同步视图，异步版本为 view.async_view
+    计划直接返回 HttpResponse (json_cn 不访问数据库，两种视图都能用)
+    user_id 是当前登录用户 (未登录为 None)，在进入计划前读出：读 session 要访问 session 缓存 / 数据库，
+    异步视图里放到线程中执行，计划本身不要再访问 request.session
+    """
+    @functools.wraps(plan)
+    def view(request, *args, **kwargs):
+        return run_sync(plan(request, request.session.get("user_id"), *args, **kwargs))
+
+    async def async_view(request, *args, **kwargs):
+        user_id = await sync_to_async(request.session.get)("user_id")
+        return await run_async(plan(request, user_id, *args, **kwargs))
+
+    functools.update_wrapper(async_view, plan)
+    view.async_view = async_view
+    return view
+
+
+def route(view):
+    "urls.py 使用：ASYNC_READ_VIEWS 打开时返回视图的异步版本"
+    async_view = getattr(view, "async_view", None)
+    if async_view is None or not getattr(settings, "ASYNC_READ_VIEWS", False):
+        return view
+    # Django 4.2 的 csrf_exempt 包装后不再是协程函数，这里直接设置标记
+    async_view.csrf_exempt = getattr(view, "csrf_exempt", False)
+    return async_view
@@ -1,8 +1,64 @@
 # 评论模块
 import json
-from django.db import connection
+from django.db import connection, transaction
 from django.views.decorators.csrf import csrf_exempt
 from .tools import *
+from .asyncDb import read_view
+from .commentFeed import comment_order, comment_page_plan
+from .commentStats import VISIBLE, comment_count_plan, comment_stats, hot_comments, set_comment_status
+from .commentThread import delete_thread, load_thread, thread_limits
+from .jsonStream import json_stream, stream_rows
+from .likeBuffer import like
+from .moderationQueue import REASON_NEW, REASON_REPORTED, enqueue_comment
+
+
+# 自己发布的评论 (get_my_comments)
+MY_COMMENTS_SQL = """
+    SELECT comment_id, target_type, target_id, content, like_count, comment_time, status
+    FROM Comment
+    WHERE user_id = %s
+    ORDER BY comment_time DESC
+"""
+
+# 用户在各类对象下的评论 (list_comment)，目标类型 -> SQL
+USER_COMMENTS_SQL = {
+    "song": """
+        SELECT
+            s.song_id,
+            c.comment_id,
+            c.content,
+            c.like_count,
+            c.comment_time
+        FROM Comment c
+        JOIN Song s ON s.song_id = c.target_id
+        WHERE c.user_id = %s AND c.target_type = 'song'
+        ORDER BY c.comment_time DESC
+    """,
+    "album": """
+        SELECT
+            a.album_id,
+            c.comment_id,
+            c.content,
+            c.like_count,
+            c.comment_time
+        FROM Comment c
+        JOIN Album a ON a.album_id = c.target_id
+        WHERE c.user_id = %s AND c.target_type = 'album'
+        ORDER BY c.comment_time DESC
+    """,
+    "songlist": """
+        SELECT
+            sl.songlist_id,
+            c.comment_id,
+            c.content,
+            c.like_count,
+            c.comment_time
+        FROM Comment c
+        JOIN Songlist sl ON sl.songlist_id = c.target_id
+        WHERE c.user_id = %s AND c.target_type = 'songlist'
+        ORDER BY c.comment_time DESC
+    """,
+}
 
 
 # ================================
@@ -38,8 +94,12 @@ def publish_comment(request):
           VALUES (%s, %s, %s, %s, %s, %s, 0, NOW()) \
           """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [current_user_id, target_type, target_id, content, parent_id, status])
+    # 评论和审核任务一起写入
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [current_user_id, target_type, target_id, content, parent_id, status])
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            enqueue_comment(cursor, cursor.fetchone()[0], REASON_NEW)
 
     return json_cn({"message": "评论发布成功，正在进行安全审核"})
 
@@ -94,30 +154,10 @@ def delete_comment(request):
     if not can_delete:
         return json_cn({"error": "无权删除此评论"}, 403)
 
-    # 执行删除
-    # 级联删除
-    def recursive_delete_comment(cursor, cid):
-        """
-        递归删除评论及其所有子评论
-        """
-        # 第一步：查找当前评论的所有子评论（回复）
-        sql_find_children = "SELECT comment_id FROM Comment WHERE parent_id = %s"
-        cursor.execute(sql_find_children, [cid])
-        children = cursor.fetchall()
-
-        # 第二步：对每一个子评论，递归调用删除
-        for child in children:
-            child_id = child[0]
-            recursive_delete_comment(cursor, child_id)
-
-        # 第三步：子孙都删完了，删除自己
-        sql_delete_self = "DELETE FROM Comment WHERE comment_id = %s"
-        cursor.execute(sql_delete_self, [cid])
-
+    # 执行删除：评论及其各级回复一起删除
     try:
         with connection.cursor() as cursor:
-            # 调用递归函数
-            recursive_delete_comment(cursor, comment_id)
+            delete_thread(cursor, comment_id)
 
         return json_cn({"message": "评论及其回复已成功删除"})
 
@@ -144,17 +184,24 @@ def action_comment(request):
         return json_cn({"error": "参数缺失"}, 400)
 
     if action == 'like':
-        # 只能直接增加计数
-        sql = "UPDATE Comment SET like_count = like_count + 1 WHERE comment_id = %s"
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [comment_id])
+        # 同一用户对同一条评论只计一次，like_count 由后台批量更新
+        if "user_id" not in request.session:
+            return json_cn({"error": "请先登录后再点赞"}, 403)
+        try:
+            comment_id = int(comment_id)
+        except (TypeError, ValueError):
+            return json_cn({"error": "comment_id 必须为整数"}, 400)
+        if not like(request.session["user_id"], "comment", comment_id):
+            return json_cn({"message": "已经点过赞了"})
         return json_cn({"message": "点赞成功"})
 
     elif action == 'report':
         # 举报：将状态改为 '举报中'
-        sql = "UPDATE Comment SET status = '举报中' WHERE comment_id = %s"
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [comment_id])
+        # 可见评论被举报后不再计入评论数
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                set_comment_status(cursor, comment_id, REASON_REPORTED)
+                enqueue_comment(cursor, comment_id, REASON_REPORTED)
         return json_cn({"message": "举报成功，等待管理员审核"})
 
     else:
@@ -164,47 +211,46 @@ def action_comment(request):
 # ================================
 # 4. 查看歌曲/专辑/歌单的评论列表 
 # ================================
-# 支持按热度(like_count)或时间(comment_time)排序
-def get_comments_by_target(request):
+# 支持按热度(like_count)或时间(comment_time)排序，游标分页
+# 查询计划形式 (见 asyncDb)，同时提供同步和异步视图
+@read_view
+def get_comments_by_target(request, user_id):
     if request.method != "GET":
         return json_cn({"error": "GET required"}, 400)
 
     # GET请求从 query_params 获取
     target_type = request.GET.get("target_type")
     target_id = request.GET.get("target_id")
-    sort_by = request.GET.get("sort_by", "time")  # 'time' or 'hot'
+    sort_by = comment_order(request.GET.get("sort_by", "time"))  # 'time' or 'hot'
 
     if not target_type or not target_id:
         return json_cn({"error": "参数缺失"}, 400)
 
-    # SQL: 关联 User 表以获取用户名，只获取一级评论 (parent_id IS NULL)
-    # 子评论(回复)通常在详情里看，或者另外获取
-    sql = """
-          SELECT c.comment_id, \
-                 c.content, \
-                 c.like_count, \
-                 c.comment_time, \
-                 c.user_id,
-                 u.user_name, \
-                 u.profile
-          FROM Comment c
-                   JOIN User u ON c.user_id = u.user_id
-          WHERE c.target_type = %s
-            AND c.target_id = %s
-            AND c.parent_id IS NULL
-            AND c.status = '正常' \
-          """
-
-    if sort_by == 'hot':
-        sql += " ORDER BY c.like_count DESC, c.comment_time DESC"
-    else:
-        sql += " ORDER BY c.comment_time DESC"
+    try:
+        target_id = int(target_id)
+    except ValueError:
+        return json_cn({"error": "target_id 必须为整数"}, 400)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [target_type, target_id])
-        comments = dictfetchall(cursor)
+    # 只获取一级评论 (parent_id IS NULL)，子评论(回复)在详情里看
+    # 总数读计数表，不再 COUNT(*)
+    try:
+        comments, next_cursor = yield from comment_page_plan(
+            target_type, target_id, sort_by,
+            page_size=get_page_size(request.GET),
+            cursor_token=request.GET.get("cursor"),
+        )
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+    total = yield from comment_count_plan(target_type, target_id)
 
-    return json_cn({"comments": comments, "count": len(comments)})
+    return json_cn({
+        "comments": comments,
+        "count": len(comments),
+        "total": total,
+        "sort_by": sort_by,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
 
 
 # ================================
@@ -218,54 +264,33 @@ def get_comment_detail(request):
     if not comment_id:
         return json_cn({"error": "未检测到评论ID"}, 400)
 
+    # 回复的层数和条数上限，可由前端调小
+    try:
+        max_depth, max_size = thread_limits(request.GET.get("max_depth"), request.GET.get("max_size"))
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    # 主评论及其各级回复 (嵌套在每条评论的 replies 中)
     with connection.cursor() as cursor:
-        # 1. 获取主评论信息
-        sql_main = """
-                   SELECT c.comment_id, \
-                          c.content, \
-                          c.like_count, \
-                          c.comment_time, \
-                          c.user_id,
-                          u.user_name, \
-                          c.target_type, \
-                          c.target_id
-                   FROM Comment c
-                            JOIN User u ON c.user_id = u.user_id
-                   WHERE c.comment_id = %s \
-                   """
-        cursor.execute(sql_main, [comment_id])
-        main_rows = dictfetchall(cursor)
-
-        if not main_rows:
-            return json_cn({"error": "评论不存在或已删除"}, 404)
-        main_comment = main_rows[0]
-
-        # 2. 获取该评论下的回复 (parent_id = comment_id)
-        sql_replies = """
-                      SELECT c.comment_id, \
-                             c.content, \
-                             c.like_count, \
-                             c.comment_time, \
-                             c.user_id,
-                             u.user_name
-                      FROM Comment c
-                               JOIN User u ON c.user_id = u.user_id
-                      WHERE c.parent_id = %s \
-                        AND c.status = '正常'
-                      ORDER BY c.comment_time ASC \
-                      """
-        cursor.execute(sql_replies, [comment_id])
-        replies = dictfetchall(cursor)
+        main_comment, reply_count, truncated = load_thread(cursor, comment_id, max_depth, max_size)
+
+    if main_comment is None:
+        return json_cn({"error": "评论不存在或已删除"}, 404)
+
+    replies = main_comment.pop("replies")
 
     return json_cn({
         "comment": main_comment,
-        "replies": replies
+        "replies": replies,
+        "reply_count": reply_count,
+        "truncated": truncated
     })
 
 
 # ================================
 # 6. 查看自己发布的评论
 # ================================ 
+# 流式返回 (见 jsonStream)
 def get_my_comments(request):
     if request.method != "GET":
         return json_cn({"error": "GET required"}, 400)
@@ -275,24 +300,14 @@ def get_my_comments(request):
     if not current_user_id:
         return json_cn({"error": "请先登录"}, 401)
 
-    sql = """
-          SELECT comment_id, target_type, target_id, content, like_count, comment_time, status
-          FROM Comment
-          WHERE user_id = %s
-          ORDER BY comment_time DESC \
-          """
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [current_user_id])
-        comments = dictfetchall(cursor)
-
-    return json_cn({"my_comments": comments})
+    return json_stream({"my_comments": stream_rows(MY_COMMENTS_SQL, [current_user_id])})
 
 
 # ================================
 # 7. 查看评论统计信息
 # ================================ 
 # 显示某对象的总评论数、最热评论
+# 统计读 Comment_Stats，最热评论取内存中热门评论的第一条，不再对 Comment 做 COUNT(*) / 排序
 def get_comment_stats(request):
     if request.method != "GET":
         return json_cn({"error": "GET required"}, 400)
@@ -303,36 +318,42 @@ def get_comment_stats(request):
     if not target_type or not target_id:
         return json_cn({"error": "参数缺失"}, 400)
 
+    try:
+        target_id = int(target_id)
+    except ValueError:
+        return json_cn({"error": "target_id 必须为整数"}, 400)
+
     with connection.cursor() as cursor:
-        # 1. 统计总数
-        sql_count = """
-                    SELECT COUNT(*) \
-                    FROM Comment
-                    WHERE target_type = %s \
-                      AND target_id = %s \
-                      AND status = '正常' \
-                    """
-        cursor.execute(sql_count, [target_type, target_id])
-        total_count = cursor.fetchone()[0]
+        # 1. 统计总数 (一级评论 + 回复)
+        stats = comment_stats(cursor, target_type, target_id)
 
         # 2. 获取最热的一条评论 (Hot Comment)
-        sql_hot = """
-                  SELECT c.comment_id, c.content, c.like_count, u.user_name
-                  FROM Comment c
-                           JOIN User u ON c.user_id = u.user_id
-                  WHERE c.target_type = %s \
-                    AND c.target_id = %s \
-                    AND c.status = '正常'
-                  ORDER BY c.like_count DESC LIMIT 1 \
-                  """
-        cursor.execute(sql_hot, [target_type, target_id])
-        hot_rows = dictfetchall(cursor)
-        hot_comment = hot_rows[0] if hot_rows else None
+        # 内存中的热门评论可能已被其他进程删除 / 隐藏：读不到时丢掉内存数据，从数据库重新加载后再取一次
+        hot_comment = None
+        for _ in range(2):
+            top = hot_comments.top(target_type, target_id, 1)
+            if not top:
+                break
+            sql_hot = """
+                      SELECT c.comment_id, c.content, c.like_count, u.user_name
+                      FROM Comment c
+                               JOIN User u ON c.user_id = u.user_id
+                      WHERE c.comment_id = %s AND c.status = %s \
+                      """
+            cursor.execute(sql_hot, [top[0][0], VISIBLE])
+            hot_rows = dictfetchall(cursor)
+            if hot_rows:
+                hot_comment = hot_rows[0]
+                break
+            hot_comments.invalidate(target_type, target_id)
 
     return json_cn({
         "target_type": target_type,
         "target_id": target_id,
-        "total_comments": total_count,
+        "total_comments": stats["comment_count"] + stats["reply_count"],
+        "comment_count": stats["comment_count"],
+        "reply_count": stats["reply_count"],
+        "like_total": stats["like_total"],
         "hot_comment": hot_comment
     })
 
@@ -353,21 +374,8 @@ def list_comment(request):
     # --------------------------
     # 2. 获取歌曲的评论
     # --------------------------
-    sql_song = """
-        SELECT 
-            s.song_id,
-            c.comment_id,
-            c.content,
-            c.like_count,
-            c.comment_time
-        FROM Comment c
-        JOIN Song s ON s.song_id = c.target_id 
-        WHERE c.user_id = %s AND c.target_type = 'song'
-        ORDER BY c.comment_time DESC
-    """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql_song, [uid])
+        cursor.execute(USER_COMMENTS_SQL["song"], [uid])
         songs = cursor.fetchall()
 
     song_count = len(songs)
@@ -375,21 +383,8 @@ def list_comment(request):
     # --------------------------
     # 3. 获取专辑的评论
     # --------------------------
-    sql_album = """
-        SELECT 
-            a.album_id,
-            c.comment_id,
-            c.content,
-            c.like_count,
-            c.comment_time
-        FROM Comment c
-        JOIN Album a ON a.album_id = c.target_id
-        WHERE c.user_id = %s AND c.target_type = 'album'
-        ORDER BY c.comment_time DESC
-    """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql_album, [uid])
+        cursor.execute(USER_COMMENTS_SQL["album"], [uid])
         albums = cursor.fetchall()
 
     album_count = len(albums)
@@ -397,21 +392,8 @@ def list_comment(request):
     # --------------------------
     # 4. 获取歌单的评论
     # --------------------------
-    sql_songlist = """
-        SELECT 
-            sl.songlist_id,
-            c.comment_id,
-            c.content,
-            c.like_count,
-            c.comment_time
-        FROM Comment c
-        JOIN Songlist sl ON sl.songlist_id = c.target_id
-        WHERE c.user_id = %s AND c.target_type = 'songlist'
-        ORDER BY c.comment_time DESC
-    """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql_songlist, [uid])
+        cursor.execute(USER_COMMENTS_SQL["songlist"], [uid])
         songlists = cursor.fetchall()
 
     songlist_count = len(songlists)
@@ -491,10 +473,10 @@ def report_comment(request):
 
     # 2. 执行举报
     # 逻辑：不管它之前是什么状态，只要有人举报，就改为 '举报中'，等待管理员处理
-    sql = "UPDATE Comment SET status = '举报中' WHERE comment_id = %s"
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [comment_id])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            set_comment_status(cursor, comment_id, REASON_REPORTED)
+            enqueue_comment(cursor, comment_id, REASON_REPORTED)
 
     # 虽然 SystemLog 主要记管理员操作，但这里也可以借用一下
     # add_system_log(f"用户举报评论: {reason}", "Comment", comment_id, "success")
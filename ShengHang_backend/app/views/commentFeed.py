@@ -0,0 +1,152 @@
+# 评论列表分页
+# 原先评论列表和歌曲 / 专辑 / 歌单详情一次返回目标下的全部评论，热门歌曲的评论有几十万条时响应有好几 MB。这里改为
+# 游标分页：按时间 (comment_time, comment_id) 或按热度 (like_count, comment_id) 倒序做 keyset 翻页，
+# 每页只读 page_size + 1 行，翻到多深都一样快；详情页只带第一页、下一页游标和评论总数 (读 Comment_Stats)
+# 按热度排序的第一页优先从内存中的热门评论 (commentStats.hot_comments) 取 id，再按主键读取
+from datetime import timezone as dt_timezone
+from django.conf import settings
+
+from .asyncDb import Gather, Query, run_sync
+from .commentStats import VISIBLE, comment_count_plan, hot_comments
+from .tools import decode_cursor, keyset_condition, split_page
+
+
+# 每条评论返回的列
+COMMENT_COLUMNS = "c.comment_id, c.content, c.like_count, c.comment_time, c.user_id, u.user_name, u.profile"
+
+# 排序方式 -> 排序列 (都按倒序，同值再按 comment_id 倒序)
+ORDERS = {
+    "time": "c.comment_time",
+    "hot": "c.like_count",
+}
+
+
+# ================================
+# 分页读取
+# ================================
+def comment_order(value):
+    "sort_by 参数：'hot' 按热度，其他按时间"
+    return "hot" if value == "hot" else "time"
+
+
+def _cursor_value(value):
+    # 游标里保存数据库中的原值 (UTC、不带时区、保留微秒)，避免序列化时丢精度
+    if hasattr(value, "isoformat"):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        return value.isoformat(sep=" ")
+    return value
+
+
+def fetch_comment_page(cursor, target_type, target_id, sort_by="time", page_size=None, cursor_token=None):
+    """
+    读取目标下的一页可见一级评论，按时间或热度倒序
+    游标只对同一目标、同一排序方式有效，格式错误时抛出 ValueError
+    :return: (评论列表, 下一页游标或 None)
+    """
+    return run_sync(comment_page_plan(target_type, target_id, sort_by, page_size, cursor_token), cursor)
+
+
+def comment_page_plan(target_type, target_id, sort_by="time", page_size=None, cursor_token=None):
+    "fetch_comment_page 的查询计划 (见 asyncDb)"
+    sort_by = comment_order(sort_by)
+    sort_expr = ORDERS[sort_by]
+    if page_size is None:
+        page_size = getattr(settings, "PROFILE_COMMENT_PAGE_SIZE", 20)
+    order_key = f"comments:{sort_by}:{target_type}:{int(target_id)}"
+    last_values = decode_cursor(cursor_token, order_key)
+
+    if sort_by == "hot" and not last_values:
+        rows = yield from _hot_first_page(target_type, target_id, page_size)
+        if rows is not None:
+            return split_page(rows, page_size, order_key, lambda row: [row["like_count"], row["comment_id"]])
+
+    filters = ["c.target_type = %s", "c.target_id = %s", "c.status = %s", "c.parent_id IS NULL"]
+    params = [target_type, target_id, VISIBLE]
+    if last_values:
+        cond, cond_params = keyset_condition(sort_expr, "c.comment_id", "DESC", last_values)
+        filters.append(cond)
+        params += cond_params
+
+    rows = yield Query(
+        f"""
+        SELECT {COMMENT_COLUMNS}
+        FROM Comment c
+        JOIN User u ON c.user_id = u.user_id
+        WHERE {" AND ".join(filters)}
+        ORDER BY {sort_expr} DESC, c.comment_id DESC
+        LIMIT %s
+        """,
+        params + [page_size + 1],
+        fetch="dicts",
+    )
+
+    sort_column = sort_expr.split(".")[1]
+    return split_page(rows, page_size, order_key,
+                      lambda row: [_cursor_value(row[sort_column]), row["comment_id"]])
+
+
+def _hot_first_page(target_type, target_id, page_size):
+    """
+    用内存中的热门评论拼出按热度排序的第一页 (多取一行)，按主键读取评论内容
+    超出内存范围、或有评论已被其他进程删除 / 隐藏时返回 None，由调用方回退到 SQL 排序
+    """
+    top = yield from hot_comments.top_plan(target_type, target_id, page_size + 1)
+    if not top:
+        return None if top is None else []
+
+    ids = [comment_id for comment_id, _ in top]
+    rows = yield comments_by_id_query(ids)
+    if len(rows) != len(ids):
+        hot_comments.invalidate(target_type, target_id)
+        return None
+    # 按数据库中的点赞数排序，保证下一页游标与 SQL 翻页一致
+    rows.sort(key=lambda row: (row["like_count"], row["comment_id"]), reverse=True)
+    return rows
+
+
+def comments_by_id_query(ids):
+    "按主键读取可见评论 (行的顺序不定)"
+    return Query(
+        f"""
+        SELECT {COMMENT_COLUMNS}
+        FROM Comment c
+        JOIN User u ON c.user_id = u.user_id
+        WHERE c.comment_id IN ({", ".join(["%s"] * len(ids))}) AND c.status = %s
+        """,
+        [*ids, VISIBLE],
+        fetch="dicts",
+    )
+
+
+def profile_comments(target_type, target_id):
+    """
+    歌曲 / 专辑 / 歌单详情附带的评论：按时间倒序的第一页和评论总数
+    后续页通过评论列表接口用 comments_next_cursor 翻页
+    """
+    return run_sync(profile_comments_plan(target_type, target_id))
+
+
+def profile_comments_plan(target_type, target_id):
+    "profile_comments 的查询计划 (见 asyncDb)"
+    # 第一页与总数同时查询
+    (rows, next_cursor), total = yield Gather(
+        comment_page_plan(target_type, target_id, "time"),
+        comment_count_plan(target_type, target_id),
+    )
+
+    comments = []
+    for row in rows:
+        comments.append({
+            "comment_id": row["comment_id"],
+            "user_id": row["user_id"],
+            "user_name": row["user_name"],
+            "content": row["content"],
+            "like_count": row["like_count"],
+            "comment_time": row["comment_time"].strftime("%Y-%m-%d %H:%M") if row["comment_time"] else None
+        })
+    return {
+        "comment_count": total,
+        "comments": comments,
+        "comments_next_cursor": next_cursor,
+    }
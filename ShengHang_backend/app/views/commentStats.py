@@ -0,0 +1,320 @@
+# 评论统计与热门评论
+# 原先评论统计每次请求都对 Comment 做 COUNT(*) 和 ORDER BY like_count LIMIT 1，这里改为：
+#   - Comment_Stats：每个 (target_type, target_id) 一行，记录可见 (状态为 '正常') 的一级评论数、回复数和点赞总数，
+#     审核、举报、点赞、删除评论时在同一事务里增减；发布的评论先进入审核，通过审核时才计入
+#   - HotComments：每个目标在内存中保存点赞数最多的前 COMMENT_HOT_SIZE 条可见一级评论，
+#     本进程内的点赞、审核、删除直接更新它 (事务提交后)，按热度排序的第一页和最热评论不用再排序查询；
+#     每隔 COMMENT_HOT_RECONCILE 秒按索引重新加载一次，同步其他进程中的修改
+# 统计与评论表不一致时可用 manage.py rebuild_comment_stats 从 Comment 重建
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+from .asyncDb import Query, run_sync
+from .localRedis import LocalRedis
+
+
+VISIBLE = "正常"
+
+
+# ================================
+# 统计表维护 (在修改评论的事务中调用)
+# ================================
+def add_comment_stats(cursor, target_type, target_id, comments=0, replies=0, likes=0):
+    "增减目标的一级评论数、回复数、点赞总数"
+    cursor.execute(
+        """
+        INSERT INTO Comment_Stats (target_type, target_id, comment_count, reply_count, like_total)
+        VALUES (%s, %s, GREATEST(%s, 0), GREATEST(%s, 0), GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE comment_count = GREATEST(comment_count + %s, 0),
+                                reply_count = GREATEST(reply_count + %s, 0),
+                                like_total = GREATEST(like_total + %s, 0)
+        """,
+        [target_type, target_id, comments, replies, likes, comments, replies, likes],
+    )
+
+
+def set_comment_status(cursor, comment_id, status):
+    """
+    修改评论状态，评论变为可见 / 不再可见时同步增减统计和热门评论
+    :return: 评论是否存在
+    """
+    return bool(set_comments_status(cursor, [comment_id], status))
+
+
+def set_comments_status(cursor, comment_ids, status):
+    """
+    批量修改评论状态 (一条 UPDATE)，统计按目标合并后每个目标更新一次
+    :return: 实际存在的评论 id 列表
+    """
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(comment_ids))
+    with transaction.atomic():
+        cursor.execute(
+            f"""
+            SELECT comment_id, target_type, target_id, parent_id, status, like_count
+            FROM Comment
+            WHERE comment_id IN ({placeholders})
+            FOR UPDATE
+            """,
+            comment_ids,
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return []
+        cursor.execute(
+            f"UPDATE Comment SET status = %s WHERE comment_id IN ({', '.join(['%s'] * len(rows))})",
+            [status, *[row[0] for row in rows]],
+        )
+
+        deltas = {}         # (target_type, target_id) -> [一级评论, 回复, 点赞]
+        shown, hidden = [], []
+        for comment_id, target_type, target_id, parent_id, old_status, like_count in rows:
+            sign = (status == VISIBLE) - (old_status == VISIBLE)
+            if not sign:
+                continue
+            delta = deltas.setdefault((target_type, target_id), [0, 0, 0])
+            delta[0 if parent_id is None else 1] += sign
+            delta[2] += sign * like_count
+            if parent_id is None:
+                (shown if sign > 0 else hidden).append((target_type, target_id, comment_id, like_count))
+
+        for (target_type, target_id), (comments, replies, likes) in sorted(deltas.items()):
+            add_comment_stats(cursor, target_type, target_id, comments, replies, likes)
+
+        if shown or hidden:
+            def update_hot():
+                for target_type, target_id, comment_id, like_count in shown:
+                    hot_comments.record(target_type, target_id, comment_id, like_count)
+                for target_type, target_id, comment_id, _ in hidden:
+                    hot_comments.discard(target_type, target_id, [comment_id])
+            transaction.on_commit(update_hot)
+    return [row[0] for row in rows]
+
+
+def like_comment(cursor, comment_id, delta=1):
+    """
+    评论点赞数加 delta，可见评论同步更新点赞总数和热门评论
+    :return: 更新后的点赞数，评论不存在时返回 None
+    """
+    with transaction.atomic():
+        cursor.execute("UPDATE Comment SET like_count = like_count + %s WHERE comment_id = %s", [delta, comment_id])
+        if not cursor.rowcount:
+            return None
+        cursor.execute(
+            "SELECT target_type, target_id, parent_id, status, like_count FROM Comment WHERE comment_id = %s",
+            [comment_id],
+        )
+        target_type, target_id, parent_id, status, like_count = cursor.fetchone()
+        if status == VISIBLE:
+            add_comment_stats(cursor, target_type, target_id, likes=delta)
+            if parent_id is None:
+                transaction.on_commit(
+                    lambda: hot_comments.record(target_type, target_id, comment_id, like_count))
+    return like_count
+
+
+def _uncount(cursor, where, params, comment_ids=None):
+    "把满足条件的可见评论从统计中减掉 (删除之前调用)"
+    cursor.execute(
+        f"""
+        SELECT target_type, target_id,
+               SUM(parent_id IS NULL), SUM(parent_id IS NOT NULL), SUM(like_count)
+        FROM Comment
+        WHERE {where} AND status = %s
+        GROUP BY target_type, target_id
+        """,
+        [*params, VISIBLE],
+    )
+    targets = []
+    for target_type, target_id, comments, replies, likes in cursor.fetchall():
+        add_comment_stats(cursor, target_type, target_id, -int(comments), -int(replies), -int(likes or 0))
+        targets.append((target_type, target_id))
+
+    def forget():
+        for target_type, target_id in targets:
+            if comment_ids is None:
+                hot_comments.invalidate(target_type, target_id)
+            else:
+                hot_comments.discard(target_type, target_id, comment_ids)
+
+    if targets:
+        transaction.on_commit(forget)
+
+
+def uncount_comments(cursor, comment_ids):
+    "删除评论之前调用：其中的可见评论从所在目标的统计中减掉"
+    comment_ids = list(comment_ids)
+    if comment_ids:
+        _uncount(cursor, f"comment_id IN ({', '.join(['%s'] * len(comment_ids))})", comment_ids, comment_ids)
+
+
+def uncount_user_comments(cursor, user_id):
+    "注销账号前调用：该用户的评论随账号一起删除"
+    _uncount(cursor, "user_id = %s", [user_id])
+
+
+# ================================
+# 查询
+# ================================
+def comment_stats(cursor, target_type, target_id):
+    """:return: {"comment_count": 一级评论数, "reply_count": 回复数, "like_total": 点赞总数}"""
+    return run_sync(comment_stats_plan(target_type, target_id), cursor)
+
+
+def comment_stats_plan(target_type, target_id):
+    "comment_stats 的查询计划 (见 asyncDb)"
+    row = yield Query(
+        """
+        SELECT comment_count, reply_count, like_total
+        FROM Comment_Stats
+        WHERE target_type = %s AND target_id = %s
+        """,
+        [target_type, target_id],
+        fetch="one",
+    )
+    row = row or (0, 0, 0)
+    return {"comment_count": row[0], "reply_count": row[1], "like_total": row[2]}
+
+
+def comment_count(cursor, target_type, target_id):
+    "目标下可见的一级评论条数"
+    return run_sync(comment_count_plan(target_type, target_id), cursor)
+
+
+def comment_count_plan(target_type, target_id):
+    stats = yield from comment_stats_plan(target_type, target_id)
+    return stats["comment_count"]
+
+
+def rebuild_comment_stats():
+    "从 Comment 表重新统计全部评论统计，返回统计行数"
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM Comment_Stats")
+            cursor.execute(
+                """
+                INSERT INTO Comment_Stats (target_type, target_id, comment_count, reply_count, like_total)
+                SELECT target_type, target_id, SUM(parent_id IS NULL), SUM(parent_id IS NOT NULL), SUM(like_count)
+                FROM Comment
+                WHERE status = %s
+                GROUP BY target_type, target_id
+                """,
+                [VISIBLE],
+            )
+            rows = cursor.rowcount
+    hot_comments.clear()
+    return rows
+
+
+# ================================
+# 内存中的热门评论
+# ================================
+# 加载一个目标的热门评论：点赞数最多的前 N 条可见一级评论
+HOT_COMMENTS_SQL = """
+    SELECT comment_id, like_count
+    FROM Comment
+    WHERE target_type = %s AND target_id = %s AND status = %s AND parent_id IS NULL
+    ORDER BY like_count DESC, comment_id DESC
+    LIMIT %s
+"""
+
+
+class HotComments:
+    def __init__(self, max_targets=10000):
+        self._lock = threading.Lock()
+        # (target_type, target_id) -> {"top": {comment_id: like_count}, "full": 加载时是否取满了 K 条, "loaded_at": 加载时间}
+        # 目标数超过 max_targets 时按最近最少使用淘汰
+        self._targets = LocalRedis(max_entries=max_targets)
+
+    @property
+    def size(self):
+        return getattr(settings, "COMMENT_HOT_SIZE", 50)
+
+    def top(self, target_type, target_id, limit):
+        """
+        :return: 点赞数最多的前 limit 条可见一级评论 [(comment_id, like_count), ...]，
+                 按点赞数降序，点赞数相同时 id 大的在前；limit 超出内存中保存的范围时返回 None
+        """
+        return run_sync(self.top_plan(target_type, target_id, limit))
+
+    def top_plan(self, target_type, target_id, limit):
+        "top 的查询计划 (见 asyncDb)，内存中的数据未过期时不查库"
+        if limit > self.size:
+            return None
+        key = (target_type, int(target_id))
+        reconcile = getattr(settings, "COMMENT_HOT_RECONCILE", 60)
+        with self._lock:
+            entry = self._targets.get(key)
+            fresh = entry is not None and time.time() - entry["loaded_at"] < reconcile
+            items = list(entry["top"].items()) if fresh else None
+        if items is None:
+            items = yield from self._load_plan(key)
+
+        items.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return items[:limit]
+
+    def record(self, target_type, target_id, comment_id, like_count):
+        "本进程内一级评论变为可见或点赞数变化后调用 (事务提交后)，like_count 为变化后的值"
+        comment_id = int(comment_id)
+        with self._lock:
+            entry = self._targets.get((target_type, int(target_id)))
+            if entry is None:
+                return
+            top = entry["top"]
+
+            if comment_id in top:
+                old = top[comment_id]
+                top[comment_id] = like_count
+                # 榜内评论的点赞数减少后，榜外可能有评论超过它，下次读取时重新加载
+                if like_count < old and entry["full"]:
+                    entry["loaded_at"] = 0
+                return
+
+            if len(top) < self.size and not entry["full"]:
+                # 未取满：加载时该目标的全部可见评论都在榜内，新评论直接加入
+                top[comment_id] = like_count
+                return
+
+            # 已取满：超过榜尾才替换进来，被挤出去的评论此后不在内存里
+            last_id = min(top, key=lambda cid: (top[cid], cid))
+            if (like_count, comment_id) > (top[last_id], last_id):
+                del top[last_id]
+                top[comment_id] = like_count
+                entry["full"] = True
+
+    def discard(self, target_type, target_id, comment_ids):
+        "评论被删除或不再可见后调用 (事务提交后)"
+        key = (target_type, int(target_id))
+        with self._lock:
+            entry = self._targets.get(key)
+            if entry is None:
+                return
+            removed = False
+            for comment_id in comment_ids:
+                removed = entry["top"].pop(int(comment_id), None) is not None or removed
+            if removed and entry["full"]:
+                # 榜外的评论要补进来，下次读取时重新加载
+                self._targets.delete(key)
+
+    def invalidate(self, target_type, target_id):
+        with self._lock:
+            self._targets.delete((target_type, int(target_id)))
+
+    def clear(self):
+        with self._lock:
+            self._targets.flushall()
+
+    def _load_plan(self, key):
+        target_type, target_id = key
+        rows = yield Query(HOT_COMMENTS_SQL, [target_type, target_id, VISIBLE, self.size])
+        rows = list(rows)
+        with self._lock:
+            self._targets.set(key, {"top": dict(rows), "full": len(rows) >= self.size, "loaded_at": time.time()})
+        return rows
+
+
+hot_comments = HotComments(max_targets=getattr(settings, "COMMENT_HOT_MAX_TARGETS", 10000))
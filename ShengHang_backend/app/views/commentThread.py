@@ -0,0 +1,148 @@
+# 评论楼 (评论及其各级回复)
+# 回复通过 Comment.parent_id 指向上一级评论。原先评论详情只查一层回复，删除评论时逐个节点 SELECT + DELETE；
+# 这里用递归 CTE (WITH RECURSIVE，MySQL 8.0+) 一次查出整棵回复树：
+#   - load_thread：固定 2 条查询，返回嵌套的评论树，受深度 / 条数上限限制
+#   - delete_thread：1 条查询取出整棵树的 id，再按批 DELETE
+from django.conf import settings
+from django.db import transaction
+
+from .commentStats import uncount_comments
+from .likeBuffer import delete_like_records
+from .moderationQueue import dequeue_comments
+
+
+# 单条 DELETE 语句最多删除的评论数
+DELETE_BATCH_SIZE = 1000
+
+# 一条评论的各级可见回复 (不含根评论)，按层优先，深度达到上限的节点带上是否还有回复
+# 参数: 根评论 id, 最大深度, 最大深度, 条数上限 + 1
+THREAD_SQL = """
+    WITH RECURSIVE thread (comment_id, depth) AS (
+        SELECT comment_id, 0 FROM Comment WHERE comment_id = %s
+        UNION ALL
+        SELECT c.comment_id, t.depth + 1
+        FROM Comment c
+        JOIN thread t ON c.parent_id = t.comment_id
+        WHERE t.depth < %s AND c.status = '正常'
+    )
+    SELECT c.comment_id, c.parent_id, t.depth, c.content, c.like_count, c.comment_time, c.user_id, u.user_name,
+           t.depth = %s AND EXISTS (
+               SELECT 1 FROM Comment r WHERE r.parent_id = c.comment_id AND r.status = '正常'
+           ) AS has_more_replies
+    FROM thread t
+    JOIN Comment c ON c.comment_id = t.comment_id
+    JOIN User u ON c.user_id = u.user_id
+    WHERE t.depth > 0
+    ORDER BY t.depth, c.comment_time, c.comment_id
+    LIMIT %s
+"""
+
+# 整棵评论树的 id (含根评论，不论状态和深度)
+THREAD_IDS_SQL = """
+    WITH RECURSIVE thread (comment_id) AS (
+        SELECT comment_id FROM Comment WHERE comment_id = %s
+        UNION ALL
+        SELECT c.comment_id
+        FROM Comment c
+        JOIN thread t ON c.parent_id = t.comment_id
+    )
+    SELECT comment_id FROM thread
+"""
+
+
+def thread_limits(max_depth=None, max_size=None):
+    "把请求参数限制在配置的上限内，返回 (max_depth, max_size)"
+    depth_limit = getattr(settings, "COMMENT_THREAD_MAX_DEPTH", 10)
+    size_limit = getattr(settings, "COMMENT_THREAD_MAX_SIZE", 500)
+    try:
+        max_depth = depth_limit if max_depth in (None, "") else int(max_depth)
+        max_size = size_limit if max_size in (None, "") else int(max_size)
+    except (TypeError, ValueError):
+        raise ValueError("max_depth / max_size 必须为整数")
+    return max(1, min(max_depth, depth_limit)), max(1, min(max_size, size_limit))
+
+
+def _comment_dict(row):
+    comment_id, parent_id, depth, content, like_count, comment_time, user_id, user_name = row
+    return {
+        "comment_id": comment_id,
+        "parent_id": parent_id,
+        "depth": depth,
+        "content": content,
+        "like_count": like_count,
+        "comment_time": comment_time,
+        "user_id": user_id,
+        "user_name": user_name,
+        "replies": [],
+    }
+
+
+# ================================
+# 读取评论楼
+# ================================
+def load_thread(cursor, comment_id, max_depth, max_size):
+    """
+    读取一条评论及其各级回复 (只含状态为 '正常' 的回复)
+    回复按层优先：先取浅层的回复，同一层按发布时间，超出 max_size 的部分被截掉
+    :return: 根评论 (带嵌套的 replies，深度达到上限且还有回复的节点 has_more_replies 为 True)，
+             回复条数，是否被截断；评论不存在时返回 (None, 0, False)
+    """
+    cursor.execute(
+        """
+        SELECT c.comment_id, c.parent_id, 0, c.content, c.like_count, c.comment_time, c.user_id, u.user_name,
+               c.target_type, c.target_id, c.status
+        FROM Comment c
+        JOIN User u ON c.user_id = u.user_id
+        WHERE c.comment_id = %s
+        """,
+        [comment_id],
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None, 0, False
+
+    root = _comment_dict(row[:8])
+    root["target_type"], root["target_id"], root["status"] = row[8:]
+
+    cursor.execute(THREAD_SQL, [comment_id, max_depth, max_depth, max_size + 1])
+    rows = cursor.fetchall()
+
+    truncated = len(rows) > max_size
+    nodes = {root["comment_id"]: root}
+    count = 0
+    for row in rows[:max_size]:
+        parent = nodes.get(row[1])
+        if parent is None:
+            continue
+        node = _comment_dict(row[:8])
+        if row[8]:
+            node["has_more_replies"] = True
+        parent["replies"].append(node)
+        nodes[node["comment_id"]] = node
+        count += 1
+
+    return root, count, truncated
+
+
+# ================================
+# 删除评论楼
+# ================================
+def delete_thread(cursor, comment_id):
+    """
+    删除一条评论及其全部回复 (不论状态和深度)
+    :return: 删除的评论 id 列表
+    """
+    with transaction.atomic():
+        cursor.execute(THREAD_IDS_SQL, [comment_id])
+        ids = [row[0] for row in cursor.fetchall()]
+
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            chunk = ids[start:start + DELETE_BATCH_SIZE]
+            uncount_comments(cursor, chunk)
+            delete_like_records(cursor, "comment", chunk)
+            cursor.execute(
+                f"DELETE FROM Comment WHERE comment_id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+        dequeue_comments(cursor, ids)
+    return ids
@@ -0,0 +1,98 @@
+# JSON 编码
+# json_cn 原先用 JsonResponse (标准库 json + DjangoJSONEncoder) 编码，所有接口都经过它。这里换成可替换的编码器：
+#   - JSON_BACKEND = "orjson" (默认)：orjson 编码，datetime / date / time / UUID / dataclass 原生支持，
+#     Decimal、timedelta 等由 DjangoJSONEncoder 兜底；没有安装 orjson 时自动回退到标准库
+#   - JSON_BACKEND = "stdlib"：标准库 json + DjangoJSONEncoder
+# 两种编码器都输出紧凑格式 (没有多余空格)、不转义中文；
+# datetime 的区别：DjangoJSONEncoder 把微秒截断到毫秒，orjson 保留完整微秒 (数据库 DATETIME 列没有小数秒时两者相同)
+#
+# RawJSON：已经编码好的 JSON，json_cn 原样发送。缓存中的详情数据 (profileCache) 写入缓存时编码一次，
+# 之后命中缓存不再重复编码
+#
+# 响应压缩见 app/middleware.py，编码器对比见 manage.py bench_json
+import dataclasses
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        # 行对象 (rowAdapter.fetch_rows) 编码成 JSON 对象；orjson 原生支持，不会走到这里
+        if dataclasses.is_dataclass(o) and not isinstance(o, type):
+            return {field.name: getattr(o, field.name) for field in dataclasses.fields(o)}
+        return super().default(o)
+
+
+_django_encoder = _Encoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps_stdlib(data):
+    return _django_encoder.encode(data).encode("utf-8")
+
+
+def _dumps_orjson(data):
+    # 非字符串的键 (如 {song_id: ...}) 与标准库一样转成字符串
+    return orjson.dumps(data, default=_django_encoder.default,
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+# 编码器名称 -> dumps(data) -> bytes
+BACKENDS = {
+    "stdlib": _dumps_stdlib,
+    "orjson": _dumps_orjson,
+}
+
+
+def get_backend():
+    "当前使用的编码器名称"
+    name = getattr(settings, "JSON_BACKEND", "orjson")
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(f"JSON_BACKEND 必须是 {', '.join(BACKENDS)} 之一，当前为 {name!r}")
+    if name == "orjson" and orjson is None:
+        return "stdlib"
+    return name
+
+
+def dumps(data, backend=None):
+    "把 data 编码成 JSON (bytes)，RawJSON 原样返回"
+    if isinstance(data, RawJSON):
+        return data.data
+    return BACKENDS[backend or get_backend()](data)
+
+
+class RawJSON:
+    "已经编码好的 JSON (bytes)"
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def encode(cls, value):
+        return cls(dumps(value))
+
+    def merge(self, extra):
+        """
+        JSON 对象追加 extra 中的字段，返回新的 RawJSON；extra 中的键不能与已有的键重复
+        用于缓存的详情数据再拼上每次单独查询的部分 (如评论第一页)
+        """
+        if not extra:
+            return self
+        tail = dumps(extra)
+        if self.data == b"{}":
+            return RawJSON(tail)
+        return RawJSON(self.data[:-1] + b"," + tail[1:])
+
+
+def encoded_loader(loader):
+    "包装 profile_cache 的 loader (查询计划)：查询结果编码成 RawJSON 后再放进缓存 (不存在时仍为 None)"
+    def load(obj_id):
+        value, tags = yield from loader(obj_id)
+        return (None if value is None else RawJSON.encode(value)), tags
+    return load
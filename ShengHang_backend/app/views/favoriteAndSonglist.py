@@ -1,9 +1,16 @@
 # 收藏与歌单模块
 
-from django.db import connection
+from django.db import connection, transaction
 from django.views.decorators.csrf import csrf_exempt
 import json
 from .tools import *
+from .searchIndex import search_index, match_filter, relevance_order
+from .invalidationBus import invalidation_bus, tag
+from .favoriteLeaderboard import favorite_leaderboard, increment_favorite_count
+from .commentFeed import profile_comments
+from .asyncDb import Gather, Query, read_view, submit
+from .jsonStream import Counter, json_stream, stream_rows
+from .likeBuffer import delete_like_records, like
 
 
 # ================================
@@ -136,6 +143,12 @@ def create_songlist(request):
 
     with connection.cursor() as cursor:
         cursor.execute(sql, [uid, songlist_title, description, is_public, cover_url])
+        # 获取新 ID
+        cursor.execute("SELECT LAST_INSERT_ID()")
+        new_songlist_id = cursor.fetchone()[0]
+
+    search_index.upsert("songlist", new_songlist_id, songlist_title)
+    invalidation_bus.publish([tag("songlist", new_songlist_id)])
 
     return json_cn({
         "message": f"成功创建歌单：{songlist_title}"
@@ -226,6 +239,9 @@ def edit_songlist(request, songlist_id):
             songlist_title, description, is_public, cover_url, songlist_id
         ])
 
+    search_index.upsert("songlist", songlist_id, songlist_title)
+    invalidation_bus.publish([tag("songlist", songlist_id)])
+
     return json_cn({
         "message": f"歌单修改成功：{songlist_title}",
         "songlist_id": songlist_id
@@ -278,33 +294,20 @@ def songlist_profile(request, songlist_id):
             s.song_id,
             s.song_title,
             s.duration,
-            a.album_title AS album_title,
-            sg.singer_id,
-            sg.singer_name
+            a.album_title AS album_title
         FROM Songlist_Song ss
         JOIN Song s ON ss.song_id = s.song_id
         JOIN Album a ON s.album_id = a.album_id
-        JOIN Song_Singer ss2 ON s.song_id = ss2.song_id
-        JOIN Singer sg ON ss2.singer_id = sg.singer_id
         WHERE ss.songlist_id = %s
         ORDER BY ss.add_time DESC
     """
 
-    sql_comment = """
-        SELECT 
-            u.user_id, u.user_name, c.comment_id, c.content, c.like_count, c.comment_time
-        FROM Comment c 
-        JOIN User u ON u.user_id = c.user_id
-        WHERE target_id = %s AND target_type = 'songlist'
-        ORDER BY comment_time DESC
-    """
-
     with connection.cursor() as cursor:
         cursor.execute(sql_songs, [songlist_id])
         song_rows = cursor.fetchall()
 
-        cursor.execute(sql_comment, [songlist_id])
-        comment_rows = cursor.fetchall()
+        # 批量查询所有歌曲的歌手
+        singers_map = fetch_singers_by_song_ids(cursor, [row[0] for row in song_rows])
 
     # --------------------------
     # 5. 计算总时长
@@ -315,31 +318,25 @@ def songlist_profile(request, songlist_id):
     # 6. 生成歌曲列表
     # --------------------------
     songs = []
-    for (sid, stitle, dur, album_title, singer_id, singer_name) in song_rows:
+    for (sid, stitle, dur, album_title) in song_rows:
+        song_singers = singers_map[sid]
         songs.append({
             "song_id": sid,
             "song_title": stitle,
             "duration": dur,
             "duration_formatted": format_time(dur),
             "album_title": album_title,
-            "singer_id": singer_id,
-            "singer_name": singer_name
+            # 兼容旧字段：singer_id 取第一位歌手，singer_name 为所有歌手名拼接
+            "singer_id": song_singers[0]["singer_id"] if song_singers else None,
+            "singer_name": ", ".join(sg["singer_name"] for sg in song_singers),
+            "singers": song_singers
         })
 
 
     # --------------------------
-    # 7. 生成歌单评论列表
+    # 7. 查询歌单评论 (第一页 + 总数)
     # --------------------------
-    comments = []
-    for user_id, user_name, comment_id, content, like_count, comment_time in comment_rows:
-        comments.append({
-            "comment_id": comment_id,
-            "user_id": user_id,
-            "user_name": user_name,
-            "content": content,
-            "like_count": like_count,
-            "comment_time": comment_time.strftime("%Y-%m-%d %H:%M") if comment_time else None
-        })
+    comments = profile_comments("songlist", songlist_id)
 
     # --------------------------
     # 8. 返回歌单详情
@@ -358,8 +355,7 @@ def songlist_profile(request, songlist_id):
         "total_duration": total_duration,
         "total_duration_formatted": format_time(total_duration),
         "songs": songs,
-        "comment_count": len(comments),
-        "comments": comments
+        **comments
     })
 
 
@@ -410,8 +406,13 @@ def delete_songlist(request, songlist_id):
         WHERE songlist_id = %s
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_delete, [songlist_id])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            delete_like_records(cursor, "songlist", [songlist_id])
+            cursor.execute(sql_delete, [songlist_id])
+
+    search_index.remove("songlist", songlist_id)
+    invalidation_bus.publish([tag("songlist", songlist_id)])
 
     return json_cn({
         "message": f"成功删除歌单：{title}",
@@ -658,14 +659,10 @@ def sort_songlist(request, songlist_id):
             s.song_title,
             s.duration,
             a.album_title AS album_title,
-            sg.singer_id,
-            sg.singer_name,
             ss.add_time
         FROM Songlist_Song ss
         JOIN Song s ON ss.song_id = s.song_id
         JOIN Album a ON s.album_id = a.album_id
-        JOIN Song_Singer ss2 ON s.song_id = ss2.song_id
-        JOIN Singer sg ON ss2.singer_id = sg.singer_id
         WHERE ss.songlist_id = %s
         ORDER BY {order_sql}
     """
@@ -674,19 +671,24 @@ def sort_songlist(request, songlist_id):
         cursor.execute(sql_songs, [songlist_id])
         rows = cursor.fetchall()
 
+        # 批量查询所有歌曲的歌手
+        singers_map = fetch_singers_by_song_ids(cursor, [row[0] for row in rows])
+
     # --------------------------
     # 5. 格式化返回数据
     # --------------------------
     songs = []
-    for sid, name, duration, album, singer_id, singer_name, add_time in rows:
+    for sid, name, duration, album, add_time in rows:
+        song_singers = singers_map[sid]
         songs.append({
             "song_id": sid,
             "song_title": name,
             "duration": duration,
             "duration_formatted": format_time(duration),
             "album_title": album,
-            "singer_id": singer_id,
-            "singer_name": singer_name,
+            "singer_id": song_singers[0]["singer_id"] if song_singers else None,
+            "singer_name": ", ".join(sg["singer_name"] for sg in song_singers),
+            "singers": song_singers,
             "add_time": add_time.strftime("%Y-%m-%d %H:%M") if add_time else None
         })
 
@@ -707,11 +709,11 @@ def sort_songlist(request, songlist_id):
 # 9. 搜索歌单
 # ================================
 @csrf_exempt
-def search_songlist(request):
+@read_view
+def search_songlist(request, user_id):
     # --------------------------
     # 1. 登录校验
     # --------------------------
-    user_id = request.session.get("user_id")
     if not user_id:
         return json_cn({"error": "请先登录"}, 403)
 
@@ -733,9 +735,10 @@ def search_songlist(request):
     filters = []
     params = []
 
+    # 歌单名条件优先走搜索索引，索引未就绪时回退到 LIKE
+    title_filter, title_params, title_ids = None, [], None
     if songlist_title:
-        filters.append("sl.songlist_title LIKE %s")
-        params.append(f"%{songlist_title}%")
+        title_filter, title_params, title_ids = match_filter("songlist", songlist_title, "sl.songlist_id", "sl.songlist_title")
     if user_name:
         filters.append("u.user_name LIKE %s")
         params.append(f"%{user_name}%")
@@ -744,13 +747,15 @@ def search_songlist(request):
     # --------------------------
     # 3. 查询结果排序
     # --------------------------
-    orderType = data.get("order")       # songs_count / user_name / sonlist_title / like_count
+    orderType = data.get("order")       # relevance / songs_count / user_name / sonlist_title / like_count
     orderDir = data.get("direction")    # asc / desc
     orderDir = "DESC" if str(orderDir).lower() == "desc" else "ASC"
     join = ""
 
-    if orderType == "songs_count":  
-        order = f"sls.songs_count {orderDir}"    # 默认按名字排序
+    if orderType == "relevance" and title_ids is not None:
+        sort_expr = "sl.songlist_id"    # 名次在 Python 中计算，这里只占位
+    elif orderType == "songs_count":  
+        sort_expr = "COALESCE(sls.songs_count, 0)"
         join = """LEFT JOIN (
                     SELECT songlist_id, COUNT(*) AS songs_count
                     FROM songlist_song
@@ -758,19 +763,55 @@ def search_songlist(request):
                 ) sls ON sls.songlist_id = sl.songlist_id
                 """
     elif orderType == "user_name":
-        order = f"u.user_name {orderDir}"
+        sort_expr = "u.user_name"
     elif orderType == "like_count":
-        order = f"sl.like_count {orderDir}"
+        sort_expr = "sl.like_count"
+    elif not orderType and title_ids is not None:
+        orderType = "relevance"         # 按歌单名搜索且索引可用时默认按相关度排序
+        sort_expr = "sl.songlist_id"
+    else:
+        orderType = "songlist_title"    # 默认按名字排序
+        sort_expr = "sl.songlist_title"
+
+
+    # --------------------------
+    # 4. 分页参数
+    # --------------------------
+    page_size = get_page_size(data)
+    order_key = f"songlist:{orderType}:{orderDir}"
+    try:
+        last_values = decode_cursor(data.get("cursor"), order_key, rank=orderType == "relevance")
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    # 总数只按搜索条件统计，不含分页条件
+    count_filters = filters + ([title_filter] if title_filter else [])
+    count_params = params + title_params
+
+    order_params = []
+    if orderType == "relevance":
+        cond, cond_params, order_clause, order_params, ranks = relevance_order("sl.songlist_id", title_ids, last_values)
+        filters.append(cond)
+        params += cond_params
+        key_func = lambda row: [ranks[row[0]], row[0]]
     else:
-        order = f"sl.songlist_title {orderDir}"
+        if title_filter:
+            filters.append(title_filter)
+            params += title_params
+        if last_values:
+            cond, cond_params = keyset_condition(sort_expr, "sl.songlist_id", orderDir, last_values)
+            filters.append(cond)
+            params += cond_params
+        order_clause = f"{sort_expr} {orderDir}, sl.songlist_id {orderDir}"
+        key_func = lambda row: [row[6], row[0]]
 
 
     # --------------------------
-    # 4. 查询歌单信息
+    # 5. 查询歌单信息
     # --------------------------
     sql_songlist = f"""
-        SELECT sl.songlist_id, sl.songlist_title, sl.cover_url, u.user_id, u.user_name, sl.like_count
-        {', COALESCE(sls.songs_count, 0) AS songs_count' if orderType == 'songs_count' else ''}
+        SELECT sl.songlist_id, sl.songlist_title, sl.cover_url, u.user_id, u.user_name, sl.like_count,
+               {sort_expr} AS sort_value
         FROM Songlist sl
         JOIN User u ON u.user_id = sl.user_id
         {join}
@@ -779,36 +820,46 @@ def search_songlist(request):
     if filters:
         sql_songlist += " WHERE " + " AND ".join(filters)
 
-    sql_songlist += f" ORDER BY {order}"
+    sql_songlist += f" ORDER BY {order_clause} LIMIT %s"
+    params += order_params + [page_size + 1]
 
+    sql_count = """
+        SELECT COUNT(*)
+        FROM Songlist sl
+        JOIN User u ON u.user_id = sl.user_id
+    """
+    if count_filters:
+        sql_count += " WHERE " + " AND ".join(count_filters)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_songlist, params)
-        rows = cursor.fetchall()
+    # 本页与总数同时查询
+    rows, (total,) = yield Gather(Query(sql_songlist, params), Query(sql_count, count_params, fetch="one"))
 
-        if not rows:
-            return json_cn({"message": "未找到符合歌单", "songlists": []})
-            
-        # --------------------------
-        # 5. 返回搜索结果
-        # --------------------------
-        songlists = []
-        for row in rows:
-            songlist_id, songlist_title, cover_url, user_id, user_name, like_count = row[:6]
-            songs_count = row[6] if orderType == "songs_count" else None
-            songlists.append({
-                "songlist_id": songlist_id,
-                "songlist_title": songlist_title,
-                "cover_url": cover_url,
-                "user_id": user_id,
-                "user_name": user_name,
-                "like_count": like_count,
-                "songs_count": songs_count
-            })
+    if not rows and not last_values:
+        return json_cn({"message": "未找到符合歌单", "songlists": []})
+
+    rows, next_cursor = split_page(rows, page_size, order_key, key_func)
+
+    # --------------------------
+    # 6. 返回搜索结果
+    # --------------------------
+    songlists = []
+    for row in rows:
+        songlist_id, songlist_title, cover_url, user_id, user_name, like_count, sort_value = row
+        songlists.append({
+            "songlist_id": songlist_id,
+            "songlist_title": songlist_title,
+            "cover_url": cover_url,
+            "user_id": user_id,
+            "user_name": user_name,
+            "like_count": like_count,
+            "songs_count": sort_value if orderType == "songs_count" else None
+        })
 
     return json_cn({
-        "total": len(songlists),
-        "songlists": songlists
+        "total": total,
+        "songlists": songlists,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
@@ -818,15 +869,20 @@ def search_songlist(request):
 # ================================
 @csrf_exempt
 def like_songlist(request, songlist_id):
-        
-    sql = """
-        UPDATE Songlist
-        SET like_count = like_count + 1
-        WHERE Songlist_id = %s;
-    """
+    # --------------------------
+    # 1. 检查登录状态 (按用户去重)
+    # --------------------------
+    if "user_id" not in request.session:
+        return json_cn({"error": "请先登录后再点赞"}, 403)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [songlist_id])
+    # --------------------------
+    # 2. 点赞：同一用户只计一次，like_count 由后台批量更新
+    # --------------------------
+    if not like(request.session["user_id"], "songlist", songlist_id):
+        return json_cn({
+            "message": "已经点过赞了",
+            "songlist_id": songlist_id
+        })
 
     return json_cn({
         "message": "点赞成功",
@@ -838,21 +894,10 @@ def like_songlist(request, songlist_id):
 # ================================
 # 11. 个人收藏
 # ================================
-@csrf_exempt
-def list_favorite(request):
-    # --------------------------
-    # 1. 必须登录
-    # --------------------------
-    if "user_id" not in request.session:
-        return json_cn({"error": "请先登录再查看收藏"}, 403)
-
-    uid = request.session["user_id"]
-
-    # --------------------------
-    # 2. 获取收藏的歌曲
-    # --------------------------
-    sql_song = """
-        SELECT 
+# 收藏类型 -> 收藏列表的 SQL
+FAVORITES_SQL = {
+    "song": """
+        SELECT
             s.song_id,
             s.song_title,
             s.duration,
@@ -861,21 +906,9 @@ def list_favorite(request):
         JOIN Song s ON f.target_id = s.song_id
         WHERE f.user_id = %s AND f.target_type = 'song'
         ORDER BY f.favorite_time DESC
-    """
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql_song, [uid])
-        songs = cursor.fetchall()
-
-    song_count = len(songs)
-    song_total_duration = sum([s[2] for s in songs]) if songs else 0
-
-
-    # --------------------------
-    # 3. 获取收藏的专辑
-    # --------------------------
-    sql_album = """
-        SELECT 
+    """,
+    "album": """
+        SELECT
             al.album_id,
             al.album_title,
             al.release_date,
@@ -884,19 +917,9 @@ def list_favorite(request):
         JOIN Album al ON f.target_id = al.album_id
         WHERE f.user_id = %s AND f.target_type = 'album'
         ORDER BY f.favorite_time DESC
-    """
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql_album, [uid])
-        albums = cursor.fetchall()
-
-    album_count = len(albums)
-
-    # --------------------------
-    # 4. 获取收藏的歌单
-    # --------------------------
-    sql_songlist = """
-        SELECT 
+    """,
+    "songlist": """
+        SELECT
             sl.songlist_id,
             sl.songlist_title,
             f.favorite_time
@@ -904,64 +927,84 @@ def list_favorite(request):
         JOIN Songlist sl ON f.target_id = sl.songlist_id
         WHERE f.user_id = %s AND f.target_type = 'songlist'
         ORDER BY f.favorite_time DESC
-    """
+    """,
+}
+
+# 是否已收藏 (收藏 / 取消收藏)
+FAVORITE_CHECK_SQL = """
+    SELECT 1
+    FROM Favorite
+    WHERE user_id = %s AND target_type = %s AND target_id = %s
+"""
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_songlist, [uid])
-        songlists = cursor.fetchall()
 
-    songlist_count = len(songlists)
+@csrf_exempt
+def list_favorite(request):
+    # --------------------------
+    # 1. 必须登录
+    # --------------------------
+    if "user_id" not in request.session:
+        return json_cn({"error": "请先登录再查看收藏"}, 403)
+
+    uid = request.session["user_id"]
 
     # --------------------------
-    # 5. 格式化返回数据
+    # 2. 格式化返回数据
     # --------------------------
+    def favorite_time(row):
+        ctime = row.favorite_time
+        return ctime.strftime("%Y-%m-%d %H:%M") if ctime else None
 
     # ---------- 收藏歌曲 ----------
-    favorite_songs = []
-    for sid, title, duration, ctime in songs:
-        favorite_songs.append({
-            "song_id": sid,
-            "song_title": title,
-            "duration": duration,
-            "duration_formatted": format_time(duration),
-            "favorite_time": ctime.strftime("%Y-%m-%d %H:%M") if ctime else None
-        })
+    def format_song(row):
+        return {
+            "song_id": row.song_id,
+            "song_title": row.song_title,
+            "duration": row.duration,
+            "duration_formatted": format_time(row.duration),
+            "favorite_time": favorite_time(row)
+        }
 
     # ---------- 收藏专辑 ----------
-    favorite_albums = []
-    for aid, title, date, ctime in albums:
-        favorite_albums.append({
-            "album_id": aid,
-            "album_title": title,
-            "release_date": str(date) if date else None,
-            "favorite_time": ctime.strftime("%Y-%m-%d %H:%M") if ctime else None
-        })
+    def format_album(row):
+        return {
+            "album_id": row.album_id,
+            "album_title": row.album_title,
+            "release_date": str(row.release_date) if row.release_date else None,
+            "favorite_time": favorite_time(row)
+        }
 
     # ---------- 收藏歌单 ----------
-    favorite_songlists = []
-    for lid, title, ctime in songlists:
-        favorite_songlists.append({
-            "songlist_id": lid,
-            "songlist_title": title,
-            "favorite_time": ctime.strftime("%Y-%m-%d %H:%M") if ctime else None
-        })
+    def format_songlist(row):
+        return {
+            "songlist_id": row.songlist_id,
+            "songlist_title": row.songlist_title,
+            "favorite_time": favorite_time(row)
+        }
+
+    # 收藏的专辑、歌单通常不多：分到查询线程池，在其他连接上与歌曲列表同时查询 (见 asyncDb.submit)
+    albums = submit(lambda: list(stream_rows(FAVORITES_SQL["album"], [uid], format_album)))
+    songlists = submit(lambda: list(stream_rows(FAVORITES_SQL["songlist"], [uid], format_songlist)))
+    songs = Counter(stream_rows(FAVORITES_SQL["song"], [uid], format_song), duration=lambda song: song["duration"])
 
     # ---------- 返回 ----------
-    return json_cn({
+    # 流式返回 (见 jsonStream)：歌曲列表在当前连接上边查边发，条数和总时长在列表之后输出；
+    # 发到专辑、歌单时取线程池中的结果 (一般早已查完)
+    return json_stream({
         "user_id": uid,
         "songs": {
-            "count": song_count,
-            "total_duration": song_total_duration,
-            "total_duration_formatted": format_time(song_total_duration),
-            "items": favorite_songs
+            "items": songs,
+            "count": lambda: songs.count,
+            "total_duration": lambda: songs.totals["duration"],
+            "total_duration_formatted": lambda: format_time(songs.totals["duration"])
         },
         "albums": {
-            "count": album_count,
-            "items": favorite_albums
+            "items": albums.result,
+            "count": lambda: len(albums.result())
         },
         "songlists": {
-            "count": songlist_count,
-            "items": favorite_songlists
+            "items": songlists.result,
+            "count": lambda: len(songlists.result())
         }
     })
 
@@ -1001,14 +1044,8 @@ def add_favorite(request):
     # --------------------------
     # 3. 检查是否已收藏
     # --------------------------
-    sql_check = f"""
-        SELECT 1
-        FROM Favorite
-        WHERE user_id = %s AND target_type = %s AND target_id = %s
-    """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql_check, [uid, target_type, target_id])
+        cursor.execute(FAVORITE_CHECK_SQL, [uid, target_type, target_id])
         exists = cursor.fetchone()
 
     if exists:
@@ -1022,8 +1059,13 @@ def add_favorite(request):
         VALUES(%s, %s, %s)
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_insert, [uid, target_type, target_id])
+    # 收藏记录和收藏计数在同一事务中更新
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql_insert, [uid, target_type, target_id])
+            fav_count = increment_favorite_count(cursor, target_type, target_id, 1)
+
+    favorite_leaderboard.record(target_type, target_id, fav_count)
 
     # --------------------------
     # 5. 返回成功
@@ -1069,14 +1111,8 @@ def delete_favorite(request):
     # --------------------------
     # 3. 检查是否已收藏
     # --------------------------
-    sql_check = f"""
-        SELECT 1
-        FROM Favorite
-        WHERE user_id = %s AND target_type = %s AND target_id = %s
-    """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql_check, [uid, target_type, target_id])
+        cursor.execute(FAVORITE_CHECK_SQL, [uid, target_type, target_id])
         exists = cursor.fetchone()
 
     if not exists:
@@ -1090,8 +1126,14 @@ def delete_favorite(request):
         WHERE user_id = %s AND target_type = %s AND target_id = %s
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_delete, [uid, target_type, target_id])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql_delete, [uid, target_type, target_id])
+            deleted = cursor.rowcount
+            fav_count = increment_favorite_count(cursor, target_type, target_id, -deleted) if deleted else None
+
+    if fav_count is not None:
+        favorite_leaderboard.record(target_type, target_id, fav_count)
 
     # --------------------------
     # 5. 返回成功
@@ -1106,6 +1148,26 @@ def delete_favorite(request):
 # ================================
 # 14. "我收藏的歌曲" 统计
 # ================================
+# 收藏歌曲总时长
+FAVORITE_SONGS_DURATION_SQL = """
+    SELECT SUM(s.duration)
+    FROM Favorite f
+    JOIN Song s ON f.target_id = s.song_id
+    WHERE f.user_id = %s
+      AND f.target_type = 'song'
+"""
+
+# 收藏歌曲列表
+FAVORITE_SONGS_SQL = """
+    SELECT s.song_id, s.song_title, s.duration, s.play_count, f.favorite_time
+    FROM Favorite f
+    JOIN Song s ON f.target_id = s.song_id
+    WHERE f.user_id = %s
+      AND f.target_type = 'song'
+    ORDER BY f.favorite_time DESC
+"""
+
+
 @csrf_exempt
 def get_my_favorite_songs_stats(request):
     """
@@ -1119,33 +1181,14 @@ def get_my_favorite_songs_stats(request):
 
     current_user_id = request.session["user_id"]
 
-    # 1. 计算收藏歌曲总时长
-    sql_duration = """
-        SELECT SUM(s.duration)
-        FROM Favorite f
-        JOIN Song s ON f.target_id = s.song_id
-        WHERE f.user_id = %s
-          AND f.target_type = 'song'
-    """
-
-    # 2. 获取歌曲列表
-    sql_list = """
-        SELECT s.song_id, s.song_title, s.duration, s.play_count, f.favorite_time
-        FROM Favorite f
-        JOIN Song s ON f.target_id = s.song_id
-        WHERE f.user_id = %s
-          AND f.target_type = 'song'
-        ORDER BY f.favorite_time DESC
-    """
-
     with connection.cursor() as cursor:
         # 总时长
-        cursor.execute(sql_duration, [current_user_id])
+        cursor.execute(FAVORITE_SONGS_DURATION_SQL, [current_user_id])
         duration_row = cursor.fetchone()
         total_duration = duration_row[0] if duration_row and duration_row[0] else 0
 
         # 歌曲列表
-        cursor.execute(sql_list, [current_user_id])
+        cursor.execute(FAVORITE_SONGS_SQL, [current_user_id])
         songs = dictfetchall(cursor)
 
     return json_cn({
@@ -1175,44 +1218,35 @@ def get_platform_top_favorites(request):
 
     # type: 'song', 'album', 'songlist'
     target_type = data.get("target_type", "song")
-    limit = data.get("limit", 10)  # 默认取前10
-
-    if target_type == 'song':
-        sql = """
-            SELECT f.target_id, COUNT(*) as fav_count, s.song_title as name
-            FROM Favorite f
-            JOIN Song s ON f.target_id = s.song_id
-            WHERE f.target_type = 'song'
-            GROUP BY f.target_id, s.song_title
-            ORDER BY fav_count DESC
-            LIMIT %s
-        """
-    elif target_type == 'album':
-        sql = """
-            SELECT f.target_id, COUNT(*) as fav_count, a.album_title as name
-            FROM Favorite f
-            JOIN Album a ON f.target_id = a.album_id
-            WHERE f.target_type = 'album'
-            GROUP BY f.target_id, a.album_title
-            ORDER BY fav_count DESC
-            LIMIT %s
-        """
-    elif target_type == 'songlist':
-        sql = """
-            SELECT f.target_id, COUNT(*) as fav_count, sl.songlist_title as name
-            FROM Favorite f
-            JOIN Songlist sl ON f.target_id = sl.songlist_id
-            WHERE f.target_type = 'songlist'
-            GROUP BY f.target_id, sl.songlist_title
-            ORDER BY fav_count DESC
-            LIMIT %s
-        """
-    else:
+    try:
+        limit = max(0, int(data.get("limit", 10)))  # 默认取前10
+    except (TypeError, ValueError):
+        return json_cn({"error": "limit 参数错误"}, 400)
+
+    name_sql = {
+        "song": "SELECT song_id, song_title FROM Song WHERE song_id IN ({})",
+        "album": "SELECT album_id, album_title FROM Album WHERE album_id IN ({})",
+        "songlist": "SELECT songlist_id, songlist_title FROM Songlist WHERE songlist_id IN ({})",
+    }
+    if target_type not in name_sql:
         return json_cn({"error": "类型错误"}, 400)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [limit])
-        result = dictfetchall(cursor)
+    # 收藏数排名来自内存中的排行榜 (见 favoriteLeaderboard)，不再对 Favorite 全表 GROUP BY
+    # 多取一些，跳过已被删除的对象后仍能凑满 limit 个
+    ranked = favorite_leaderboard.top(target_type, limit * 2)
+
+    result = []
+    if ranked:
+        ids = [target_id for target_id, _ in ranked]
+        with connection.cursor() as cursor:
+            cursor.execute(name_sql[target_type].format(", ".join(["%s"] * len(ids))), ids)
+            names = dict(cursor.fetchall())
+
+        for target_id, fav_count in ranked:
+            if target_id in names:
+                result.append({"target_id": target_id, "fav_count": fav_count, "name": names[target_id]})
+            if len(result) >= limit:
+                break
 
     return json_cn({"ranking": result, "type": target_type})
 
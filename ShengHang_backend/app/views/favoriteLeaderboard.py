@@ -0,0 +1,165 @@
+# 平台收藏排行榜
+# 原先每次请求都对整张 Favorite 表 GROUP BY target_id ORDER BY COUNT(*)，这里改为：
+#   - Favorite_Count 表记录每个对象的被收藏次数，收藏 / 取消收藏时在同一事务里增减
+#   - 每种类型在内存中保存收藏数最多的前 FAVORITE_LEADERBOARD_SIZE 个对象，
+#     本进程内的收藏操作直接更新它，取前 N 名只需对这几百个对象排序，与收藏总数无关
+#   - 每隔 FAVORITE_LEADERBOARD_RECONCILE 秒从 Favorite_Count 重新加载一次 (走索引，只读前 K 行)，
+#     同步其他进程中的收藏操作
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+
+# ================================
+# 计数表维护 (在收藏 / 取消收藏的事务中调用)
+# ================================
+def increment_favorite_count(cursor, target_type, target_id, delta):
+    """
+    增减某个对象的被收藏次数
+    :return: 更新后的收藏数
+    """
+    cursor.execute(
+        """
+        INSERT INTO Favorite_Count (target_type, target_id, fav_count)
+        VALUES (%s, %s, GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE fav_count = GREATEST(fav_count + %s, 0)
+        """,
+        [target_type, target_id, delta, delta],
+    )
+    cursor.execute(
+        "SELECT fav_count FROM Favorite_Count WHERE target_type = %s AND target_id = %s",
+        [target_type, target_id],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def decrement_user_favorite_counts(cursor, user_id):
+    "注销账号前调用：该用户收藏过的对象收藏数各减一 (收藏记录随账号一起删除)"
+    cursor.execute(
+        """
+        UPDATE Favorite_Count fc
+        JOIN Favorite f ON f.target_type = fc.target_type AND f.target_id = fc.target_id
+        SET fc.fav_count = GREATEST(fc.fav_count - 1, 0)
+        WHERE f.user_id = %s
+        """,
+        [user_id],
+    )
+
+
+def rebuild_favorite_counts():
+    "从 Favorite 表重新统计全部收藏数，返回计数行数"
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM Favorite_Count")
+            cursor.execute(
+                """
+                INSERT INTO Favorite_Count (target_type, target_id, fav_count)
+                SELECT target_type, target_id, COUNT(*)
+                FROM Favorite
+                GROUP BY target_type, target_id
+                """
+            )
+            rows = cursor.rowcount
+    favorite_leaderboard.invalidate()
+    return rows
+
+
+# ================================
+# 内存中的前 K 名
+# ================================
+# 某类对象收藏数最多的前 K 个
+LEADERBOARD_SQL = """
+    SELECT target_id, fav_count
+    FROM Favorite_Count
+    WHERE target_type = %s AND fav_count > 0
+    ORDER BY fav_count DESC, target_id DESC
+    LIMIT %s
+"""
+
+
+class FavoriteLeaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._top = {}          # target_type -> {target_id: fav_count}
+        self._full = {}         # target_type -> 加载时是否取满了 K 个 (表中可能还有更多对象)
+        self._loaded_at = {}    # target_type -> 加载时间
+
+    @property
+    def size(self):
+        return getattr(settings, "FAVORITE_LEADERBOARD_SIZE", 200)
+
+    def top(self, target_type, limit):
+        """
+        :return: 收藏数最多的前 limit 个 [(target_id, fav_count), ...]，按收藏数降序，收藏数相同时 id 大的在前
+        """
+        if limit > self.size:
+            # 超出内存中保存的范围，直接按索引查计数表
+            return self._query(target_type, limit)
+
+        reconcile = getattr(settings, "FAVORITE_LEADERBOARD_RECONCILE", 60)
+        with self._lock:
+            loaded = target_type in self._top and time.time() - self._loaded_at[target_type] < reconcile
+        if not loaded:
+            self._load(target_type)
+
+        with self._lock:
+            items = list(self._top.get(target_type, {}).items())
+        items.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return items[:limit]
+
+    def record(self, target_type, target_id, fav_count):
+        "本进程内收藏数发生变化后调用，fav_count 为变化后的值"
+        target_id = int(target_id)
+        with self._lock:
+            top = self._top.get(target_type)
+            if top is None:
+                return
+
+            if target_id in top:
+                old = top[target_id]
+                if fav_count > 0:
+                    top[target_id] = fav_count
+                else:
+                    del top[target_id]
+                # 榜内对象的收藏数减少后，榜外可能有对象超过它，下次读取时重新加载
+                if fav_count < old and self._full.get(target_type):
+                    self._loaded_at[target_type] = 0
+                return
+
+            if fav_count <= 0:
+                return
+            if len(top) < self.size:
+                # 榜未满：加载时表中所有对象都在榜内，新对象直接加入
+                top[target_id] = fav_count
+                return
+
+            # 榜已满：超过榜尾才替换进来，被挤出去的对象此后不在内存里
+            last_id = min(top, key=lambda tid: (top[tid], tid))
+            if (fav_count, target_id) > (top[last_id], last_id):
+                del top[last_id]
+                top[target_id] = fav_count
+                self._full[target_type] = True
+
+    def invalidate(self, *target_types):
+        "批量修改了收藏数据 (如注销账号) 后调用，下次读取时重新加载"
+        with self._lock:
+            for target_type in target_types or list(self._loaded_at):
+                self._loaded_at[target_type] = 0
+
+    def _load(self, target_type):
+        rows = self._query(target_type, self.size)
+        with self._lock:
+            self._top[target_type] = dict(rows)
+            self._full[target_type] = len(rows) >= self.size
+            self._loaded_at[target_type] = time.time()
+
+    @staticmethod
+    def _query(target_type, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(LEADERBOARD_SQL, [target_type, limit])
+            return list(cursor.fetchall())
+
+
+favorite_leaderboard = FavoriteLeaderboard()
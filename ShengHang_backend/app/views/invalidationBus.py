@@ -0,0 +1,261 @@
+# 缓存失效总线
+# 缓存项声明自己依赖的标签 (如 singer:5、album:12、song:99)，数据被修改时发布受影响的标签，
+# 所有订阅者 (各个缓存) 删除带有这些标签的缓存项
+#
+# 发布的标签先同步投递给本进程的订阅者，再经 pub/sub 频道广播给其他工作进程：
+#   - 配置了 CACHE_BUS_REDIS_URL 且安装了 redis 包时使用 Redis 的 PUBLISH / SUBSCRIBE
+#   - 否则使用 LocalPubSub：同一台机器上的进程通过 CACHE_BUS_DIR 下的追加写日志文件互相通知
+# 订阅端断线重连、或本地日志被截断时可能漏掉消息，此时通知订阅者清空全部缓存 (标签 "*")
+import json
+import os
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db import connection
+
+
+CHANNEL = "cache:invalidate"
+
+# 匹配全部缓存项的标签
+ALL = "*"
+
+# 本进程的标识，收到自己发布的消息时跳过 (发布时已在本地投递过)
+ORIGIN = uuid.uuid4().hex
+
+
+def tag(kind, obj_id):
+    return f"{kind}:{int(obj_id)}"
+
+
+# ================================
+# 进程间的 pub/sub 替身
+# ================================
+class LocalPubSub:
+    """
+    实现本项目用到的 redis-py 发布订阅接口 (publish / pubsub().subscribe / get_message)
+    消息追加写入 <directory>/<channel>.log，订阅者从订阅时的文件末尾开始轮询新内容
+    日志超过 max_bytes 时由发布方清空，订阅者发现文件变短后收到一条 {"type": "reset"}
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024, poll_interval=0.5):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, channel):
+        return os.path.join(self.directory, channel.replace(":", "_") + ".log")
+
+    def publish(self, channel, message):
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        path = self._path(channel)
+        # 单次 O_APPEND 写入一整行，多个进程同时发布也不会交错
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size > self.max_bytes:
+                os.ftruncate(fd, 0)
+            os.write(fd, message.replace(b"\n", b" ") + b"\n")
+        finally:
+            os.close(fd)
+        return 1
+
+    def pubsub(self):
+        return _LocalSubscription(self)
+
+
+class _LocalSubscription:
+    def __init__(self, hub):
+        self._hub = hub
+        self._offsets = {}      # 日志文件路径 -> 已读到的位置
+        self._pending = []
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            path = self._hub._path(channel)
+            try:
+                self._offsets[path] = os.path.getsize(path)
+            except OSError:
+                self._offsets[path] = 0
+
+    def close(self):
+        self._offsets.clear()
+
+    def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            if not self._pending:
+                self._poll()
+            if self._pending:
+                return self._pending.pop(0)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self._hub.poll_interval, remaining))
+
+    def _poll(self):
+        for path, offset in self._offsets.items():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size < offset:
+                # 日志被清空过，中间的消息可能没读到
+                self._offsets[path] = offset = 0
+                self._pending.append({"type": "reset", "data": None})
+            if size == offset:
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read(size - offset)
+            # 只处理完整的行，写了一半的行留到下次
+            end = chunk.rfind(b"\n") + 1
+            self._offsets[path] = offset + end
+            for line in chunk[:end].splitlines():
+                if line:
+                    self._pending.append({"type": "message", "data": line})
+
+
+def create_client():
+    url = getattr(settings, "CACHE_BUS_REDIS_URL", None)
+    if url:
+        try:
+            import redis
+        except ImportError:
+            print("[InvalidationBus] 未安装 redis 包，改用本地 pub/sub")
+        else:
+            return redis.Redis.from_url(url)
+    return LocalPubSub(
+        getattr(settings, "CACHE_BUS_DIR", settings.BASE_DIR / "cache" / "bus"),
+        poll_interval=getattr(settings, "CACHE_BUS_POLL_INTERVAL", 0.5),
+    )
+
+
+# ================================
+# 失效总线
+# ================================
+class InvalidationBus:
+    def __init__(self, client_factory=create_client, channel=CHANNEL):
+        self._client_factory = client_factory
+        self._client = None
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._handlers = []
+        self._thread = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def subscribe(self, handler):
+        """handler(tags) 在收到失效消息时调用，tags 为标签集合，包含 ALL ("*") 时表示清空全部"""
+        with self._lock:
+            self._handlers.append(handler)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="cache-invalidation-bus", daemon=True)
+                self._thread.start()
+
+    def publish(self, tags):
+        "在修改数据之后调用"
+        tags = set(tags)
+        if not tags:
+            return
+        self._deliver(tags)
+        try:
+            self.client.publish(self.channel, json.dumps({"origin": ORIGIN, "tags": sorted(tags)}))
+        except Exception as e:
+            # 其他进程的缓存只能等 TTL 过期
+            print(f"[InvalidationBus] 广播失效消息失败: {e}")
+
+    def _deliver(self, tags):
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            try:
+                handler(tags)
+            except Exception as e:
+                print(f"[InvalidationBus] 处理失效消息失败: {e}")
+
+    def _listen(self):
+        pubsub = None
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub()
+                    pubsub.subscribe(self.channel)
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                print(f"[InvalidationBus] 订阅中断，稍后重连: {e}")
+                pubsub = None
+                time.sleep(1)
+                # 断线期间的消息收不到了
+                self._deliver({ALL})
+                continue
+
+            if message is None:
+                continue
+            if message["type"] == "reset":
+                self._deliver({ALL})
+                continue
+            if message["type"] != "message":
+                continue
+            try:
+                payload = json.loads(message["data"])
+            except ValueError:
+                continue
+            if payload.get("origin") != ORIGIN:
+                self._deliver(set(payload.get("tags") or []))
+
+
+invalidation_bus = InvalidationBus()
+
+
+# ================================
+# 删除曲库对象时的级联标签
+# ================================
+def deletion_tags(singer_ids=(), album_ids=(), song_ids=()):
+    """
+    删除歌手 / 专辑 / 歌曲之前调用，返回需要发布的全部标签：
+      - 被删除的对象本身
+      - 级联删除的专辑 (歌手的专辑) 和歌曲 (这些专辑里的歌曲)
+      - 包含被删歌曲的歌单 songlist:<id>
+      - 收藏了被删对象的用户 favorites:<user_id>
+    """
+    singers = {int(i) for i in singer_ids}
+    albums = {int(i) for i in album_ids}
+    songs = {int(i) for i in song_ids}
+
+    with connection.cursor() as cursor:
+        def ids(sql, values):
+            if not values:
+                return set()
+            cursor.execute(sql % ", ".join(["%s"] * len(values)), list(values))
+            return {row[0] for row in cursor.fetchall()}
+
+        albums |= ids("SELECT album_id FROM Album WHERE singer_id IN (%s)", singers)
+        songs |= ids("SELECT song_id FROM Song WHERE album_id IN (%s)", albums)
+        songlists = ids("SELECT DISTINCT songlist_id FROM Songlist_Song WHERE song_id IN (%s)", songs)
+
+        favorite_users = set()
+        for target_type, targets in (("singer", singers), ("album", albums), ("song", songs)):
+            if targets:
+                cursor.execute(
+                    "SELECT DISTINCT user_id FROM Favorite WHERE target_type = %s AND target_id IN ("
+                    + ", ".join(["%s"] * len(targets)) + ")",
+                    [target_type, *targets],
+                )
+                favorite_users |= {row[0] for row in cursor.fetchall()}
+
+    return (
+        {tag("singer", i) for i in singers}
+        | {tag("album", i) for i in albums}
+        | {tag("song", i) for i in songs}
+        | {tag("songlist", i) for i in songlists}
+        | {tag("favorites", i) for i in favorite_users}
+    )
@@ -0,0 +1,193 @@
+# 流式 JSON 响应
+# json_cn 要先把整个结果拼成 dict 再一次序列化，dictfetchall 又先 fetchall 把所有行读进内存，
+# 结果很大时 (播放记录、收藏、我的评论) 同一份数据在内存里要放两遍。这里改为：
+#   - stream_rows：逐批读取查询结果 (MySQL 用服务端游标 SSCursor，结果不在客户端缓存)，逐行产出字典或加工后的结果
+#   - json_stream：把一个 dict 按顺序序列化成若干块，值为迭代器时逐个序列化元素，值为函数时在轮到它时才调用
+#     (用于依赖前面流式结果的字段，如条数)，经 StreamingHttpResponse 边读边发
+# 内存占用只与 STREAM_CHUNK_SIZE / STREAM_BUFFER_SIZE 有关，与结果行数无关
+#
+# 注意：
+#   - 流式读取期间这个数据库连接不能执行其他查询，所以其他查询要放在返回响应之前，
+#     或用 asyncDb.submit 放到其他连接上执行；
+#     同一个响应里的多个 stream_rows 按序列化顺序依次执行，互不重叠
+#   - 状态码在开始发送时就确定了，发送途中数据库出错只能中断响应 (客户端收到不完整的 JSON)
+#   - ASGI 下 Django 会把同步迭代器整个读进列表再发送，内存不再有界；所以 STREAM_ASYNC 打开时 (asgi.py 启动时设置)
+#     返回异步迭代器：每个响应独占一个线程逐块生成 (数据库游标只能在打开它的线程里使用)，事件循环生成一块发送一块；
+#     这样的线程最多 STREAM_ASYNC_MAX_STREAMS 个，生成完归还给下一个响应，同时进行的流式响应更多时排队等待
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+
+from .fastJson import dumps
+from .rowAdapter import columns_of, row_class
+
+
+def _chunk_size():
+    "每次从数据库读取的行数"
+    return getattr(settings, "STREAM_CHUNK_SIZE", 500)
+
+
+# ================================
+# 逐批读取查询结果
+# ================================
+def stream_rows(sql, params=None, row_func=None):
+    """
+    逐批读取查询结果的生成器，每行是 {列名: 值}
+    :param row_func: 对每行做转换，返回值作为产出的元素；传给它的是 rowAdapter 的行对象 (按属性读取)，
+                     不必为每行先建一个马上丢弃的 dict
+    """
+    chunk_size = _chunk_size()
+    cursor = _server_side_cursor()
+    try:
+        cursor.execute(sql, params or [])
+        columns = columns_of(cursor)
+        cls = row_class(columns) if row_func else None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                # 直接编码的行用 dict：orjson 编码 dict 比编码 __slots__ 对象快
+                yield row_func(cls(*row)) if row_func else dict(zip(columns, row))
+    finally:
+        # 服务端游标关闭时会读完剩余结果，连接才能继续使用
+        cursor.close()
+
+
+def _server_side_cursor():
+    if connection.vendor == "mysql":
+        import MySQLdb.cursors
+
+        connection.ensure_connection()
+        return connection.connection.cursor(MySQLdb.cursors.SSCursor)
+    # 其他数据库用普通游标 + fetchmany
+    return connection.cursor()
+
+
+# ================================
+# 流式序列化
+# ================================
+def iter_json(value):
+    """
+    把 value 序列化成若干字符串块
+    dict / list / tuple 递归处理；迭代器、生成器逐个元素序列化；函数在轮到它时调用，用返回值代替；
+    不含迭代器和函数的值 (如每一行) 整个交给 fastJson 编码 (与 json_cn 一致)
+    """
+    if callable(value):
+        value = value()
+
+    if not _is_lazy(value):
+        yield dumps(value).decode("utf-8")
+    elif isinstance(value, dict):
+        yield "{"
+        for index, (key, item) in enumerate(value.items()):
+            yield ("," if index else "") + dumps(str(key)).decode("utf-8") + ":"
+            yield from iter_json(item)
+        yield "}"
+    elif isinstance(value, (list, tuple)) or hasattr(value, "__next__"):
+        yield "["
+        for index, item in enumerate(value):
+            if index:
+                yield ","
+            yield from iter_json(item)
+        yield "]"
+
+
+def _is_lazy(value):
+    "value 中是否含有需要逐个序列化的迭代器或延迟调用的函数"
+    if callable(value) or hasattr(value, "__next__"):
+        return True
+    if isinstance(value, dict):
+        return any(_is_lazy(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_is_lazy(item) for item in value)
+    return False
+
+
+def _buffered(chunks, size):
+    "把小块合并到约 size 个字符再发送，避免每个元素一次写操作"
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+_DONE = object()
+
+_lanes = weakref.WeakKeyDictionary()    # 事件循环 -> 空闲的单线程执行器队列
+
+
+def _lane_queue():
+    "当前事件循环的生成线程，首次使用时创建 STREAM_ASYNC_MAX_STREAMS 个单线程执行器 (线程在第一次提交任务时才启动)"
+    loop = asyncio.get_running_loop()
+    lanes = _lanes.get(loop)
+    if lanes is None:
+        lanes = _lanes[loop] = asyncio.Queue()
+        for i in range(max(1, int(getattr(settings, "STREAM_ASYNC_MAX_STREAMS", 8)))):
+            lanes.put_nowait(ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"json-stream-{i}"))
+    return lanes
+
+
+async def _in_thread(chunks):
+    "借一个生成线程逐块生成 chunks，转成异步迭代器；没有空闲线程时等待"
+    lanes = _lane_queue()
+    executor = await lanes.get()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunks, _DONE)
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        # 客户端断开时也要在同一个线程里关闭生成器 (关闭游标)；单线程执行器按提交顺序执行，
+        # 关闭完成前下一个响应的任务不会开始，所以可以立即归还
+        def close():
+            chunks.close()
+            connection.close_if_unusable_or_obsolete()
+
+        executor.submit(close)
+        lanes.put_nowait(executor)
+
+
+def json_stream(data, status=200):
+    """
+    流式返回 JSON，与 json_cn 的输出格式一致
+    :param data: dict，其中的值可以是 stream_rows 等迭代器、或在序列化到该字段时才调用的函数
+    """
+    chunks = _buffered(iter_json(data), getattr(settings, "STREAM_BUFFER_SIZE", 64 * 1024))
+    if getattr(settings, "STREAM_ASYNC", False):
+        chunks = _in_thread(chunks)
+    return StreamingHttpResponse(chunks, status=status, content_type="application/json")
+
+
+class Counter:
+    """
+    边产出边计数 / 求和，用于在流式列表之后输出条数等汇总字段：
+        songs = Counter(stream_rows(...), total=lambda row: row["duration"])
+        json_stream({"items": songs, "count": lambda: songs.count, "total": lambda: songs.totals["total"]})
+    """
+
+    def __init__(self, rows, **sums):
+        self._rows = iter(rows)
+        self._sums = sums
+        self.count = 0
+        self.totals = {name: 0 for name in sums}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.count += 1
+        for name, func in self._sums.items():
+            self.totals[name] += func(row) or 0
+        return row
@@ -0,0 +1,228 @@
+# 点赞缓冲模块 (评论点赞、歌单点赞)
+# 原先每次点赞都直接 UPDATE ... SET like_count = like_count + 1，同一用户可以无限点赞，热门评论的行锁成为热点。这里改为：
+#   1. 去重：每个用户在内存中有一份已点赞集合 (按 (用户, 类型) 缓存，LRU 淘汰，缺失时按索引从 Like_Record 加载)，
+#      已点过赞的请求直接返回，不再写库
+#   2. 新的点赞追加到延迟写队列 (同时落盘，见 writeBehind)
+#   3. 后台线程定时 / 攒够一批后：跳过 Like_Record 中已存在的记录 (其他进程写入的、或重复入队的)，
+#      按对象合并点赞数增量，每个对象只更新一次计数，再批量写入 Like_Record
+# 新的点赞类型只需在 LIKE_TARGETS 中登记 "如何把增量加到计数上"
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+from .commentStats import like_comment
+from .localRedis import LocalRedis
+from .writeBehind import WriteBehindQueue
+
+
+# 单条 INSERT 语句最多插入的行数
+LIKE_INSERT_BATCH_SIZE = 500
+
+
+def _add_songlist_likes(cursor, songlist_id, delta):
+    cursor.execute("UPDATE Songlist SET like_count = like_count + %s WHERE songlist_id = %s", [delta, songlist_id])
+    return cursor.rowcount > 0
+
+
+def _add_comment_likes(cursor, comment_id, delta):
+    # 同时更新评论统计的点赞总数和热门评论
+    return like_comment(cursor, comment_id, delta) is not None
+
+
+# 点赞类型 -> add(cursor, 对象id, 增量)，对象不存在时返回 False
+LIKE_TARGETS = {
+    "comment": _add_comment_likes,
+    "songlist": _add_songlist_likes,
+}
+
+
+# ================================
+# 已点赞集合 (内存)
+# ================================
+class LikeTracker:
+    def __init__(self, max_users=100000):
+        self._lock = threading.Lock()
+        self._sets = LocalRedis(max_entries=max_users)     # (user_id, target_type) -> {target_id, ...}
+
+    def check_and_mark(self, user_id, target_type, target_id):
+        "没有点过赞则记下并返回 True，否则返回 False"
+        key = (int(user_id), target_type)
+        liked = self._sets.get(key)
+        if liked is None:
+            liked = self._load(key)
+        with self._lock:
+            if int(target_id) in liked:
+                return False
+            liked.add(int(target_id))
+            return True
+
+    def has_liked(self, user_id, target_type, target_id):
+        key = (int(user_id), target_type)
+        liked = self._sets.get(key)
+        if liked is None:
+            liked = self._load(key)
+        return int(target_id) in liked
+
+    def forget(self, user_id, target_type, target_id):
+        "撤销一次标记，例如点赞最终没能入队、或对象已不存在时"
+        liked = self._sets.get((int(user_id), target_type))
+        if liked is not None:
+            with self._lock:
+                liked.discard(int(target_id))
+
+    def forget_user(self, user_id):
+        self._sets.delete(*[(int(user_id), target_type) for target_type in LIKE_TARGETS])
+
+    def clear(self):
+        self._sets.flushall()
+
+    def _load(self, key):
+        user_id, target_type = key
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT target_id FROM Like_Record WHERE user_id = %s AND target_type = %s",
+                [user_id, target_type],
+            )
+            loaded = {row[0] for row in cursor.fetchall()}
+        with self._lock:
+            # 加载期间另一个请求可能已经放进了集合，以先放进去的为准
+            liked = self._sets.get(key)
+            if liked is None:
+                liked = loaded
+                self._sets.set(key, liked)
+            else:
+                liked |= loaded
+        return liked
+
+
+like_tracker = LikeTracker(max_users=getattr(settings, "LIKE_TRACKER_MAX_USERS", 100000))
+
+
+# ================================
+# 批量写库
+# ================================
+def flush_likes(items):
+    "把一批点赞写入数据库：过滤已存在的记录，按对象合并增量后更新计数，再写入点赞记录"
+    # (user_id, target_type, target_id)，与 Like_Record 唯一索引的列顺序一致
+    keys = sorted({(item["user_id"], item["target_type"], item["target_id"]) for item in items})
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # 1. 跳过已经写入过的点赞 (其他进程写入的、或重复入队的)
+            existing = set()
+            for start in range(0, len(keys), LIKE_INSERT_BATCH_SIZE):
+                chunk = keys[start:start + LIKE_INSERT_BATCH_SIZE]
+                cursor.execute(
+                    "SELECT user_id, target_type, target_id FROM Like_Record WHERE (user_id, target_type, target_id) IN ("
+                    + ", ".join(["(%s, %s, %s)"] * len(chunk)) + ") FOR UPDATE",
+                    [value for key in chunk for value in key],
+                )
+                existing |= {tuple(row) for row in cursor.fetchall()}
+            keys = [key for key in keys if key not in existing]
+
+            # 2. 每个对象只更新一次计数 (按类型、id 排序，减少并发写库时的死锁)
+            deltas = {}
+            for _, target_type, target_id in keys:
+                deltas[(target_type, target_id)] = deltas.get((target_type, target_id), 0) + 1
+            gone = set()
+            for (target_type, target_id), delta in sorted(deltas.items()):
+                if not LIKE_TARGETS[target_type](cursor, target_id, delta):
+                    gone.add((target_type, target_id))
+
+            # 3. 写入点赞记录 (对象已被删除的不写)
+            rows = [key for key in keys if key[1:] not in gone]
+            for start in range(0, len(rows), LIKE_INSERT_BATCH_SIZE):
+                chunk = rows[start:start + LIKE_INSERT_BATCH_SIZE]
+                cursor.execute(
+                    "INSERT INTO Like_Record (user_id, target_type, target_id, like_time) VALUES "
+                    + ", ".join(["(%s, %s, %s, NOW())"] * len(chunk)),
+                    [value for key in chunk for value in key],
+                )
+
+    for user_id, target_type, target_id in keys:
+        if (target_type, target_id) in gone:
+            like_tracker.forget(user_id, target_type, target_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_like_queue():
+    "首次使用时创建队列 (此时才读取配置并恢复落盘文件)"
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue(
+                    "likes",
+                    flush_likes,
+                    interval=getattr(settings, "LIKE_FLUSH_INTERVAL", 2.0),
+                    max_size=getattr(settings, "LIKE_FLUSH_SIZE", 500),
+                    spill_dir=getattr(settings, "LIKE_SPILL_DIR", os.path.join(settings.BASE_DIR, "spill")),
+                )
+    return _queue
+
+
+# ================================
+# 对外接口
+# ================================
+def like(user_id, target_type, target_id):
+    """
+    点赞一次，计数由后台批量更新
+    :return: True 表示已计入，False 表示该用户已经点过赞
+    """
+    if target_type not in LIKE_TARGETS:
+        raise ValueError(f"不支持的点赞类型: {target_type}")
+    if not like_tracker.check_and_mark(user_id, target_type, target_id):
+        return False
+    try:
+        get_like_queue().put({
+            "user_id": int(user_id),
+            "target_type": target_type,
+            "target_id": int(target_id),
+            "ts": time.time(),
+        })
+    except Exception:
+        # 没能入队就撤销标记，客户端重试时可以正常点赞
+        like_tracker.forget(user_id, target_type, target_id)
+        raise
+    return True
+
+
+def delete_like_records(cursor, target_type, target_ids):
+    "删除对象之前调用：清理这些对象的点赞记录"
+    target_ids = list(target_ids)
+    for start in range(0, len(target_ids), LIKE_INSERT_BATCH_SIZE):
+        chunk = target_ids[start:start + LIKE_INSERT_BATCH_SIZE]
+        cursor.execute(
+            f"DELETE FROM Like_Record WHERE target_type = %s AND target_id IN ({', '.join(['%s'] * len(chunk))})",
+            [target_type, *chunk],
+        )
+
+
+def delete_user_like_records(cursor, user_id):
+    """
+    注销账号前调用：用户的点赞记录、以及用户的评论 / 歌单收到的点赞记录随账号一起删除
+    用户点过的赞已计入对象的点赞数，保留不减
+    """
+    cursor.execute("DELETE FROM Like_Record WHERE user_id = %s", [user_id])
+    cursor.execute(
+        """
+        DELETE lr FROM Like_Record lr
+        JOIN Comment c ON lr.target_type = 'comment' AND lr.target_id = c.comment_id
+        WHERE c.user_id = %s
+        """,
+        [user_id],
+    )
+    cursor.execute(
+        """
+        DELETE lr FROM Like_Record lr
+        JOIN Songlist sl ON lr.target_type = 'songlist' AND lr.target_id = sl.songlist_id
+        WHERE sl.user_id = %s
+        """,
+        [user_id],
+    )
+    transaction.on_commit(lambda: like_tracker.forget_user(user_id))
@@ -0,0 +1,75 @@
+# 进程内的 Redis 替身
+# 实现了本项目用到的那一小部分 redis-py 接口 (get / set / delete / exists)，返回值与 redis-py 一致，
+# 没有部署 Redis 时用它代替，需要多进程共享状态时换成真正的 redis.Redis 即可，调用方代码不用改
+#
+# 容量有上限：超过 max_entries 时按最近最少使用 (LRU) 淘汰，过期的键在访问时惰性删除
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalRedis:
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()      # key -> (value, 过期时间戳或 None)
+
+    def get(self, name):
+        with self._lock:
+            entry = self._get_entry(name, time.time())
+            return None if entry is None else entry[0]
+
+    def set(self, name, value, ex=None, px=None, nx=False, xx=False):
+        """
+        同 redis-py 的 SET：设置成功返回 True；因 nx / xx 条件未满足而没有设置时返回 None
+        :param ex: 过期时间 (秒)
+        :param px: 过期时间 (毫秒)
+        """
+        now = time.time()
+        if ex is not None:
+            expire_at = now + ex
+        elif px is not None:
+            expire_at = now + px / 1000
+        else:
+            expire_at = None
+
+        with self._lock:
+            exists = self._get_entry(name, now) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[name] = (value, expire_at)
+            self._data.move_to_end(name)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, *names):
+        "返回实际删除的键个数"
+        with self._lock:
+            now = time.time()
+            count = 0
+            for name in names:
+                if self._get_entry(name, now) is not None:
+                    del self._data[name]
+                    count += 1
+            return count
+
+    def exists(self, *names):
+        with self._lock:
+            now = time.time()
+            return sum(1 for name in names if self._get_entry(name, now) is not None)
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+        return True
+
+    def _get_entry(self, name, now):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self._data[name]
+            return None
+        self._data.move_to_end(name)
+        return entry
@@ -1,9 +1,20 @@
 # 管理员管理模块
 
-from django.db import connection
+from django.conf import settings
+from django.db import connection, transaction
 from django.views.decorators.csrf import csrf_exempt
 import json
 from .tools import *
+from .searchIndex import search_index
+from .invalidationBus import invalidation_bus, deletion_tags, tag
+from .commentStats import set_comment_status, set_comments_status, uncount_comments
+from .likeBuffer import delete_like_records
+from .asyncDb import Query, fan_out
+from .moderationQueue import (
+    PRIORITY, TASK_COLUMNS, claim_tasks, claimed_by_other, claimed_by_others, dequeue_comments, lease_seconds,
+    pending_counts, release_tasks,
+)
+from app.backends.mysqlpool.pool import all_pool_stats
 
 
 # ================================
@@ -83,6 +94,9 @@ def admin_add_singer(request):
             cursor.execute("SELECT LAST_INSERT_ID()")
             new_singer_id = cursor.fetchone()[0]
 
+        search_index.upsert("singer", new_singer_id, singer_name)
+        invalidation_bus.publish([tag("singer", new_singer_id)])
+
         add_system_log(
             action=f"新增歌手: {singer_name}",
             target_table="Singer",
@@ -165,9 +179,17 @@ def admin_delete_singer(request):
     """
 
     try:
+        # 删除前记下级联删除的专辑、歌曲及受影响的歌单、收藏
+        stale_tags = deletion_tags(singer_ids=[singer_id])
+
         with connection.cursor() as cursor:
             cursor.execute(delete_sql, [singer_id])
 
+        # 歌手的专辑、歌曲随之级联删除，专辑和歌曲索引整体重建
+        search_index.remove("singer", singer_id)
+        search_index.mark_stale("album", "song")
+        invalidation_bus.publish(stale_tags)
+
         add_system_log(
             action=f"删除歌手: {singer_name}",
             target_table="Singer",
@@ -272,6 +294,10 @@ def admin_update_singer(request):
         with connection.cursor() as cursor:
             cursor.execute(sql, params)
 
+        if "singer_name" in data:
+            search_index.upsert("singer", singer_id, data.get("singer_name"))
+        invalidation_bus.publish([tag("singer", singer_id)])
+
         add_system_log(
             action=f"成功修改歌手信息: {old_name}",
             target_table="Singer",
@@ -388,6 +414,9 @@ def admin_add_album(request):
             cursor.execute("SELECT LAST_INSERT_ID()")
             new_album_id = cursor.fetchone()[0]
 
+        search_index.upsert("album", new_album_id, album_title)
+        invalidation_bus.publish([tag("album", new_album_id), tag("singer", singer_id)])
+
         add_system_log(
             action=f"新增专辑: {album_title}",
             target_table="Album",
@@ -465,9 +494,17 @@ def admin_delete_album(request):
     sql = "DELETE FROM Album WHERE album_id = %s"
 
     try:
+        # 删除前记下级联删除的歌曲及受影响的歌单、收藏
+        stale_tags = deletion_tags(album_ids=[album_id])
+
         with connection.cursor() as cursor:
             cursor.execute(sql, [album_id])
 
+        # 专辑下的歌曲随之级联删除，歌曲索引整体重建
+        search_index.remove("album", album_id)
+        search_index.mark_stale("song")
+        invalidation_bus.publish(stale_tags)
+
         add_system_log(
             action=f"删除专辑: {album_title}",
             target_table="Album",
@@ -590,6 +627,14 @@ def admin_update_album(request):
         with connection.cursor() as cursor:
             cursor.execute(sql, params)
 
+        if "album_title" in data:
+            search_index.upsert("album", album_id, data.get("album_title"))
+        # 换了歌手时，新歌手的页面此前不依赖这张专辑，需要单独通知
+        stale_tags = [tag("album", album_id)]
+        if data.get("singer_id"):
+            stale_tags.append(tag("singer", data.get("singer_id")))
+        invalidation_bus.publish(stale_tags)
+
         add_system_log(
             action=f"成功修改专辑信息: {old_title}",
             target_table="Album",
@@ -710,6 +755,11 @@ def admin_add_song(request):
 
         singers_str = ", ".join(str(sid) for sid in singers_id)
 
+        search_index.upsert("song", song_id, song_title)
+        invalidation_bus.publish(
+            [tag("song", song_id), tag("album", album_id)] + [tag("singer", sid) for sid in singers_id]
+        )
+
         add_system_log(
             action=f"新增歌曲: {song_title}",
             target_table="Song",
@@ -808,10 +858,16 @@ def admin_delete_song(request):
         # 再删除本体
         sql_delete_Song = "DELETE FROM Song WHERE song_id=%s"
 
+        # 删除前记下受影响的歌单、收藏
+        stale_tags = deletion_tags(song_ids=[song_id])
+
         with connection.cursor() as cursor:
             cursor.execute(sql_delete_Song_Singer, [song_id])
             cursor.execute(sql_delete_Song, [song_id])
 
+        search_index.remove("song", song_id)
+        invalidation_bus.publish(stale_tags)
+
         add_system_log(
             action=f"删除歌曲: {song_title}",
             target_table="Song",
@@ -929,6 +985,14 @@ def admin_update_song(request):
         with connection.cursor() as cursor:
             cursor.execute(sql, params)
 
+        if "song_title" in data:
+            search_index.upsert("song", song_id, data.get("song_title"))
+        # 换了专辑时，新专辑的页面此前不依赖这首歌，需要单独通知
+        stale_tags = [tag("song", song_id)]
+        if data.get("album_id"):
+            stale_tags.append(tag("album", data.get("album_id")))
+        invalidation_bus.publish(stale_tags)
+
         add_system_log(
             action=f"修改歌曲信息成功: {old_title}",
             target_table="Song",
@@ -990,28 +1054,7 @@ def get_system_logs(request):
     # --------------------------
     # 3. 构建复用的 SQL 片段
     # --------------------------
-
-    # base_sql: 存储 FROM 和 WHERE 部分，供 Count 和 Select 共用
-    base_sql_parts = ["FROM SystemLog"]
-    where_clauses = ["WHERE 1=1"]  # 使用 1=1 方便后续直接 append 'AND ...'
-    base_params = []  # 存储筛选条件的参数
-
-    # 3.1 拼接筛选条件
-    if filter_table:
-        where_clauses.append("AND target_table = %s")
-        base_params.append(filter_table)
-
-    if filter_result:
-        where_clauses.append("AND result = %s")
-        base_params.append(filter_result)
-
-    if keyword:
-        where_clauses.append("AND action LIKE %s")
-        base_params.append(f"%{keyword}%")
-
-    # 3.2 组合成完整的公共部分
-    # 结果类似: "FROM SystemLog WHERE 1=1 AND target_table = %s AND action LIKE %s"
-    common_sql_suffix = f"{base_sql_parts[0]} {' '.join(where_clauses)}"
+    common_sql_suffix, base_params = system_log_filter(filter_table, filter_result, keyword)
 
     # --------------------------
     # 4. 执行数据库查询
@@ -1031,12 +1074,7 @@ def get_system_logs(request):
         # 第二查：获取数据 (Select)
         # ====================
         # 拼接: SELECT 字段... + 公共后缀 + ORDER BY + LIMIT
-        sql_data = f"""
-            SELECT log_id, action, target_table, target_id, action_time, result
-            {common_sql_suffix}
-            ORDER BY action_time DESC
-            LIMIT %s OFFSET %s
-        """
+        sql_data = SYSTEM_LOGS_SQL.format(filter=common_sql_suffix)
 
         # 构造 Select 专用的参数列表：筛选参数 + 分页参数
         # 注意：这里必须是 base_params + [...]，顺序不能乱
@@ -1059,6 +1097,39 @@ def get_system_logs(request):
     })
 
 
+# 日志列表，{filter} 为 system_log_filter 构建的 FROM / WHERE 部分，参数: 筛选参数 + [page_size, offset]
+SYSTEM_LOGS_SQL = """
+    SELECT log_id, action, target_table, target_id, action_time, result
+    {filter}
+    ORDER BY action_time DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def system_log_filter(filter_table=None, filter_result=None, keyword=None):
+    """
+    日志列表的 FROM 和 WHERE 部分，供 Count 和 Select 共用
+    :return: (SQL 片段, 筛选条件的参数)
+    """
+    where_clauses = ["WHERE 1=1"]  # 使用 1=1 方便后续直接 append 'AND ...'
+    base_params = []  # 存储筛选条件的参数
+
+    if filter_table:
+        where_clauses.append("AND target_table = %s")
+        base_params.append(filter_table)
+
+    if filter_result:
+        where_clauses.append("AND result = %s")
+        base_params.append(filter_result)
+
+    if keyword:
+        where_clauses.append("AND action LIKE %s")
+        base_params.append(f"%{keyword}%")
+
+    # 结果类似: "FROM SystemLog WHERE 1=1 AND target_table = %s AND action LIKE %s"
+    return f"FROM SystemLog {' '.join(where_clauses)}", base_params
+
+
 # -------------------------------------------------
 # 11. 获取用户行为统计 (管理员)
 # 功能：
@@ -1066,6 +1137,16 @@ def get_system_logs(request):
 # 2. 获取每日趋势图数据 (按天分组统计)
 # 3. 获取最活跃用户排行 (按播放量排序)
 # -------------------------------------------------
+# 每日播放量，参数: 开始时间, 结束时间
+DAILY_PLAYS_SQL = """
+    SELECT DATE_FORMAT(play_time, '%%Y-%%m-%%d') as date_str, COUNT(*) as count
+    FROM PlayHistory
+    WHERE play_time BETWEEN %s AND %s
+    GROUP BY date_str
+    ORDER BY date_str
+"""
+
+
 @csrf_exempt
 def get_user_behavior_stats(request):
     # 1. 权限检查
@@ -1120,14 +1201,7 @@ def get_user_behavior_stats(request):
         # -------------------------------------------------
 
         # 1. 每日播放量
-        sql_trend_play = """
-                         SELECT DATE_FORMAT(play_time, '%%Y-%%m-%%d') as date_str, COUNT(*) as count
-                         FROM PlayHistory
-                         WHERE play_time BETWEEN %s AND %s
-                         GROUP BY date_str \
-                         ORDER BY date_str \
-                         """
-        cursor.execute(sql_trend_play, [start_dt, end_dt])
+        cursor.execute(DAILY_PLAYS_SQL, [start_dt, end_dt])
         trend_play = dictfetchall(cursor)
 
         # 2. 每日新增用户
@@ -1197,6 +1271,31 @@ def get_user_behavior_stats(request):
 # 2. 听歌偏好：最常听的歌手、最常听的风格(基于歌手类型)
 # 3. 活跃趋势：该用户这段时间的每日听歌量
 # ============================================================
+# 行为概览：每个子查询的参数都是 user_id, 开始时间, 结束时间
+# 使用 COALESCE 确保 SUM 返回 0 而不是 None
+USER_SUMMARY_SQL = """
+    SELECT (SELECT COUNT(*)
+            FROM PlayHistory
+            WHERE user_id = %s AND play_time BETWEEN %s AND %s)          as play_count,
+           (SELECT COALESCE(SUM(play_duration), 0)
+            FROM PlayHistory
+            WHERE user_id = %s
+              AND play_time BETWEEN %s AND %s)                           as total_duration_sec,
+           (SELECT COUNT(*)
+            FROM Comment
+            WHERE user_id = %s
+              AND comment_time BETWEEN %s AND %s)                        as comment_count,
+           (SELECT COUNT(*)
+            FROM Favorite
+            WHERE user_id = %s
+              AND favorite_time BETWEEN %s AND %s)                       as favorite_count,
+           (SELECT COUNT(*)
+            FROM Songlist
+            WHERE user_id = %s
+              AND create_time BETWEEN %s AND %s)                         as songlist_created
+"""
+
+
 @csrf_exempt
 def get_specific_user_stats(request):
     # 1. 权限检查 (管理员可以看任何人，或者用户看自己)
@@ -1229,123 +1328,104 @@ def get_specific_user_stats(request):
 
     stats = {}
 
-    with connection.cursor() as cursor:
-
-        # -------------------------------------------------
-        # Part 0: 用户基本信息确认
-        # -------------------------------------------------
-        sql_user_info = "SELECT user_name, email, register_time, status FROM User WHERE user_id = %s"
-        cursor.execute(sql_user_info, [target_user_id])
-        user_info = dictfetchall(cursor)
-        if not user_info:
-            return json_cn({"error": "用户不存在"}, 404)
-        stats['user_info'] = user_info[0]
+    # -------------------------------------------------
+    # Part 0: 用户基本信息确认
+    # -------------------------------------------------
+    sql_user_info = "SELECT user_name, email, register_time, status FROM User WHERE user_id = %s"
+
+    # -------------------------------------------------
+    # Part A: 行为概览 (Summary)
+    # 统计该时间段内的各项核心指标
+    # -------------------------------------------------
+    # 参数顺序对应 SQL 中的 %s
+    params_summary = [
+        target_user_id, start_dt, end_dt,  # Play Count
+        target_user_id, start_dt, end_dt,  # Duration
+        target_user_id, start_dt, end_dt,  # Comment
+        target_user_id, start_dt, end_dt,  # Favorite
+        target_user_id, start_dt, end_dt  # Songlist
+    ]
+
+    # -------------------------------------------------
+    # Part B: 听歌偏好 (Preferences)
+    # -------------------------------------------------
+
+    # 1. 最常听的歌手 (Top Artist)
+    # 关联路径: PlayHistory -> Song -> Song_Singer -> Singer
+    sql_top_singer = """
+                     SELECT s.singer_name, s.type, COUNT(*) as listen_count
+                     FROM PlayHistory ph
+                              JOIN Song_Singer ss ON ph.song_id = ss.song_id
+                              JOIN Singer s ON ss.singer_id = s.singer_id
+                     WHERE ph.user_id = %s \
+                       AND ph.play_time BETWEEN %s AND %s
+                     GROUP BY s.singer_id, s.singer_name, s.type
+                     ORDER BY listen_count DESC
+                     LIMIT 1 \
+                     """
 
-        # -------------------------------------------------
-        # Part A: 行为概览 (Summary)
-        # 统计该时间段内的各项核心指标
-        # -------------------------------------------------
-        # 使用 COALESCE 确保 SUM 返回 0 而不是 None
-        sql_summary = """
-                      SELECT (SELECT COUNT(*) \
-                              FROM PlayHistory \
-                              WHERE user_id = %s AND play_time BETWEEN %s AND %s)                                   as play_count, \
-                             (SELECT COALESCE(SUM(play_duration), 0) \
-                              FROM PlayHistory \
-                              WHERE user_id = %s \
-                                AND play_time BETWEEN %s AND %s)                                                    as total_duration_sec, \
-                             (SELECT COUNT(*) \
-                              FROM Comment \
-                              WHERE user_id = %s \
-                                AND comment_time BETWEEN %s AND %s)                                                 as comment_count, \
-                             (SELECT COUNT(*) \
-                              FROM Favorite \
-                              WHERE user_id = %s \
-                                AND favorite_time BETWEEN %s AND %s)                                                as favorite_count, \
-                             (SELECT COUNT(*) \
-                              FROM Songlist \
-                              WHERE user_id = %s \
-                                AND create_time BETWEEN %s AND %s)                                                  as songlist_created \
+    # 2. 听歌时间分布 (比如：深夜党还是白日党)
+    # 统计播放发生在哪个小时段 (0-23)
+    sql_active_hour = """
+                      SELECT HOUR(play_time) as hour_of_day, COUNT(*) as count
+                      FROM PlayHistory
+                      WHERE user_id = %s \
+                        AND play_time BETWEEN %s AND %s
+                      GROUP BY hour_of_day
+                      ORDER BY count DESC
+                      LIMIT 1 \
                       """
-        # 参数顺序对应 SQL 中的 %s
-        params_summary = [
-            target_user_id, start_dt, end_dt,  # Play Count
-            target_user_id, start_dt, end_dt,  # Duration
-            target_user_id, start_dt, end_dt,  # Comment
-            target_user_id, start_dt, end_dt,  # Favorite
-            target_user_id, start_dt, end_dt  # Songlist
-        ]
-
-        cursor.execute(sql_summary, params_summary)
-        stats['behavior_summary'] = dictfetchall(cursor)[0]
-
-        # 转换一下时长显示 (分钟)
-        total_sec = stats['behavior_summary']['total_duration_sec']
-        stats['behavior_summary']['total_duration_min'] = round(total_sec / 60, 1)
-
-        # -------------------------------------------------
-        # Part B: 听歌偏好 (Preferences)
-        # -------------------------------------------------
-
-        # 1. 最常听的歌手 (Top Artist)
-        # 关联路径: PlayHistory -> Song -> Song_Singer -> Singer
-        sql_top_singer = """
-                         SELECT s.singer_name, s.type, COUNT(*) as listen_count
-                         FROM PlayHistory ph
-                                  JOIN Song_Singer ss ON ph.song_id = ss.song_id
-                                  JOIN Singer s ON ss.singer_id = s.singer_id
-                         WHERE ph.user_id = %s \
-                           AND ph.play_time BETWEEN %s AND %s
-                         GROUP BY s.singer_id, s.singer_name, s.type
-                         ORDER BY listen_count DESC
-                         LIMIT 1 \
-                         """
-        cursor.execute(sql_top_singer, [target_user_id, start_dt, end_dt])
-        top_singer_data = dictfetchall(cursor)
-        stats['top_artist'] = top_singer_data[0] if top_singer_data else None
-
-        # 2. 听歌时间分布 (比如：深夜党还是白日党)
-        # 统计播放发生在哪个小时段 (0-23)
-        sql_active_hour = """
-                          SELECT HOUR(play_time) as hour_of_day, COUNT(*) as count
-                          FROM PlayHistory
-                          WHERE user_id = %s \
-                            AND play_time BETWEEN %s AND %s
-                          GROUP BY hour_of_day
-                          ORDER BY count DESC
-                          LIMIT 1 \
-                          """
-        cursor.execute(sql_active_hour, [target_user_id, start_dt, end_dt])
-        hour_data = dictfetchall(cursor)
-        stats['peak_hour'] = hour_data[0]['hour_of_day'] if hour_data else None
-
-        # -------------------------------------------------
-        # Part C: 每日活跃趋势 (Activity Trend)
-        # 用于生成该用户的活跃度折线图
-        # -------------------------------------------------
-        sql_trend = """
-                    SELECT DATE_FORMAT(play_time, '%%Y-%%m-%%d') as date_str,
-                           COUNT(*)                              as plays,
-                           SUM(play_duration)                    as duration
-                    FROM PlayHistory
-                    WHERE user_id = %s \
-                      AND play_time BETWEEN %s AND %s
-                    GROUP BY date_str
-                    ORDER BY date_str ASC \
-                    """
-        cursor.execute(sql_trend, [target_user_id, start_dt, end_dt])
-        stats['daily_trend'] = dictfetchall(cursor)
 
-        # -------------------------------------------------
-        # Part D: 社交影响力 (Social)
-        # 统计粉丝数和关注数 (截止到目前，不限时间段，因为这是累积数据)
-        # -------------------------------------------------
-        sql_social = """
-                     SELECT (SELECT COUNT(*) FROM UserFollow WHERE follower_id = %s) as following_count, \
-                            (SELECT COUNT(*) FROM UserFollow WHERE followed_id = %s) as followers_count \
-                     """
-        cursor.execute(sql_social, [target_user_id, target_user_id])
-        stats['social_stats'] = dictfetchall(cursor)[0]
+    # -------------------------------------------------
+    # Part C: 每日活跃趋势 (Activity Trend)
+    # 用于生成该用户的活跃度折线图
+    # -------------------------------------------------
+    sql_trend = """
+                SELECT DATE_FORMAT(play_time, '%%Y-%%m-%%d') as date_str,
+                       COUNT(*)                              as plays,
+                       SUM(play_duration)                    as duration
+                FROM PlayHistory
+                WHERE user_id = %s \
+                  AND play_time BETWEEN %s AND %s
+                GROUP BY date_str
+                ORDER BY date_str ASC \
+                """
+
+    # -------------------------------------------------
+    # Part D: 社交影响力 (Social)
+    # 统计粉丝数和关注数 (截止到目前，不限时间段，因为这是累积数据)
+    # -------------------------------------------------
+    sql_social = """
+                 SELECT (SELECT COUNT(*) FROM UserFollow WHERE follower_id = %s) as following_count, \
+                        (SELECT COUNT(*) FROM UserFollow WHERE followed_id = %s) as followers_count \
+                 """
+
+    # -------------------------------------------------
+    # 以上各部分互不依赖，分到多个连接上同时查询 (见 asyncDb.fan_out)
+    # -------------------------------------------------
+    period = [target_user_id, start_dt, end_dt]
+    user_info, summary, top_singer_data, hour_data, trend, social = fan_out(
+        Query(sql_user_info, [target_user_id], fetch="dicts"),
+        Query(USER_SUMMARY_SQL, params_summary, fetch="dicts"),
+        Query(sql_top_singer, period, fetch="dicts"),
+        Query(sql_active_hour, period, fetch="dicts"),
+        Query(sql_trend, period, fetch="dicts"),
+        Query(sql_social, [target_user_id, target_user_id], fetch="dicts"),
+    )
+
+    if not user_info:
+        return json_cn({"error": "用户不存在"}, 404)
+    stats['user_info'] = user_info[0]
+
+    stats['behavior_summary'] = summary[0]
+    # 转换一下时长显示 (分钟)
+    total_sec = stats['behavior_summary']['total_duration_sec']
+    stats['behavior_summary']['total_duration_min'] = round(total_sec / 60, 1)
+
+    stats['top_artist'] = top_singer_data[0] if top_singer_data else None
+    stats['peak_hour'] = hour_data[0]['hour_of_day'] if hour_data else None
+    stats['daily_trend'] = trend
+    stats['social_stats'] = social[0]
 
     return json_cn(stats)
 
@@ -1361,44 +1441,126 @@ def admin_get_pending_comments(request):
         return json_cn({"error": "POST required"}, 400)
 
     data = json.loads(request.body)
-    page = data.get("page", 1)
-    page_size = data.get("page_size", 20)
-    offset = (page - 1) * page_size
 
-    # 查询条件：状态是 '审核中' 或 '举报中'
-    sql = """
-          SELECT c.comment_id, \
-                 c.content, \
-                 c.status, \
-                 c.comment_time, \
-                 c.target_type, \
-                 c.target_id,
-                 u.user_id, \
-                 u.user_name, \
-                 u.status as user_status
-          FROM Comment c
-                   JOIN User u ON c.user_id = u.user_id
-          WHERE c.status IN ('审核中', '举报中')
-          ORDER BY c.comment_time DESC
-          LIMIT %s OFFSET %s \
-          """
+    # 查询条件：审核队列中的任务，可按入队原因 ('审核中' / '举报中') 筛选
+    # 被举报的排在前面，同类按入队先后；按 (priority, queue_id) 游标分页
+    reason = data.get("reason")
+    if reason not in (None, "") and reason not in PRIORITY:
+        return json_cn({"error": "无效的入队原因"}, 400)
 
-    # 统计总数
-    sql_count = "SELECT COUNT(*) FROM Comment WHERE status IN ('审核中', '举报中')"
+    page_size = get_page_size(data)
+    order_key = "moderation:ASC"
+    try:
+        last_values = decode_cursor(data.get("cursor"), order_key)
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    sql, params = pending_comments_query(reason, last_values, page_size)
 
     with connection.cursor() as cursor:
-        cursor.execute(sql, [page_size, offset])
+        cursor.execute(sql, params)
         comments = dictfetchall(cursor)
 
-        cursor.execute(sql_count)
-        total = cursor.fetchone()[0]
+        # 待审核总数直接读计数表
+        counts = pending_counts(cursor)
+
+    comments, next_cursor = split_page(
+        comments, page_size, order_key, lambda row: [row["priority"], row["queue_id"]]
+    )
 
     return json_cn({
         "pending_comments": comments,
-        "total": total,
-        "page": page
+        "total": counts[reason] if reason else counts["total"],
+        "counts": counts,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
+
+
+def pending_comments_query(reason, last_values, page_size):
+    """
+    待审核列表的一页 (多取一行)，按 (priority, queue_id) 升序
+    :param reason: 入队原因，为空时不筛选
+    :param last_values: 上一页最后一行的 (priority, queue_id)，第一页为 None
+    :return: (sql, params)
+    """
+    filters = []
+    params = []
+    if reason:
+        filters.append("q.priority = %s")
+        params.append(PRIORITY[reason])
+    if last_values:
+        cond, cond_params = keyset_condition("q.priority", "q.queue_id", "ASC", last_values)
+        filters.append(cond)
+        params += cond_params
+    where_clause = "WHERE " + " AND ".join(filters) if filters else ""
+
+    sql = f"""
+          SELECT {TASK_COLUMNS}
+          FROM Moderation_Queue q
+                   JOIN Comment c ON c.comment_id = q.comment_id
+                   JOIN User u ON c.user_id = u.user_id
+          {where_clause}
+          ORDER BY q.priority, q.queue_id
+          LIMIT %s
+          """
+    return sql, params + [page_size + 1]
+
+
+# ================================
+# 13.1 领取待审核评论
+# ================================
+# 领取的评论在租约到期前只有持有 claim_token 的管理员能审核，多个管理员可同时领取不同的评论
+@csrf_exempt
+def admin_claim_pending_comments(request):
+    ok, resp = require_admin(request)
+    if not ok: return resp
+
+    if request.method != "POST":
+        return json_cn({"error": "POST required"}, 400)
+
+    try:
+        data = json.loads(request.body)
+    except:
+        data = request.POST
+
+    limit = get_page_size(data)
+    lease = lease_seconds(data.get("lease_seconds"))
+
+    token, tasks = claim_tasks(request.session.get("user_id"), limit, lease)
+
+    return json_cn({
+        "claim_token": token,
+        "lease_seconds": lease,
+        "tasks": tasks,
+        "count": len(tasks)
     })
 
+
+# ================================
+# 13.2 放弃领取的评论
+# ================================
+@csrf_exempt
+def admin_release_pending_comments(request):
+    ok, resp = require_admin(request)
+    if not ok: return resp
+
+    if request.method != "POST":
+        return json_cn({"error": "POST required"}, 400)
+
+    data = json.loads(request.body)
+    token = data.get("claim_token")
+    if not token:
+        return json_cn({"error": "未检测到领取凭证"}, 400)
+
+    # 不传 comment_ids 时释放该凭证领取的全部评论
+    comment_ids = data.get("comment_ids")
+    if comment_ids is not None and not isinstance(comment_ids, list):
+        comment_ids = [comment_ids]
+
+    released = release_tasks(token, comment_ids)
+    return json_cn({"message": "已释放", "released": released})
+
 # ================================
 # 14. 管理员审核评论
 # ================================
@@ -1419,9 +1581,15 @@ def admin_audit_comment(request):
     if not comment_id or audit_result not in ['pass', 'reject']:
         return json_cn({"error": "参数错误"}, 400)
 
+    # 评论被其他管理员领取且租约未到期时不能审核
+    claim_token = data.get("claim_token")
+
     try:
         with connection.cursor() as cursor:
 
+            if claimed_by_other(cursor, comment_id, claim_token):
+                return json_cn({"error": "该评论已被其他管理员领取"}, 409)
+
             # 先查一下评论信息 (为了获取 user_id 用于封禁)
             cursor.execute("SELECT user_id, content FROM Comment WHERE comment_id = %s", [comment_id])
             row = cursor.fetchone()
@@ -1434,8 +1602,10 @@ def admin_audit_comment(request):
             # 情况 A: 审核通过 (改为正常)
             # ==============================
             if audit_result == 'pass':
-                sql_pass = "UPDATE Comment SET status = '正常' WHERE comment_id = %s"
-                cursor.execute(sql_pass, [comment_id])
+                # 状态、评论计数、审核队列一起更新
+                with transaction.atomic():
+                    set_comment_status(cursor, comment_id, '正常')
+                    dequeue_comments(cursor, [comment_id])
 
                 add_system_log(f"审核通过评论: {content_preview[:10]}...", "Comment", comment_id, "success")
                 return json_cn({"message": "操作成功，评论已恢复正常"})
@@ -1460,7 +1630,11 @@ def admin_audit_comment(request):
                 # 如果想留存证据，可以把 status 改为 '已删除'
                 # 这里直接删除
                 sql_delete = "DELETE FROM Comment WHERE comment_id = %s"
-                cursor.execute(sql_delete, [comment_id])
+                with transaction.atomic():
+                    uncount_comments(cursor, [comment_id])
+                    delete_like_records(cursor, "comment", [comment_id])
+                    cursor.execute(sql_delete, [comment_id])
+                    dequeue_comments(cursor, [comment_id])
 
                 action_msg = "审核驳回并删除" + ("(且封号)" if ban_user else "")
                 add_system_log(f"{action_msg}: {content_preview[:10]}...", "Comment", comment_id, "success")
@@ -1472,4 +1646,140 @@ def admin_audit_comment(request):
     except Exception as e:
         print(e)
         add_system_log(f"审核操作失败 ID={comment_id}", "Comment", comment_id, "fail")
-        return json_cn({"error": "操作失败"}, 500)
\ No newline at end of file
+        return json_cn({"error": "操作失败"}, 500)
+
+
+# ================================
+# 14.1 批量审核评论
+# ================================
+# 请求体: {"items": [{"comment_id": 1, "result": "pass"}, {"comment_id": 2, "result": "reject", "ban_user": true}, ...],
+#          "claim_token": "..."}
+# 整批在一个事务里执行：通过的评论一条 UPDATE，驳回的评论一条 DELETE，封禁的用户一条 UPDATE，
+# 评论统计按目标合并更新，系统日志一条多行 INSERT
+# 不存在的评论、正被其他管理员领取的评论跳过，在返回结果中列出
+@csrf_exempt
+def admin_audit_comments(request):
+    ok, resp = require_admin(request)
+    if not ok: return resp
+
+    if request.method != "POST":
+        return json_cn({"error": "POST required"}, 400)
+
+    data = json.loads(request.body)
+    items = data.get("items")
+    claim_token = data.get("claim_token")
+
+    # --------------------------
+    # 1. 校验参数
+    # --------------------------
+    max_items = getattr(settings, "MODERATION_BATCH_MAX", 500)
+    if not isinstance(items, list) or not items:
+        return json_cn({"error": "参数错误：items 必须为非空列表"}, 400)
+    if len(items) > max_items:
+        return json_cn({"error": f"一次最多审核 {max_items} 条评论"}, 400)
+
+    decisions = {}      # comment_id -> (result, ban_user)
+    for item in items:
+        try:
+            comment_id = int(item.get("comment_id"))
+        except (AttributeError, TypeError, ValueError):
+            return json_cn({"error": "参数错误：comment_id 必须为整数"}, 400)
+        result = item.get("result")
+        if result not in ['pass', 'reject']:
+            return json_cn({"error": f"参数错误：评论 {comment_id} 的 result 必须为 pass 或 reject"}, 400)
+        if comment_id in decisions:
+            return json_cn({"error": f"参数错误：评论 {comment_id} 重复"}, 400)
+        # 和单条审核一样，只有驳回时才封禁用户
+        decisions[comment_id] = (result, result == 'reject' and bool(item.get("ban_user", False)))
+
+    comment_ids = list(decisions)
+    placeholders = ", ".join(["%s"] * len(comment_ids))
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # --------------------------
+                # 2. 锁定评论，跳过不存在 / 被其他管理员领取的
+                # --------------------------
+                cursor.execute(
+                    f"SELECT comment_id, user_id, content FROM Comment WHERE comment_id IN ({placeholders}) FOR UPDATE",
+                    comment_ids,
+                )
+                comments = {comment_id: (user_id, content) for comment_id, user_id, content in cursor.fetchall()}
+                not_found = [cid for cid in comment_ids if cid not in comments]
+                claimed = claimed_by_others(cursor, list(comments), claim_token)
+
+                passed, rejected, ban_users = [], [], set()
+                for comment_id in comment_ids:
+                    if comment_id not in comments or comment_id in claimed:
+                        continue
+                    result, ban_user = decisions[comment_id]
+                    if result == 'pass':
+                        passed.append(comment_id)
+                    else:
+                        rejected.append(comment_id)
+                        if ban_user:
+                            ban_users.add(comments[comment_id][0])
+
+                # --------------------------
+                # 3. 审核通过：改为正常 (统计按目标合并更新)
+                # --------------------------
+                set_comments_status(cursor, passed, '正常')
+
+                # --------------------------
+                # 4. 审核驳回：删除评论，按需封禁用户
+                # --------------------------
+                if rejected:
+                    uncount_comments(cursor, rejected)
+                    delete_like_records(cursor, "comment", rejected)
+                    cursor.execute(
+                        f"DELETE FROM Comment WHERE comment_id IN ({', '.join(['%s'] * len(rejected))})",
+                        rejected,
+                    )
+                if ban_users:
+                    cursor.execute(
+                        f"UPDATE User SET status = '封禁中' WHERE user_id IN ({', '.join(['%s'] * len(ban_users))})",
+                        sorted(ban_users),
+                    )
+
+                dequeue_comments(cursor, passed + rejected)
+
+                # --------------------------
+                # 5. 系统日志：一条多行 INSERT
+                # --------------------------
+                logs = [(f"审核通过评论: {comments[cid][1][:10]}...", "Comment", cid, "success") for cid in passed]
+                logs += [(f"封禁用户(因违规评论): ID={uid}", "User", uid, "success") for uid in sorted(ban_users)]
+                for cid in rejected:
+                    action_msg = "审核驳回并删除" + ("(且封号)" if decisions[cid][1] else "")
+                    logs.append((f"{action_msg}: {comments[cid][1][:10]}...", "Comment", cid, "success"))
+                add_system_logs(logs)
+
+    except Exception as e:
+        print(e)
+        add_system_log(f"批量审核操作失败 ({len(comment_ids)} 条)", "Comment", None, "fail")
+        return json_cn({"error": "操作失败"}, 500)
+
+    return json_cn({
+        "message": "批量审核完成",
+        "passed": passed,
+        "rejected": rejected,
+        "banned_users": sorted(ban_users),
+        "not_found": not_found,
+        "claimed_by_other": sorted(claimed)
+    })
+
+
+# ================================
+# 15. 查看数据库连接池状态
+# ================================
+# 当前进程中各连接池的连接数、借用次数、借用等待时间 (平均 / 最大 / 分位数，毫秒)
+@csrf_exempt
+def admin_get_db_pool_stats(request):
+    ok, resp = require_admin(request)
+    if not ok:
+        return resp
+
+    if request.method != "GET":
+        return json_cn({"error": "GET required"}, 400)
+
+    return json_cn({"pools": all_pool_stats()})
@@ -0,0 +1,278 @@
+# 评论审核队列
+# 原先待审核列表直接扫 Comment WHERE status IN ('审核中', '举报中') + LIMIT/OFFSET，再单独 COUNT(*)，
+# 新评论都以 '审核中' 入库，翻页越深、评论表越大就越慢。这里单独维护一张队列表：
+#   - Moderation_Queue：发布评论、举报评论时入队，审核 / 删除评论时出队；被举报的评论优先 (priority 0)
+#   - Moderation_Count：按入队原因计数，与队列在同一事务里增减，待审核总数 O(1)；
+#     每个原因分 MODERATION_COUNT_SLOTS 个分片随机增减 (同 playCounter)，并发发布评论时不会都等同一行的锁
+#   - 领取 / 租约：管理员一次领取若干条任务，在租约到期前独占；
+#     用 FOR UPDATE SKIP LOCKED 领取，多个管理员同时领取时互不等待、不会领到同一条
+# 队列与评论状态不一致时可用 manage.py rebuild_moderation_queue 从 Comment 重建
+import random
+import uuid
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from app.models import ModerationQueue
+from .tools import dictfetchall
+
+
+REASON_NEW = "审核中"
+REASON_REPORTED = "举报中"
+
+PRIORITY = {
+    REASON_REPORTED: ModerationQueue.PRIORITY_REPORTED,
+    REASON_NEW: ModerationQueue.PRIORITY_NEW,
+}
+
+
+def get_slot_count():
+    return max(1, int(getattr(settings, "MODERATION_COUNT_SLOTS", 16)))
+
+
+def _add_count(cursor, reason, delta):
+    # 随机选一个分片增减；减少时该分片可能变成负数，只有各分片之和才有意义
+    cursor.execute(
+        """
+        INSERT INTO Moderation_Count (reason, slot, pending) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE pending = pending + VALUES(pending)
+        """,
+        [reason, random.randrange(get_slot_count()), delta],
+    )
+
+
+# ================================
+# 入队 / 出队
+# ================================
+def enqueue_comment(cursor, comment_id, reason):
+    """
+    评论进入审核队列；已在队列中的评论被举报时提升为举报优先级并累加举报次数
+    评论不存在时什么也不做
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                cursor.execute(
+                    """
+                    INSERT INTO Moderation_Queue (comment_id, reason, priority, report_count, enqueued_at)
+                    SELECT comment_id, %s, %s, %s, NOW()
+                    FROM Comment
+                    WHERE comment_id = %s
+                    """,
+                    [reason, PRIORITY[reason], 1 if reason == REASON_REPORTED else 0, comment_id],
+                )
+                inserted = cursor.rowcount
+        except IntegrityError:
+            # 已在队列中
+            inserted = 0
+            if reason == REASON_REPORTED:
+                cursor.execute(
+                    """
+                    UPDATE Moderation_Queue
+                    SET reason = %s, priority = %s, report_count = report_count + 1
+                    WHERE comment_id = %s AND reason = %s
+                    """,
+                    [REASON_REPORTED, PRIORITY[REASON_REPORTED], comment_id, REASON_NEW],
+                )
+                if cursor.rowcount:
+                    _add_count(cursor, REASON_NEW, -1)
+                    _add_count(cursor, REASON_REPORTED, 1)
+                else:
+                    cursor.execute(
+                        "UPDATE Moderation_Queue SET report_count = report_count + 1 WHERE comment_id = %s",
+                        [comment_id],
+                    )
+
+        if inserted:
+            _add_count(cursor, reason, 1)
+
+
+def dequeue_comments(cursor, comment_ids):
+    "审核完成或评论被删除时出队"
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(comment_ids))
+    with transaction.atomic():
+        for reason in (REASON_NEW, REASON_REPORTED):
+            cursor.execute(
+                f"DELETE FROM Moderation_Queue WHERE reason = %s AND comment_id IN ({placeholders})",
+                [reason, *comment_ids],
+            )
+            if cursor.rowcount:
+                _add_count(cursor, reason, -cursor.rowcount)
+
+
+def dequeue_user_comments(cursor, user_id):
+    "注销账号前调用：该用户的评论随账号一起删除"
+    with transaction.atomic():
+        for reason in (REASON_NEW, REASON_REPORTED):
+            cursor.execute(
+                """
+                DELETE q FROM Moderation_Queue q
+                JOIN Comment c ON c.comment_id = q.comment_id
+                WHERE q.reason = %s AND c.user_id = %s
+                """,
+                [reason, user_id],
+            )
+            if cursor.rowcount:
+                _add_count(cursor, reason, -cursor.rowcount)
+
+
+# ================================
+# 查询
+# ================================
+def pending_counts(cursor):
+    """:return: {"审核中": n, "举报中": m, "total": n + m}"""
+    cursor.execute("SELECT reason, SUM(pending) FROM Moderation_Count GROUP BY reason")
+    counts = {REASON_NEW: 0, REASON_REPORTED: 0}
+    counts.update({reason: max(int(pending), 0) for reason, pending in cursor.fetchall()})
+    counts["total"] = counts[REASON_NEW] + counts[REASON_REPORTED]
+    return counts
+
+
+# 列表 / 领取返回的列
+TASK_COLUMNS = """
+    q.queue_id, q.priority, q.reason, q.report_count, q.enqueued_at, q.claimed_by, q.lease_until,
+    c.comment_id, c.content, c.status, c.comment_time, c.target_type, c.target_id,
+    u.user_id, u.user_name, u.status AS user_status
+"""
+
+
+# ================================
+# 领取 / 释放
+# ================================
+# 未被领取 (或租约已过期) 的任务，按优先级、入队先后；跳过其他事务正在领取的行
+CLAIMABLE_SQL = """
+    SELECT queue_id
+    FROM Moderation_Queue
+    WHERE lease_until IS NULL OR lease_until < NOW()
+    ORDER BY priority, queue_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def lease_seconds(value=None):
+    "租约时长，限制在 1 ~ MODERATION_LEASE_MAX 秒"
+    default = getattr(settings, "MODERATION_LEASE_SECONDS", 300)
+    try:
+        value = default if value in (None, "") else int(value)
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(value, getattr(settings, "MODERATION_LEASE_MAX", 3600)))
+
+
+def claim_tasks(moderator_id, limit, lease):
+    """
+    领取最多 limit 条未被领取 (或租约已过期) 的任务
+    :return: (领取凭证, 任务列表)，没有可领取的任务时列表为空
+    """
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(CLAIMABLE_SQL, [limit])
+            queue_ids = [row[0] for row in cursor.fetchall()]
+            if not queue_ids:
+                return token, []
+
+            placeholders = ", ".join(["%s"] * len(queue_ids))
+            cursor.execute(
+                f"""
+                UPDATE Moderation_Queue
+                SET claimed_by = %s, claim_token = %s, lease_until = DATE_ADD(NOW(), INTERVAL %s SECOND)
+                WHERE queue_id IN ({placeholders})
+                """,
+                [moderator_id, token, lease, *queue_ids],
+            )
+            cursor.execute(
+                f"""
+                SELECT {TASK_COLUMNS}
+                FROM Moderation_Queue q
+                JOIN Comment c ON c.comment_id = q.comment_id
+                JOIN User u ON u.user_id = c.user_id
+                WHERE q.queue_id IN ({placeholders})
+                ORDER BY q.priority, q.queue_id
+                """,
+                queue_ids,
+            )
+            tasks = dictfetchall(cursor)
+    return token, tasks
+
+
+def release_tasks(token, comment_ids=None):
+    "放弃领取 (不审核)，任务回到队列中；返回释放的任务数"
+    params = [token]
+    extra = ""
+    if comment_ids:
+        extra = f" AND comment_id IN ({', '.join(['%s'] * len(comment_ids))})"
+        params += list(comment_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE Moderation_Queue
+            SET claimed_by = NULL, claim_token = NULL, lease_until = NULL
+            WHERE claim_token = %s{extra}
+            """,
+            params,
+        )
+        return cursor.rowcount
+
+
+def claimed_by_other(cursor, comment_id, token):
+    "评论是否正被其他管理员领取 (租约未过期且凭证不同)"
+    cursor.execute(
+        """
+        SELECT claim_token
+        FROM Moderation_Queue
+        WHERE comment_id = %s AND lease_until >= NOW()
+        """,
+        [comment_id],
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] != token
+
+
+def claimed_by_others(cursor, comment_ids, token):
+    "批量版 claimed_by_other，返回正被其他管理员领取的评论 id 集合"
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return set()
+    cursor.execute(
+        f"""
+        SELECT comment_id, claim_token
+        FROM Moderation_Queue
+        WHERE comment_id IN ({", ".join(["%s"] * len(comment_ids))}) AND lease_until >= NOW()
+        """,
+        comment_ids,
+    )
+    return {comment_id for comment_id, claim_token in cursor.fetchall() if claim_token != token}
+
+
+# ================================
+# 重建
+# ================================
+def rebuild_moderation_queue():
+    "按 Comment 当前状态重建队列 (已领取的租约会被清空)，返回队列长度"
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM Moderation_Queue")
+            cursor.execute("DELETE FROM Moderation_Count")
+            cursor.execute(
+                """
+                INSERT INTO Moderation_Queue (comment_id, reason, priority, report_count, enqueued_at)
+                SELECT comment_id, status,
+                       CASE WHEN status = %s THEN %s ELSE %s END,
+                       CASE WHEN status = %s THEN 1 ELSE 0 END,
+                       comment_time
+                FROM Comment
+                WHERE status IN (%s, %s)
+                ORDER BY comment_time, comment_id
+                """,
+                [REASON_REPORTED, PRIORITY[REASON_REPORTED], PRIORITY[REASON_NEW], REASON_REPORTED,
+                 REASON_NEW, REASON_REPORTED],
+            )
+            rows = cursor.rowcount
+            for reason in (REASON_NEW, REASON_REPORTED):
+                cursor.execute("SELECT COUNT(*) FROM Moderation_Queue WHERE reason = %s", [reason])
+                _add_count(cursor, reason, cursor.fetchone()[0])
+    return rows
@@ -1,9 +1,15 @@
 # 歌手与音乐模块
+# 搜索和详情接口写成查询计划 (见 asyncDb)，同时提供同步视图和异步视图 (view.async_view)
 
-from django.db import connection
 from django.views.decorators.csrf import csrf_exempt
 import json
 from .tools import *
+from .searchIndex import match_filter, relevance_order
+from .profileCache import profile_cache
+from .invalidationBus import tag
+from .asyncDb import Gather, Query, read_view
+from .commentFeed import profile_comments_plan
+from .fastJson import encoded_loader
 
 
 
@@ -12,11 +18,12 @@ from .tools import *
 # 1. 搜索歌手
 # ================================
 @csrf_exempt
-def search_singer(request):
+@read_view
+def search_singer(request, user_id):
     # --------------------------
     # 1. 登录校验
     # --------------------------
-    if "user_id" not in request.session:
+    if not user_id:
         return json_cn({"error": "请先登录"}, 403)
     
     if request.method != "POST":
@@ -38,27 +45,38 @@ def search_singer(request):
     singer_name = data.get("singer_name")
 
     if singer_type and singer_type != "":
-        filters.append("type = %s")
+        filters.append("s.type = %s")
         params.append(singer_type)
     if country and country != "":
-        filters.append("country = %s")
+        filters.append("s.country = %s")
         params.append(country)
+
+    # 歌手名条件优先走搜索索引，索引未就绪时回退到 LIKE
+    name_ids = None
     if singer_name and singer_name != "":
-        filters.append("singer_name LIKE %s")
-        params.append("%" + singer_name + "%")
+        name_filter, name_params, name_ids = match_filter("singer", singer_name, "s.singer_id", "s.singer_name")
+        filters.append(name_filter)
+        params += name_params
 
 
     # --------------------------
     # 3. 获取排序标签
     # --------------------------
-    orderType = data.get("order")       # name / songs / followers
+    orderType = data.get("order")       # relevance / name / songs / followers
     orderDir = data.get("direction")    # asc / desc
     orderDir = "DESC" if str(orderDir).lower() == "desc" else "ASC"
 
     join_clause = ""
-    order_clause = "s.singer_name " + orderDir
+    sort_expr = "s.singer_name"
+
+    if orderType not in ["name", "songs", "followers", "relevance"] or \
+            (orderType == "relevance" and name_ids is None):
+        # 按歌手名搜索且索引可用时默认按相关度排序
+        orderType = "relevance" if name_ids is not None else "name"
 
-    if orderType == "songs":
+    if orderType == "relevance":
+        sort_expr = "s.singer_id"       # 名次在 Python 中计算，这里只占位
+    elif orderType == "songs":
         join_clause = """
             LEFT JOIN (
                 SELECT singer_id, COUNT(*) AS total_songs
@@ -66,7 +84,7 @@ def search_singer(request):
                 GROUP BY singer_id
             ) song_count ON song_count.singer_id = s.singer_id
         """
-        order_clause = "total_songs " + orderDir
+        sort_expr = "COALESCE(song_count.total_songs, 0)"
     elif orderType == "followers":
         join_clause = """
             LEFT JOIN (
@@ -75,68 +93,89 @@ def search_singer(request):
                 GROUP BY singer_id
             ) follow_count ON follow_count.singer_id = s.singer_id
         """
-        order_clause = "followers " + orderDir
-  
+        sort_expr = "COALESCE(follow_count.followers, 0)"
+
     # --------------------------
-    # 4. 正式查找歌手
+    # 4. 分页参数
+    # --------------------------
+    page_size = get_page_size(data)
+    order_key = f"singer:{orderType}:{orderDir}"
+    try:
+        last_values = decode_cursor(data.get("cursor"), order_key, rank=orderType == "relevance")
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    page_filters = list(filters)
+    page_params = list(params)
+    order_params = []
+    if orderType == "relevance":
+        # 名次在游标之后的候选已满足歌手名条件，用它替换原来的歌手名条件
+        page_filters = [f for f in filters if f is not name_filter]
+        page_params = params[:len(params) - len(name_params)]
+        cond, cond_params, order_clause, order_params, ranks = relevance_order("s.singer_id", name_ids, last_values)
+        page_filters.append(cond)
+        page_params += cond_params
+        key_func = lambda row: [ranks[row[0]], row[0]]
+    else:
+        if last_values:
+            cond, cond_params = keyset_condition(sort_expr, "s.singer_id", orderDir, last_values)
+            page_filters.append(cond)
+            page_params += cond_params
+        order_clause = f"{sort_expr} {orderDir}, s.singer_id {orderDir}"
+        key_func = lambda row: [row[4], row[0]]
+
+    # --------------------------
+    # 5. 正式查找歌手
     # --------------------------
-
     where_clause = "WHERE " + " AND ".join(filters) if filters else ""
+    page_where_clause = "WHERE " + " AND ".join(page_filters) if page_filters else ""
 
     sql = f"""
         SELECT
-            s.singer_id, s.singer_name, s.type, s.country
-            {', COALESCE(song_count.total_songs, 0) AS total_songs' if orderType == 'songs' else ''}
-            {', COALESCE(follow_count.followers, 0) AS followers' if orderType == 'followers' else ''}
+            s.singer_id, s.singer_name, s.type, s.country,
+            {sort_expr} AS sort_value
         FROM Singer s
         {join_clause}
-        {where_clause}
+        {page_where_clause}
         ORDER BY {order_clause}
+        LIMIT %s
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
+    rows = yield Query(sql, page_params + order_params + [page_size + 1])
+
+    rows, next_cursor = split_page(rows, page_size, order_key, key_func)
 
     # ------------------------
-    # 5. 查询数量
+    # 6. 查询数量
     # ------------------------
     sql_count = f"""
         SELECT COUNT(*)
-        FROM Singer
+        FROM Singer s
         {where_clause}
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_count, params)
-        total = cursor.fetchone()[0]
+    total = (yield Query(sql_count, params, fetch="one"))[0]
 
 
     # --------------------------
-    # 6. 返回搜索结果
+    # 7. 返回搜索结果
     # --------------------------
     singers = []
-    for row in rows:
-        singer_id, singer_name, singer_type, country = row[:4]
-        songs_count = None
-        followers_count = None
-        if orderType == "songs":
-            songs_count = row[4]
-        elif orderType == "followers":
-            followers_count = row[4]
-
+    for singer_id, singer_name, singer_type, country, sort_value in rows:
         singers.append({
             "singer_id": singer_id,
             "singer_name": singer_name,
             "type": singer_type,
             "country": country,
-            "songs_count": songs_count,
-            "followers_count": followers_count
+            "songs_count": sort_value if orderType == "songs" else None,
+            "followers_count": sort_value if orderType == "followers" else None
         })
 
     return json_cn({
         "total": total,
-        "singers": singers
+        "singers": singers,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
@@ -146,39 +185,48 @@ def search_singer(request):
 # 2. 歌手详情
 # ================================
 @csrf_exempt
-def singer_profile(request, singer_id):
+@read_view
+def singer_profile(request, user_id, singer_id):
     # --------------------------
     # 1. 检查登录状态
     # --------------------------
-    if "user_id" not in request.session:
+    if not user_id:
         return json_cn({"error": "请先登录后再进行查看操作"}, 403)
 
     # --------------------------
-    # 2. 查询歌手信息
+    # 2. 读取歌手详情 (曲库数据，走缓存，缓存中是编码好的 JSON)
+    # --------------------------
+    profile = yield from profile_cache.get_plan("singer", singer_id, encoded_loader(load_singer_profile))
+    if profile is None:
+        return json_cn({"error": "歌手不存在"}, 404)
+
+    return json_cn(profile)
+
+
+def load_singer_profile(singer_id):
+    """
+    查询歌手详情 (查询计划)
+    :return: (歌手详情, 依赖标签)，歌手不存在时详情为 None
+    """
+    # --------------------------
+    # 1. 查询歌手信息
     # --------------------------
     sql_list = """
         SELECT singer_name, type, country, birthday, introduction
         FROM Singer
         WHERE singer_id = %s
     """
-    with connection.cursor() as cursor:
-        cursor.execute(sql_list, [singer_id])
-        row = cursor.fetchone()
-
-    if not row:
-        return json_cn({"error": "歌手不存在"}, 404)
-
-    singer_name, singer_type, country, birthday, introduction = row
 
 
     # --------------------------
-    # 3. 查询歌手的歌曲列表
+    # 2. 查询歌手的歌曲列表
     # --------------------------
     sql_songs = """
         SELECT 
             s.song_id,
             s.song_title,
             s.duration,
+            a.album_id,
             a.album_title
         FROM Song s
         JOIN Album a ON s.album_id = a.album_id
@@ -186,15 +234,36 @@ def singer_profile(request, singer_id):
         WHERE ss.singer_id = %s
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_songs, [singer_id])
-        song_rows = cursor.fetchall()
+    # --------------------------
+    # 3. 查询歌手的专辑列表
+    # --------------------------
+    sql_albums = """
+        SELECT 
+            a.album_id,
+            a.album_title,
+            a.release_date
+        FROM Album a
+        JOIN Singer s ON s.singer_id = a.singer_id
+        WHERE s.singer_id = %s
+    """
+
+    # 三部分互不依赖，同时查询
+    row, song_rows, album_rows = yield Gather(
+        Query(sql_list, [singer_id], fetch="one"),
+        Query(sql_songs, [singer_id]),
+        Query(sql_albums, [singer_id]),
+    )
+
+    if not row:
+        return None, []
+
+    singer_name, singer_type, country, birthday, introduction = row
 
     # --------------------------
     # 4. 生成歌手歌曲列表
     # --------------------------
     songs = []
-    for (song_id, song_title, duration, album_title) in song_rows:
+    for (song_id, song_title, duration, _, album_title) in song_rows:
         songs.append({
             "song_id": song_id,
             "song_title": song_title,
@@ -205,24 +274,7 @@ def singer_profile(request, singer_id):
 
 
     # --------------------------
-    # 5. 查询歌手的专辑列表
-    # --------------------------
-    sql_albums = """
-        SELECT 
-            a.album_id,
-            a.album_title,
-            a.release_date
-        FROM Album a
-        JOIN Singer s ON s.singer_id = a.singer_id
-        WHERE s.singer_id = %s
-    """
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql_albums, [singer_id])
-        album_rows = cursor.fetchall()
-
-    # --------------------------
-    # 6. 生成歌手专辑列表
+    # 5. 生成歌手专辑列表
     # --------------------------
     albums = []
     for (album_id, album_title, release_date) in album_rows:
@@ -233,9 +285,13 @@ def singer_profile(request, singer_id):
         })
 
     # --------------------------
-    # 7. 返回歌手详情
+    # 6. 返回歌手详情及依赖的歌曲、专辑
     # --------------------------
-    return json_cn({
+    tags = [tag("song", row[0]) for row in song_rows] \
+        + [tag("album", row[3]) for row in song_rows] \
+        + [tag("album", row[0]) for row in album_rows]
+
+    return {
         "singer_id": singer_id,
         "singer_name": singer_name,
         "type": singer_type,
@@ -246,7 +302,7 @@ def singer_profile(request, singer_id):
         "songs": songs,
         "album_count": len(albums),
         "albums": albums
-    })
+    }, tags
 
 
 
@@ -254,11 +310,12 @@ def singer_profile(request, singer_id):
 # 3. 搜索专辑
 # ================================
 @csrf_exempt
-def search_album(request):
+@read_view
+def search_album(request, user_id):
     # --------------------------
     # 1. 登录校验
     # --------------------------
-    if "user_id" not in request.session:
+    if not user_id:
         return json_cn({"error": "请先登录"}, 403)
     
     if request.method != "POST":
@@ -278,36 +335,82 @@ def search_album(request):
     filters = []
     params = []
 
+    # 名称条件优先走搜索索引，索引未就绪时回退到 LIKE
+    title_filter, title_params, title_ids = None, [], None
     if album_title:
-        filters.append("a.album_title LIKE %s")
-        params.append(f"%{album_title}%")
+        title_filter, title_params, title_ids = match_filter("album", album_title, "a.album_id", "a.album_title")
     if singer_name:
-        filters.append("sg.singer_name LIKE %s")
-        params.append(f"%{singer_name}%")
+        cond, cond_params, _ = match_filter("singer", singer_name, "sg.singer_id", "sg.singer_name")
+        filters.append(cond)
+        params += cond_params
 
     
     # --------------------------
     # 3. 查询结果排序
     # --------------------------  
-    orderType = data.get("order")       # release_date / songs_count / album_title
+    orderType = data.get("order")       # relevance / release_date / songs_count / album_title
     orderDir = data.get("direction")    # asc / desc
     orderDir = "DESC" if str(orderDir).lower() == "desc" else "ASC"
 
-    order = "a.album_title " + orderDir # 默认按名字排序
+    sort_expr = "a.album_title"         # 默认按名字排序
     join = ""
 
-    if orderType == "release_date":
-        order = "a.release_date " + orderDir
+    if orderType not in ["release_date", "songs_count", "album_title", "relevance"] or \
+            (orderType == "relevance" and title_ids is None):
+        # 按专辑名搜索且索引可用时默认按相关度排序
+        orderType = "relevance" if title_ids is not None else "album_title"
+
+    if orderType == "relevance":
+        sort_expr = "a.album_id"        # 名次在 Python 中计算，这里只占位
+    elif orderType == "release_date":
+        sort_expr = "a.release_date"
     elif orderType == "songs_count":
-        join = "LEFT JOIN Song s ON s.album_id = a.album_id"
-        order = "COUNT(s.song_id) " + orderDir
+        join = """
+            LEFT JOIN (
+                SELECT album_id, COUNT(*) AS songs_count
+                FROM Song
+                GROUP BY album_id
+            ) sc ON sc.album_id = a.album_id
+        """
+        sort_expr = "COALESCE(sc.songs_count, 0)"
 
     # --------------------------
-    # 4. 查询专辑信息
+    # 4. 分页参数
+    # --------------------------
+    page_size = get_page_size(data)
+    order_key = f"album:{orderType}:{orderDir}"
+    try:
+        last_values = decode_cursor(data.get("cursor"), order_key, rank=orderType == "relevance")
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    # 总数只按搜索条件统计，不含分页条件
+    count_filters = filters + ([title_filter] if title_filter else [])
+    count_params = params + title_params
+
+    order_params = []
+    if orderType == "relevance":
+        cond, cond_params, order_clause, order_params, ranks = relevance_order("a.album_id", title_ids, last_values)
+        filters.append(cond)
+        params += cond_params
+        key_func = lambda row: [ranks[row[0]], row[0]]
+    else:
+        if title_filter:
+            filters.append(title_filter)
+            params += title_params
+        if last_values:
+            cond, cond_params = keyset_condition(sort_expr, "a.album_id", orderDir, last_values)
+            filters.append(cond)
+            params += cond_params
+        order_clause = f"{sort_expr} {orderDir}, a.album_id {orderDir}"
+        key_func = lambda row: [row[4], row[0]]
+
+    # --------------------------
+    # 5. 查询专辑信息
     # --------------------------
     sql_album = f"""
-        SELECT a.album_id, a.album_title, sg.singer_name, a.release_date
-        {', COUNT(s.song_id) AS songs_count' if orderType == 'songs_count' else ''}
+        SELECT a.album_id, a.album_title, sg.singer_name, a.release_date,
+               {sort_expr} AS sort_value
         FROM Album a
         JOIN Singer sg ON a.singer_id = sg.singer_id
         {join}
@@ -315,38 +418,46 @@ def search_album(request):
 
     if filters:
         sql_album += " WHERE " + " AND ".join(filters)
-    if orderType == 'songs_count':
-        sql_album += " GROUP BY a.album_id"
 
-    sql_album += f" ORDER BY {order}"
+    sql_album += f" ORDER BY {order_clause} LIMIT %s"
+    params += order_params + [page_size + 1]
+
+    sql_count = """
+        SELECT COUNT(*)
+        FROM Album a
+        JOIN Singer sg ON a.singer_id = sg.singer_id
+    """
+    if count_filters:
+        sql_count += " WHERE " + " AND ".join(count_filters)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_album, params)
-        rows = cursor.fetchall()
+    # 本页与总数同时查询
+    rows, (total,) = yield Gather(Query(sql_album, params), Query(sql_count, count_params, fetch="one"))
 
 
-    if not rows:
+    if not rows and not last_values:
         return json_cn({"message": "未找到符合条件专辑", "albums": []})
 
+    rows, next_cursor = split_page(rows, page_size, order_key, key_func)
+
 
     # --------------------------
-    # 5. 返回搜索结果
+    # 6. 返回搜索结果
     # --------------------------
     albums = []
-    for row in rows:
-        album_id, album_title, singer_name, release_date = row[:4]
-        songs_count = row[4] if orderType == "songs_count" else None
+    for album_id, album_title, singer_name, release_date, sort_value in rows:
         albums.append({
             "album_id": album_id,
             "album_title": album_title,
             "singer_name": singer_name,
             "release_date": str(release_date) if release_date else None,
-            "songs_count": songs_count
+            "songs_count": sort_value if orderType == "songs_count" else None
         })
 
     return json_cn({
-        "total": len(albums),
-        "albums": albums
+        "total": total,
+        "albums": albums,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
@@ -355,15 +466,37 @@ def search_album(request):
 # 4. 专辑详情
 # ================================
 @csrf_exempt
-def album_profile(request, album_id):
+@read_view
+def album_profile(request, user_id, album_id):
     # --------------------------
     # 1. 检查登录状态
     # --------------------------
-    if "user_id" not in request.session:
+    if not user_id:
         return json_cn({"error": "请先登录后再进行查看操作"}, 403)
 
     # --------------------------
-    # 2. 查询专辑信息
+    # 2. 同时读取专辑评论 (第一页 + 总数) 和专辑详情 (曲库数据，走缓存，缓存中是编码好的 JSON)
+    # --------------------------
+    comments, profile = yield Gather(
+        profile_comments_plan("album", album_id),
+        profile_cache.get_plan("album", album_id, encoded_loader(load_album_profile)),
+    )
+    if profile is None:
+        return json_cn({"error": "专辑不存在"}, 404)
+
+    # --------------------------
+    # 3. 返回专辑详情
+    # --------------------------
+    return json_cn(profile.merge(comments))
+
+
+def load_album_profile(album_id):
+    """
+    查询专辑详情 (不含评论，查询计划)
+    :return: (专辑详情, 依赖标签)，专辑不存在时详情为 None
+    """
+    # --------------------------
+    # 1. 专辑信息
     # --------------------------
     sql_list = """
         SELECT album_title, release_date, cover_url, description, sg.singer_name, sg.singer_id
@@ -371,18 +504,9 @@ def album_profile(request, album_id):
         JOIN Singer sg ON sg.singer_id = a.singer_id
         WHERE a.album_id = %s
     """
-    with connection.cursor() as cursor:
-        cursor.execute(sql_list, [album_id])
-        row = cursor.fetchone()
-
-    if not row:
-        return json_cn({"error": "专辑不存在"}, 404)
-
-    album_title, release_date, cover_url, description, singer_name, singer_id = row
-
 
     # --------------------------
-    # 3. 查询专辑的歌曲列表
+    # 2. 专辑的歌曲列表及总时长
     # --------------------------
     sql_albums = """
         SELECT 
@@ -402,71 +526,43 @@ def album_profile(request, album_id):
         WHERE a.album_id = %s
     """
 
-    sql_singers = """
-        SELECT
-            sg.singer_id,
-            sg.singer_name
-        FROM Singer sg
-        JOIN Song_Singer ss ON ss.singer_id = sg.singer_id
-        WHERE ss.song_id = %s
-    """
-
-    sql_comment = """
-        SELECT 
-            u.user_id, u.user_name, c.comment_id, c.content, c.like_count, c.comment_time
-        FROM Comment c 
-        JOIN User u ON u.user_id = c.user_id
-        WHERE target_id = %s AND target_type = 'album'
-        ORDER BY comment_time DESC
-    """
+    def songs_plan():
+        song_rows = yield Query(sql_albums, [album_id])
+        # 批量查询所有歌曲的歌手
+        singers_map = yield from singers_plan([row[0] for row in song_rows])
+        return song_rows, singers_map
 
     # --------------------------
-    # 4. 查询并生成专辑歌曲列表
+    # 3. 三部分互不依赖，同时查询
     # --------------------------
-    songs = []
+    row, (song_rows, singers_map), (total_duration,) = yield Gather(
+        Query(sql_list, [album_id], fetch="one"),
+        songs_plan(),
+        Query(sql_total_duration, [album_id], fetch="one"),
+    )
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_albums, [album_id])
-        song_rows = cursor.fetchall()
+    if not row:
+        return None, []
 
-        cursor.execute(sql_total_duration, [album_id])
-        total_duration = cursor.fetchone()[0]
-        
-        for (song_id, song_title, duration) in song_rows:
-            cursor.execute(sql_singers, [song_id])
-            singer_rows = cursor.fetchall()
-            song_singers = [{"singer_id": row[0], "singer_name": row[1]} for row in singer_rows]
-
-            songs.append({
-                "song_id": song_id,
-                "song_title": song_title,
-                "duration": duration,
-                "duration_formatted": format_time(duration),
-                "singers": song_singers
-            })
-
-        cursor.execute(sql_comment, [album_id])
-        comment_rows = cursor.fetchall()
-
-
-    # --------------------------
-    # 5. 生成专辑评论列表
-    # --------------------------
-    comments = []
-    for user_id, user_name, comment_id, content, like_count, comment_time in comment_rows:
-        comments.append({
-            "comment_id": comment_id,
-            "user_id": user_id,
-            "user_name": user_name,
-            "content": content,
-            "like_count": like_count,
-            "comment_time": comment_time.strftime("%Y-%m-%d %H:%M") if comment_time else None
+    album_title, release_date, cover_url, description, singer_name, singer_id = row
+
+    songs = []
+    for (song_id, song_title, duration) in song_rows:
+        songs.append({
+            "song_id": song_id,
+            "song_title": song_title,
+            "duration": duration,
+            "duration_formatted": format_time(duration),
+            "singers": singers_map[song_id]
         })
 
     # --------------------------
-    # 6. 返回专辑详情
+    # 4. 返回专辑详情及依赖的歌手、歌曲
     # --------------------------
-    return json_cn({
+    tags = [tag("singer", singer_id)] + [tag("song", row[0]) for row in song_rows] \
+        + [tag("singer", singer["singer_id"]) for singers in singers_map.values() for singer in singers]
+
+    return {
         "album_id": album_id,
         "album_title": album_title,
         "singer_id": singer_id,
@@ -477,10 +573,8 @@ def album_profile(request, album_id):
         "song_count": len(songs),
         "total_duration": total_duration,
         "total_duration_formatted": format_time(total_duration),
-        "songs": songs,
-        "comment_count": len(comments),
-        "comments": comments
-    })
+        "songs": songs
+    }, tags
 
 
 
@@ -488,11 +582,11 @@ def album_profile(request, album_id):
 # 5. 搜索歌曲
 # ================================
 @csrf_exempt
-def search_song(request):
+@read_view
+def search_song(request, user_id):
     # --------------------------
     # 1. 登录校验
     # --------------------------
-    user_id = request.session.get("user_id")
     if not user_id:
         return json_cn({"error": "请先登录"}, 403)
 
@@ -515,89 +609,131 @@ def search_song(request):
     filters = []
     params = []
 
+    # 名称条件优先走搜索索引，索引未就绪时回退到 LIKE
+    title_filter, title_params, title_ids = None, [], None
     if song_title:
-        filters.append("s.song_title LIKE %s")
-        params.append(f"%{song_title}%")
+        title_filter, title_params, title_ids = match_filter("song", song_title, "s.song_id", "s.song_title")
     if album_title:
-        filters.append("a.album_title LIKE %s")
-        params.append(f"%{album_title}%")
+        cond, cond_params, _ = match_filter("album", album_title, "a.album_id", "a.album_title")
+        filters.append(cond)
+        params += cond_params
     if singer_name:
-        filters.append("si.singer_name LIKE %s")
-        params.append(f"%{singer_name}%")
+        cond, cond_params, _ = match_filter("singer", singer_name, "si.singer_id", "si.singer_name")
+        filters.append(cond)
+        params += cond_params
 
 
     # --------------------------
     # 3. 查询结果排序
     # --------------------------  
-    orderType = data.get("order")       # duration / play_count / song_title
+    orderType = data.get("order")       # relevance / duration / play_count / song_title
     orderDir = data.get("direction")    # asc / desc
     orderDir = "DESC" if str(orderDir).lower() == "desc" else "ASC"
     
     allowed_order = ["duration", "play_count", "song_title"]
+    if title_ids is not None:
+        allowed_order.append("relevance")
     if orderType not in allowed_order:  
-        orderType = "song_title"    # 默认按名字排序
-    order = f"s.{orderType} {orderDir}"
-
+        # 按歌名搜索且索引可用时默认按相关度排序，否则按名字排序
+        orderType = "relevance" if title_ids is not None else "song_title"
+    sort_expr = f"s.{orderType}"
 
     # --------------------------
-    # 4. 查询歌曲信息
+    # 4. 分页参数
+    # --------------------------
+    page_size = get_page_size(data)
+    order_key = f"song:{orderType}:{orderDir}"
+    try:
+        last_values = decode_cursor(data.get("cursor"), order_key, rank=orderType == "relevance")
+    except ValueError as e:
+        return json_cn({"error": str(e)}, 400)
+
+    # 总数只按搜索条件统计，不含分页条件
+    count_filters = filters + ([title_filter] if title_filter else [])
+    count_params = params + title_params
+
+    order_params = []
+    if orderType == "relevance":
+        # 相关度分页：只取名次在游标之后的候选，候选集合已包含歌名条件
+        cond, cond_params, order_clause, order_params, ranks = relevance_order("s.song_id", title_ids, last_values)
+        filters.append(cond)
+        params += cond_params
+    else:
+        if title_filter:
+            filters.append(title_filter)
+            params += title_params
+        if last_values:
+            cond, cond_params = keyset_condition(sort_expr, "s.song_id", orderDir, last_values)
+            filters.append(cond)
+            params += cond_params
+        order_clause = f"{sort_expr} {orderDir}, s.song_id {orderDir}"
+
+
+    # --------------------------
+    # 5. 查询歌曲信息
     # --------------------------
     # Base SQL query
-    sql_song = """
-        SELECT DISTINCT s.song_id, s.song_title, s.duration, s.play_count, a.album_title
+    sql_from = """
         FROM Song s
         JOIN Album a ON a.album_id = s.album_id
     """
     
     # Add JOIN for singer filter if needed
     if singer_name:
-        sql_song += """
+        sql_from += """
         JOIN Song_Singer ss ON s.song_id = ss.song_id
         JOIN Singer si ON ss.singer_id = si.singer_id
         """
-    
-    sql_singers = """
-        SELECT si.singer_id, si.singer_name 
-        FROM Singer si
-        JOIN Song_Singer ss ON si.singer_id = ss.singer_id
-        WHERE ss.song_id = %s
-    """
 
+    sql_song = "SELECT DISTINCT s.song_id, s.song_title, s.duration, s.play_count, a.album_title" + sql_from
     if filters:
         sql_song += " WHERE " + " AND ".join(filters)
 
-    sql_song += f"ORDER BY {order}"
-
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql_song, params)
-        rows = cursor.fetchall()
-
-        if not rows:
-            return json_cn({"message": "未找到符合歌曲", "songs": []})
-            
-        # --------------------------
-        # 5. 生成歌曲列表
-        # --------------------------
-        songs = []
-        for (song_id, song_title, duration, play_count, album_title) in rows:
-            cursor.execute(sql_singers, [song_id])
-            singer_rows = cursor.fetchall()
-            song_singers = [{"singer_id": row[0], "singer_name": row[1]} for row in singer_rows]
-
-            songs.append({
-                "song_id": song_id,
-                "song_title": song_title,
-                "duration": duration,
-                "duration_formatted": format_time(duration),
-                "play_count": play_count,
-                "album_title": album_title,
-                "singers": song_singers
-            })
+    sql_count = "SELECT COUNT(DISTINCT s.song_id)" + sql_from
+    if count_filters:
+        sql_count += " WHERE " + " AND ".join(count_filters)
+
+    sql_song += f" ORDER BY {order_clause} LIMIT %s"
+    params += order_params + [page_size + 1]
+
+    # 游标中的排序值：相关度取名次，其余取对应列
+    if orderType == "relevance":
+        key_func = lambda row: [ranks[row[0]], row[0]]
+    else:
+        sort_index = {"song_title": 1, "duration": 2, "play_count": 3}[orderType]
+        key_func = lambda row: [row[sort_index], row[0]]
+
+    # 本页与总数同时查询
+    rows, (total,) = yield Gather(Query(sql_song, params), Query(sql_count, count_params, fetch="one"))
+
+    if not rows and not last_values:
+        return json_cn({"message": "未找到符合歌曲", "songs": []})
+
+    rows, next_cursor = split_page(rows, page_size, order_key, key_func)
+
+    # --------------------------
+    # 6. 生成歌曲列表
+    # --------------------------
+    # 批量查询本页歌曲的歌手
+    singers_map = yield from singers_plan([row[0] for row in rows])
+
+    songs = []
+    for (song_id, song_title, duration, play_count, album_title) in rows:
+        songs.append({
+            "song_id": song_id,
+            "song_title": song_title,
+            "duration": duration,
+            "duration_formatted": format_time(duration),
+            "play_count": play_count,
+            "album_title": album_title,
+            "singers": singers_map[song_id]
+        })
 
     return json_cn({
-        "total": len(songs),
-        "songs": songs
+        "total": total,
+        "songs": songs,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
@@ -607,16 +743,35 @@ def search_song(request):
 # 6. 歌曲详情
 # ================================
 @csrf_exempt
-def song_profile(request, song_id):
+@read_view
+def song_profile(request, user_id, song_id):
     # --------------------------
     # 1. 检查登录状态
     # --------------------------
-    if "user_id" not in request.session:
+    if not user_id:
         return json_cn({"error": "请先登录后再进行查看操作"}, 403)
 
     # --------------------------
-    # 2. 查询歌曲信息
+    # 2. 同时读取歌曲评论 (第一页 + 总数) 和歌曲信息 (曲库数据，走缓存，缓存中是编码好的 JSON)
+    # --------------------------
+    comments, profile = yield Gather(
+        profile_comments_plan("song", song_id),
+        profile_cache.get_plan("song", song_id, encoded_loader(load_song_profile)),
+    )
+    if profile is None:
+        return json_cn({"error": "歌曲不存在"}, 404)
+
     # --------------------------
+    # 3. 返回歌曲详情
+    # --------------------------
+    return json_cn(profile.merge(comments))
+
+
+def load_song_profile(song_id):
+    """
+    查询歌曲信息及歌手 (不含评论，查询计划)
+    :return: (歌曲详情, 依赖标签)，歌曲不存在时详情为 None
+    """
     sql_song = """
         SELECT s.song_id, s.song_title, s.duration, a.album_id, a.album_title
         FROM Song s
@@ -624,65 +779,21 @@ def song_profile(request, song_id):
         WHERE s.song_id = %s
     """
 
-    sql_singer = """
-        SELECT sg.singer_id, sg.singer_name
-        FROM Singer sg
-        JOIN Song_Singer ss ON ss.singer_id = sg.singer_id
-        WHERE ss.song_id = %s
-    """
-
-    sql_comment = """
-        SELECT 
-            u.user_id, u.user_name, c.comment_id, c.content, c.like_count, c.comment_time
-        FROM Comment c 
-        JOIN User u ON u.user_id = c.user_id
-        WHERE target_id = %s AND target_type = 'song'
-        ORDER BY comment_time DESC
-    """
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql_song, [song_id])
-        song_row = cursor.fetchone()
-        
-        if not song_row:
-            return json_cn({"error": "歌曲不存在"}, 404)
-        
-        song_id, song_title, duration, album_id, album_title = song_row
-
-        cursor.execute(sql_singer, [song_id])
-        singer_rows = cursor.fetchall()
-        singers = [{"singer_id": row[0], "singer_name": row[1]} for row in singer_rows]
-
-        cursor.execute(sql_comment, [song_id])
-        comment_rows = cursor.fetchall()
+    song_row = yield Query(sql_song, [song_id], fetch="one")
 
+    if not song_row:
+        return None, []
 
-    # --------------------------
-    # 3. 生成歌曲评论列表
-    # --------------------------
-    comments = []
-    for user_id, user_name, comment_id, content, like_count, comment_time in comment_rows:
-        comments.append({
-            "comment_id": comment_id,
-            "user_id": user_id,
-            "user_name": user_name,
-            "content": content,
-            "like_count": like_count,
-            "comment_time": comment_time.strftime("%Y-%m-%d %H:%M") if comment_time else None
-        })
+    song_id, song_title, duration, album_id, album_title = song_row
 
+    singers = (yield from singers_plan([song_id]))[song_id]
 
-    # --------------------------
-    # 4. 返回歌曲详情
-    # --------------------------
-    return json_cn({
+    return {
         "song_id": song_id,
         "song_title": song_title,
         "duration": duration,
         "duration_formatted": format_time(duration),
         "album_id": album_id,
         "album_title": album_title,
-        "singers": singers,
-        "comment_count": len(comments),
-        "comments": comments
-    })
\ No newline at end of file
+        "singers": singers
+    }, [tag("album", album_id)] + [tag("singer", singer["singer_id"]) for singer in singers]
\ No newline at end of file
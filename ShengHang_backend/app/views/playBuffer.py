@@ -0,0 +1,108 @@
+# 播放记录缓冲模块
+# record_play 不再逐条同步写库：
+#   1. 按 (用户, 歌曲) 做 60 秒防刷去重 (见 recentPlays，不查询数据库)
+#   2. 有效播放追加到延迟写队列 (同时落盘)
+#   3. 后台线程定时 / 攒够一批后，多行 INSERT 写入 PlayHistory，并按歌曲合并 play_count 增量
+#      写入分片计数表 (见 playCounter)，定期汇总进 Song.play_count，同时累加按天聚合表 (见 playRollup)
+import datetime
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+from .playCounter import add_play_counts, maybe_rollup
+from .playRollup import add_play_rollups
+from .recentPlays import get_tracker
+from .writeBehind import WriteBehindQueue
+
+
+# 单条 INSERT 语句最多插入的行数
+PLAY_INSERT_BATCH_SIZE = 500
+
+
+# ================================
+# 批量写库
+# ================================
+def flush_plays(items):
+    """
+    把一批播放记录写入数据库
+    play_time 按入队时刻计算：数据库当前时间 NOW() 减去入队至今经过的时间，与原先 INSERT 时使用 NOW() 的时钟一致
+    """
+    now = time.time()
+    deltas = {}
+    for item in items:
+        deltas[item["song_id"]] = deltas.get(item["song_id"], 0) + 1
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT NOW(6)")
+            db_now = cursor.fetchone()[0]
+            rows = [
+                (item["user_id"], item["song_id"], item["play_duration"],
+                 db_now - datetime.timedelta(seconds=max(0.0, now - item["ts"])))
+                for item in items
+            ]
+
+            for start in range(0, len(rows), PLAY_INSERT_BATCH_SIZE):
+                chunk = rows[start:start + PLAY_INSERT_BATCH_SIZE]
+                values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+                params = [value for row in chunk for value in row]
+                cursor.execute(
+                    f"INSERT INTO PlayHistory (user_id, song_id, play_duration, play_time) VALUES {values}",
+                    params,
+                )
+
+            # 播放量增量写入分片计数表，不直接更新 Song 表的热点行
+            add_play_counts(cursor, deltas)
+
+            # 同一事务内累加按天聚合表
+            add_play_rollups(cursor, rows)
+
+
+# ================================
+# 对外接口
+# ================================
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_play_queue():
+    "首次使用时创建队列 (此时才读取配置并恢复落盘文件)"
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue(
+                    "play_history",
+                    flush_plays,
+                    interval=getattr(settings, "PLAY_FLUSH_INTERVAL", 2.0),
+                    max_size=getattr(settings, "PLAY_FLUSH_SIZE", 500),
+                    spill_dir=getattr(settings, "PLAY_SPILL_DIR", os.path.join(settings.BASE_DIR, "spill")),
+                    tick_func=maybe_rollup,
+                    max_pending=getattr(settings, "PLAY_MAX_PENDING", 20000),
+                    block_timeout=getattr(settings, "PLAY_BLOCK_TIMEOUT", 0.5),
+                )
+    return _queue
+
+
+def record(user_id, song_id, play_duration):
+    """
+    记录一次播放
+    :return: True 表示已计入，False 表示在防刷窗口内被忽略
+    """
+    tracker = get_tracker()
+    if not tracker.check_and_mark(user_id, song_id):
+        return False
+    try:
+        get_play_queue().put({
+            "user_id": int(user_id),
+            "song_id": int(song_id),
+            "play_duration": int(play_duration or 0),
+            "ts": time.time(),
+        })
+    except Exception:
+        # 没能入队就不占用防刷窗口，客户端重试时可以正常记录
+        tracker.forget(user_id, song_id)
+        raise
+    return True
@@ -0,0 +1,116 @@
+# 播放量分片计数模块
+# 热门歌曲的每次播放都执行 UPDATE Song SET play_count = play_count + 1，并发播放会在同一行上排队等锁。
+# 这里把增量写到 Song_Play_Counter 表：每首歌 PLAY_COUNTER_SLOTS 个分片，每次随机选一个分片累加，
+# 再定期把各分片汇总进 Song.play_count (汇总后删除分片行)
+#
+# 读取播放量 (get_total_play_stats、search_song 按播放量排序等) 仍然只读 Song.play_count，
+# 与实时播放最多相差一个汇总周期 (PLAY_COUNTER_ROLLUP_INTERVAL)
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+
+# 每次汇总最多处理的分片行数，数据多时分几轮事务完成，避免长时间锁表
+ROLLUP_BATCH_SIZE = 5000
+
+
+def get_slot_count():
+    return max(1, int(getattr(settings, "PLAY_COUNTER_SLOTS", 16)))
+
+
+# ================================
+# 写入增量
+# ================================
+def add_play_counts(cursor, deltas):
+    """
+    把播放次数增量写入分片计数表
+    :param deltas: {song_id: 增加的次数}
+    """
+    if not deltas:
+        return
+    slots = get_slot_count()
+    # 按 song_id 顺序写入，多个进程同时写入时加锁顺序一致，避免死锁
+    rows = [(song_id, random.randrange(slots), deltas[song_id]) for song_id in sorted(deltas)]
+    values = ", ".join(["(%s, %s, %s)"] * len(rows))
+    params = [value for row in rows for value in row]
+    cursor.execute(
+        f"""
+        INSERT INTO Song_Play_Counter (song_id, slot, play_count)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE play_count = play_count + VALUES(play_count)
+        """,
+        params,
+    )
+
+
+# ================================
+# 汇总进 Song.play_count
+# ================================
+def rollup_play_counts():
+    """
+    把分片计数汇总进 Song.play_count，并删除已汇总的分片行
+    :return: 本次汇总的播放次数
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # 锁住本轮要汇总的分片行，期间新的增量会等待本事务结束后再累加到新行上
+                cursor.execute(
+                    """
+                    SELECT id, song_id, play_count
+                    FROM Song_Play_Counter
+                    ORDER BY song_id, slot
+                    LIMIT %s
+                    FOR UPDATE
+                    """,
+                    [ROLLUP_BATCH_SIZE],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    return total
+
+                deltas = {}
+                for _, song_id, count in rows:
+                    deltas[song_id] = deltas.get(song_id, 0) + count
+
+                for song_id in sorted(deltas):
+                    if deltas[song_id]:
+                        cursor.execute(
+                            "UPDATE Song SET play_count = play_count + %s WHERE song_id = %s",
+                            [deltas[song_id], song_id],
+                        )
+
+                ids = [row[0] for row in rows]
+                cursor.execute(
+                    f"DELETE FROM Song_Play_Counter WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                    ids,
+                )
+                total += sum(deltas.values())
+
+        if len(rows) < ROLLUP_BATCH_SIZE:
+            return total
+
+
+_last_rollup = 0
+_rollup_lock = threading.Lock()
+
+
+def maybe_rollup():
+    "距离上次汇总超过 PLAY_COUNTER_ROLLUP_INTERVAL 秒时汇总一次，由播放记录队列的后台线程每轮调用"
+    global _last_rollup
+    interval = getattr(settings, "PLAY_COUNTER_ROLLUP_INTERVAL", 30)
+    if time.time() - _last_rollup < interval:
+        return
+    if not _rollup_lock.acquire(blocking=False):
+        return
+    try:
+        _last_rollup = time.time()
+        rollup_play_counts()
+    except Exception as e:
+        # 汇总失败不影响播放记录，分片数据保留到下一轮
+        print(f"[PlayCounter] 汇总播放量失败: {e}")
+    finally:
+        _rollup_lock.release()
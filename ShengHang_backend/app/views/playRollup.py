@@ -0,0 +1,107 @@
+# 播放记录按天预聚合
+# 播放报告、个人排行榜、听歌趋势原先每次都对 PlayHistory 原始记录 GROUP BY，
+# 且 GROUP BY DATE_FORMAT(play_time, ...) 用不上索引。这里维护两张按天聚合的表：
+#   User_Song_Play_Daily (用户, 歌曲, 日期) -> 次数、时长
+#   User_Play_Daily      (用户, 日期)       -> 次数、时长
+# 播放记录批量写库时在同一事务里增量累加 (见 playBuffer.flush_plays)，
+# 数据不一致时可用 manage.py rebuild_play_rollups 从 PlayHistory 重建
+from django.db import connection, transaction
+
+
+# 单条 INSERT 语句最多写入的行数
+ROLLUP_INSERT_BATCH_SIZE = 500
+
+
+# ================================
+# 增量累加
+# ================================
+def add_play_rollups(cursor, plays):
+    """
+    把一批播放记录累加进按天聚合表
+    :param plays: [(user_id, song_id, play_duration, play_time), ...]
+    """
+    song_daily = {}
+    user_daily = {}
+    for user_id, song_id, play_duration, play_time in plays:
+        play_date = play_time.date()
+        for bucket, key in ((song_daily, (user_id, song_id, play_date)), (user_daily, (user_id, play_date))):
+            count, duration = bucket.get(key, (0, 0))
+            bucket[key] = (count + 1, duration + play_duration)
+
+    # 按主键顺序写入，多个进程同时写入时加锁顺序一致
+    _upsert(
+        cursor,
+        "User_Song_Play_Daily (user_id, song_id, play_date, play_count, total_duration)",
+        [key + song_daily[key] for key in sorted(song_daily)],
+    )
+    _upsert(
+        cursor,
+        "User_Play_Daily (user_id, play_date, play_count, total_duration)",
+        [key + user_daily[key] for key in sorted(user_daily)],
+    )
+
+
+def _upsert(cursor, table_and_columns, rows):
+    for start in range(0, len(rows), ROLLUP_INSERT_BATCH_SIZE):
+        chunk = rows[start:start + ROLLUP_INSERT_BATCH_SIZE]
+        placeholders = "(" + ", ".join(["%s"] * len(chunk[0])) + ")"
+        cursor.execute(
+            f"""
+            INSERT INTO {table_and_columns}
+            VALUES {", ".join([placeholders] * len(chunk))}
+            ON DUPLICATE KEY UPDATE play_count = play_count + VALUES(play_count),
+                                    total_duration = total_duration + VALUES(total_duration)
+            """,
+            [value for row in chunk for value in row],
+        )
+
+
+# ================================
+# 删除 / 重建
+# ================================
+def delete_user_rollups(cursor, user_id):
+    "注销账号时删除该用户的聚合数据"
+    cursor.execute("DELETE FROM User_Song_Play_Daily WHERE user_id = %s", [user_id])
+    cursor.execute("DELETE FROM User_Play_Daily WHERE user_id = %s", [user_id])
+
+
+def rebuild_play_rollups(user_id=None):
+    """
+    从 PlayHistory 重新生成按天聚合表，user_id 为 None 时重建全部用户
+    在一个事务内先删后插；执行期间新写入的播放记录会等待本事务结束
+    :return: (User_Song_Play_Daily 行数, User_Play_Daily 行数)
+    """
+    where = "" if user_id is None else "WHERE user_id = %s"
+    params = [] if user_id is None else [user_id]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM User_Song_Play_Daily {where}", params)
+            cursor.execute(f"DELETE FROM User_Play_Daily {where}", params)
+
+            cursor.execute(
+                f"""
+                INSERT INTO User_Song_Play_Daily (user_id, song_id, play_date, play_count, total_duration)
+                SELECT user_id, song_id, DATE(play_time), COUNT(*), COALESCE(SUM(play_duration), 0)
+                FROM PlayHistory
+                {where}
+                GROUP BY user_id, song_id, DATE(play_time)
+                """,
+                params,
+            )
+            song_rows = cursor.rowcount
+
+            # 用户每日汇总直接由 (用户, 歌曲, 日期) 聚合表再汇总一次，不用再扫 PlayHistory
+            cursor.execute(
+                f"""
+                INSERT INTO User_Play_Daily (user_id, play_date, play_count, total_duration)
+                SELECT user_id, play_date, SUM(play_count), SUM(total_duration)
+                FROM User_Song_Play_Daily
+                {where}
+                GROUP BY user_id, play_date
+                """,
+                params,
+            )
+            user_rows = cursor.rowcount
+
+    return song_rows, user_rows
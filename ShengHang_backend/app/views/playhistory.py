@@ -4,19 +4,25 @@ import datetime
 from django.db import connection
 from django.views.decorators.csrf import csrf_exempt
 from .tools import *
+from . import playBuffer
+from .jsonStream import Counter, json_stream, stream_rows
+from .rowAdapter import FORMATS
 
 
 # ==========================
 # 1. 记录播放
 # ==========================
 # 设置防刷规则：同一首歌在 60秒 内重复提交只记录一次，不增加播放计数
-# 自动更新 Song 表的 play_count
+# 播放记录先进入内存缓冲队列 (见 playBuffer)，由后台批量写入 PlayHistory，
+# 播放量增量写入分片计数表后定期汇总进 Song 表的 play_count (见 playCounter)
 @csrf_exempt
 def record_play(request):
     if request.method != "POST":
         return json_cn({"error": "POST required"}, 400)
 
     current_user_id = get_user_id(request)
+    if isinstance(current_user_id, HttpResponse):
+        return current_user_id
     data = json.loads(request.body)
 
     song_id = data.get("song_id")
@@ -26,56 +32,30 @@ def record_play(request):
     if not song_id:
         return json_cn({"error": "未检测到歌曲ID"}, 400)
 
+    try:
+        song_id = int(song_id)
+        play_duration = int(play_duration or 0)
+    except (TypeError, ValueError):
+        return json_cn({"error": "参数格式错误"}, 400)
+
+    # 播放记录延迟写库，不存在的歌曲要在这里拒绝 (主键查询)，不能等到后台写库时才因外键失败
     with connection.cursor() as cursor:
-        # 规则检查：防止重复记录 (Anti-Spam)
-        # 检查该用户最近一次播放这首歌的时间
-        sql_check_recent = """
-                           SELECT play_time
-                           FROM PlayHistory
-                           WHERE user_id = %s \
-                             AND song_id = %s
-                           ORDER BY play_time DESC
-                           LIMIT 1 \
-                           """
-        cursor.execute(sql_check_recent, [current_user_id, song_id])
-        last_record = cursor.fetchone()
-
-        should_record = True
-
-        if last_record:
-            last_time = last_record[0]
-            # 获取当前时间 (注意时区问题，这里假设数据库和应用时区一致)
-            # 如果最近一次播放是在 60秒 内，则认为是重复提交或者是切歌太快，不计入有效播放
-            # 也可以根据 play_duration 判断，例如播放超过30秒才算
-            now = datetime.datetime.now()
-            if (now - last_time).total_seconds() < 60:
-                should_record = False
-
-        if should_record:
-            # 1. 插入播放记录
-            sql_insert = """
-                         INSERT INTO PlayHistory (user_id, song_id, play_duration, play_time)
-                         VALUES (%s, %s, %s, NOW()) \
-                         """
-            cursor.execute(sql_insert, [current_user_id, song_id, play_duration])
-
-            # 2. 更新歌曲总播放次数 (原子更新)
-            sql_update_song = """
-                              UPDATE Song \
-                              SET play_count = play_count + 1 \
-                              WHERE song_id = %s \
-                              """
-            cursor.execute(sql_update_song, [song_id])
-
-            return json_cn({"message": "播放记录已更新"})
-        else:
-            return json_cn({"message": "播放记录过频，忽略本次计数"})
+        cursor.execute("SELECT 1 FROM Song WHERE song_id = %s", [song_id])
+        if cursor.fetchone() is None:
+            return json_cn({"error": "歌曲不存在"}, 404)
+
+    # 规则检查：防止重复记录 (Anti-Spam)，在内存中判断，不再查询 PlayHistory
+    if playBuffer.record(current_user_id, song_id, play_duration):
+        return json_cn({"message": "播放记录已更新"})
+    else:
+        return json_cn({"message": "播放记录过频，忽略本次计数"})
 
 
 # ==========================
 # 2. 统计总播放次数 
 # ==========================
 # 歌曲、专辑、歌手
+# 读取汇总后的 Song.play_count，尚未汇总的分片计数不计入
 @csrf_exempt
 def get_total_play_stats(request):
     if request.method != "GET":
@@ -135,20 +115,33 @@ def get_total_play_stats(request):
 # 3. 用户查看播放记录 
 # ==========================
 # 支持整体、筛选、查单曲
+# 结果流式返回 (见 jsonStream)，limit 再大也不会把全部记录读进内存
 @csrf_exempt
 def get_my_play_history(request):
     if request.method != "POST":
         return json_cn({"error": "POST required"}, 400)
 
     current_user_id = get_user_id(request)
+    if isinstance(current_user_id, HttpResponse):
+        return current_user_id
     data = json.loads(request.body)
 
     # 筛选参数
     start_date = data.get("start_date")  # 格式 'YYYY-MM-DD'
     end_date = data.get("end_date")
     song_id = data.get("song_id")  # 如果传了这个，就是查看单曲的播放记录
-    limit = data.get("limit", 50)  # 默认只看最近50条
+    try:
+        limit = int(data.get("limit", 50))  # 默认只看最近50条
+    except (TypeError, ValueError):
+        return json_cn({"error": "limit 必须为整数"}, 400)
+
+    sql, params = play_history_query(current_user_id, start_date, end_date, song_id, limit)
+    history = Counter(stream_rows(sql, params))
+    return json_stream({"history": history, "count": lambda: history.count})
 
+
+def play_history_query(user_id, start_date=None, end_date=None, song_id=None, limit=50):
+    "播放记录查询，返回 (sql, params)"
     sql = """
           SELECT ph.play_id, \
                  ph.play_time, \
@@ -163,7 +156,7 @@ def get_my_play_history(request):
                    LEFT JOIN Album a ON s.album_id = a.album_id
           WHERE ph.user_id = %s \
           """
-    params = [current_user_id]
+    params = [user_id]
 
     if start_date:
         sql += " AND ph.play_time >= %s"
@@ -180,18 +173,14 @@ def get_my_play_history(request):
 
     sql += " ORDER BY ph.play_time DESC LIMIT %s"
     params.append(limit)
-
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params)
-        history = dictfetchall(cursor)
-
-    return json_cn({"history": history, "count": len(history)})
+    return sql, params
 
 
 # ==========================
 # 4. 生成用户播放报告 
 # ==========================
 # 统计该时间段(周/月/自定义)内：总播放次数、总听歌时长、听得最多的歌
+# 读取按天聚合表 (见 playRollup)，不扫描 PlayHistory
 @csrf_exempt
 def get_play_report(request):
     if request.method != "POST":
@@ -203,50 +192,18 @@ def get_play_report(request):
     # time_range: 'week', 'month', 'all'
     time_range = data.get("time_range", "week")
 
-    # 构建时间条件
-    sql_where = "WHERE user_id = %s"
-    params = [current_user_id]
-
-    if time_range == 'week':
-        # 最近7天
-        sql_where += " AND play_time >= DATE_SUB(NOW(), INTERVAL 7 DAY)"
-    elif time_range == 'month':
-        # 最近30天
-        sql_where += " AND play_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)"
-    elif time_range == 'self-defined':
-        if "start_date" in data:
-            sql_where += " AND play_time >= %s"
-            params.append(data.get("start_date"))
-        if "end_date" in data:
-            sql_where += " AND play_time <= %s"
-            params.append(data.get("end_date"))
+    sql_where, params = report_filter(current_user_id, time_range, data)
 
     with connection.cursor() as cursor:
-        # 1. 统计总次数和总时长
-        sql_summary = f"""
-            SELECT COUNT(*) as total_count, SUM(play_duration) as total_seconds
-            FROM PlayHistory
-            {sql_where}
-        """
-        cursor.execute(sql_summary, params)
+        # 1. 统计总次数和总时长 (每天一行，时间段内最多几百行)
+        cursor.execute(REPORT_SUMMARY_SQL.format(where=sql_where), params)
         summary = dictfetchall(cursor)[0]
 
         # 处理 None 的情况
         if not summary['total_seconds']: summary['total_seconds'] = 0
 
         # 2. 统计该时间段内听得最多的歌 (Top 1)
-        sql_top_song = f"""
-            SELECT s.song_title, COUNT(ph.song_id) as play_times
-            FROM PlayHistory ph
-            JOIN Song s ON ph.song_id = s.song_id
-            {sql_where.replace('WHERE', 'WHERE ph.')} 
-            GROUP BY ph.song_id, s.song_title
-            ORDER BY play_times DESC
-            LIMIT 1
-        """
-        # 注意：这里 user_id 参数需要再传一遍，或者稍微调整 SQL 拼接逻辑
-        # 为简单起见，这里复用 params
-        cursor.execute(sql_top_song, params)
+        cursor.execute(REPORT_TOP_SONG_SQL.format(where=sql_where), params)
         top_song_row = dictfetchall(cursor)
         top_song = top_song_row[0] if top_song_row else None
 
@@ -260,6 +217,48 @@ def get_play_report(request):
     })
 
 
+# 播放报告的两条查询，{where} 为 report_filter 构建的时间条件
+REPORT_SUMMARY_SQL = """
+    SELECT CAST(COALESCE(SUM(play_count), 0) AS SIGNED) as total_count, CAST(SUM(total_duration) AS SIGNED) as total_seconds
+    FROM User_Play_Daily
+    {where}
+"""
+
+REPORT_TOP_SONG_SQL = """
+    SELECT s.song_title, t.play_times
+    FROM (
+        SELECT song_id, CAST(SUM(play_count) AS SIGNED) as play_times
+        FROM User_Song_Play_Daily
+        {where}
+        GROUP BY song_id
+        ORDER BY play_times DESC
+        LIMIT 1
+    ) t
+    JOIN Song s ON t.song_id = s.song_id
+"""
+
+
+def report_filter(user_id, time_range, data):
+    "播放报告的时间条件 (按天聚合表，以日期为粒度)，返回 (WHERE 子句, params)"
+    sql_where = "WHERE user_id = %s"
+    params = [user_id]
+
+    if time_range == 'week':
+        # 最近7天 (含今天)
+        sql_where += " AND play_date >= DATE_SUB(CURDATE(), INTERVAL 6 DAY)"
+    elif time_range == 'month':
+        # 最近30天 (含今天)
+        sql_where += " AND play_date >= DATE_SUB(CURDATE(), INTERVAL 29 DAY)"
+    elif time_range == 'self-defined':
+        if "start_date" in data:
+            sql_where += " AND play_date >= DATE(%s)"
+            params.append(data.get("start_date"))
+        if "end_date" in data:
+            sql_where += " AND play_date <= DATE(%s)"
+            params.append(data.get("end_date"))
+    return sql_where, params
+
+
 # ==========================
 # 5. 用户最常听排行榜 
 # ==========================
@@ -276,52 +275,18 @@ def get_user_top_charts(request):
     # type: 'song', 'singer', 'album'
     chart_type = data.get("type", "song")
     limit = data.get("limit", 10)
+    # 返回格式: 'rows' 每项一个对象 (默认)，'columns' 按列 {列名: [...]} 便于画图，'table' 列名 + 二维数组
+    result_format = data.get("format", "rows")
+    if result_format not in FORMATS:
+        return json_cn({"error": "无效的返回格式"}, 400)
 
-    with connection.cursor() as cursor:
-        if chart_type == 'song':
-            sql = """
-                  SELECT s.song_id, s.song_title, s.file_url, COUNT(*) as my_play_count
-                  FROM PlayHistory ph
-                           JOIN Song s ON ph.song_id = s.song_id
-                  WHERE ph.user_id = %s
-                  GROUP BY s.song_id, s.song_title, s.file_url
-                  ORDER BY my_play_count DESC
-                  LIMIT %s \
-                  """
-            cursor.execute(sql, [current_user_id, limit])
-
-        elif chart_type == 'album':
-            sql = """
-                  SELECT a.album_id, a.album_title, a.cover_url, COUNT(*) as my_play_count
-                  FROM PlayHistory ph
-                           JOIN Song s ON ph.song_id = s.song_id
-                           JOIN Album a ON s.album_id = a.album_id
-                  WHERE ph.user_id = %s
-                  GROUP BY a.album_id, a.album_title, a.cover_url
-                  ORDER BY my_play_count DESC
-                  LIMIT %s \
-                  """
-            cursor.execute(sql, [current_user_id, limit])
-
-        elif chart_type == 'singer':
-            # 这里需要关联 Song -> SongSinger -> Singer
-            sql = """
-                  SELECT singer.singer_id, singer.singer_name, COUNT(*) as my_play_count
-                  FROM PlayHistory ph
-                           JOIN Song s ON ph.song_id = s.song_id
-                           JOIN Song_Singer ss ON s.song_id = ss.song_id
-                           JOIN Singer singer ON ss.singer_id = singer.singer_id
-                  WHERE ph.user_id = %s
-                  GROUP BY singer.singer_id, singer.singer_name
-                  ORDER BY my_play_count DESC
-                  LIMIT %s \
-                  """
-            cursor.execute(sql, [current_user_id, limit])
-
-        else:
-            return json_cn({"error": "无效的榜单类型"}, 400)
+    sql = TOP_CHART_SQL.get(chart_type)
+    if sql is None:
+        return json_cn({"error": "无效的榜单类型"}, 400)
 
-        result = dictfetchall(cursor)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [current_user_id, limit])
+        result = FORMATS[result_format](cursor)
 
     return json_cn({
         "chart_type": chart_type,
@@ -329,6 +294,45 @@ def get_user_top_charts(request):
     })
 
 
+# 先在按天聚合表上汇总出该用户每首歌的播放次数，再关联歌曲 / 专辑 / 歌手
+MY_SONG_PLAYS_SQL = """
+    SELECT song_id, CAST(SUM(play_count) AS SIGNED) as my_play_count
+    FROM User_Song_Play_Daily
+    WHERE user_id = %s
+    GROUP BY song_id
+"""
+
+# 榜单类型 -> SQL，参数: user_id, limit
+TOP_CHART_SQL = {
+    "song": f"""
+        SELECT s.song_id, s.song_title, s.file_url, t.my_play_count
+        FROM ({MY_SONG_PLAYS_SQL}) t
+                 JOIN Song s ON t.song_id = s.song_id
+        ORDER BY t.my_play_count DESC
+        LIMIT %s
+    """,
+    "album": f"""
+        SELECT a.album_id, a.album_title, a.cover_url, CAST(SUM(t.my_play_count) AS SIGNED) as my_play_count
+        FROM ({MY_SONG_PLAYS_SQL}) t
+                 JOIN Song s ON t.song_id = s.song_id
+                 JOIN Album a ON s.album_id = a.album_id
+        GROUP BY a.album_id, a.album_title, a.cover_url
+        ORDER BY my_play_count DESC
+        LIMIT %s
+    """,
+    # 这里需要关联 Song -> SongSinger -> Singer
+    "singer": f"""
+        SELECT singer.singer_id, singer.singer_name, CAST(SUM(t.my_play_count) AS SIGNED) as my_play_count
+        FROM ({MY_SONG_PLAYS_SQL}) t
+                 JOIN Song_Singer ss ON t.song_id = ss.song_id
+                 JOIN Singer singer ON ss.singer_id = singer.singer_id
+        GROUP BY singer.singer_id, singer.singer_name
+        ORDER BY my_play_count DESC
+        LIMIT %s
+    """,
+}
+
+
 # ==========================
 # 6. 用户时间段内播放情况统计 (趋势图数据) 
 # ==========================
@@ -343,36 +347,43 @@ def get_user_activity_trend(request):
 
     # period: 'day' (最近14天, 按天统计), 'month' (最近12个月, 按月统计)
     period = data.get("period", "day")
+    # 返回格式，同播放排行榜
+    result_format = data.get("format", "rows")
+    if result_format not in FORMATS:
+        return json_cn({"error": "无效的返回格式"}, 400)
 
-    with connection.cursor() as cursor:
-        if period == 'day':
-            # 按日期分组统计
-            sql = """
-                  SELECT DATE_FORMAT(play_time, '%%Y-%%m-%%d') as date_str, COUNT(*) as play_count
-                  FROM PlayHistory
-                  WHERE user_id = %s \
-                    AND play_time >= DATE_SUB(NOW(), INTERVAL 14 DAY)
-                  GROUP BY date_str
-                  ORDER BY date_str ASC \
-                  """
-        elif period == 'month':
-            # 按月份分组统计
-            sql = """
-                  SELECT DATE_FORMAT(play_time, '%%Y-%%m') as date_str, COUNT(*) as play_count
-                  FROM PlayHistory
-                  WHERE user_id = %s \
-                    AND play_time >= DATE_SUB(NOW(), INTERVAL 12 MONTH)
-                  GROUP BY date_str
-                  ORDER BY date_str ASC \
-                  """
-        else:
-            return json_cn({"error": "Invalid period"}, 400)
+    sql = ACTIVITY_TREND_SQL.get(period)
+    if sql is None:
+        return json_cn({"error": "Invalid period"}, 400)
 
-        # 注意：Python 中 % 是占位符，所以在 SQL 里的 %Y 需要写成 %%Y 进行转义
+    with connection.cursor() as cursor:
         cursor.execute(sql, [current_user_id])
-        trend_data = dictfetchall(cursor)
+        trend_data = FORMATS[result_format](cursor)
 
     return json_cn({
         "period": period,
         "trend": trend_data
-    })
\ No newline at end of file
+    })
+
+
+# 统计周期 -> SQL
+# 注意：Python 中 % 是占位符，所以在 SQL 里的 %Y 需要写成 %%Y 进行转义
+ACTIVITY_TREND_SQL = {
+    # 按天聚合表每天一行，直接读取
+    "day": """
+        SELECT DATE_FORMAT(play_date, '%%Y-%%m-%%d') as date_str, play_count
+        FROM User_Play_Daily
+        WHERE user_id = %s
+          AND play_date >= DATE_SUB(CURDATE(), INTERVAL 14 DAY)
+        ORDER BY play_date ASC
+    """,
+    # 按月份分组统计 (每个用户最多 366 行)
+    "month": """
+        SELECT DATE_FORMAT(play_date, '%%Y-%%m') as date_str, CAST(SUM(play_count) AS SIGNED) as play_count
+        FROM User_Play_Daily
+        WHERE user_id = %s
+          AND play_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
+        GROUP BY date_str
+        ORDER BY date_str ASC
+    """,
+}
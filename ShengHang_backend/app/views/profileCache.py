@@ -0,0 +1,131 @@
+# 歌手 / 专辑 / 歌曲详情缓存
+# 详情页里的曲库数据 (歌手信息、专辑信息、歌曲列表、歌手名等) 只会通过 manager.py 的管理员接口修改，
+# 这里按 (类型, id) 在进程内缓存查询结果，读穿透 (read-through)：
+#   - 依赖标签：每个缓存项声明页面上出现的全部对象 (如歌手详情依赖 singer:5 以及它的每首歌 song:x、每张专辑 album:y)，
+#     管理员修改曲库后经失效总线 (invalidationBus.py) 发布受影响的标签，带有这些标签的缓存项被删除；
+#     查询期间收到了相关标签的失效消息时，查询结果不写入缓存
+#   - TTL：缓存项 PROFILE_CACHE_TTL 秒后过期，兜底漏掉的失效消息
+#   - 防击穿：同一个键同时只有一个请求查库，其余请求等待它的结果；
+#     过期的缓存项在刷新期间继续返回给其他请求，不会让所有请求一起卡在查库上
+# 评论等会被普通用户修改的数据不放进缓存，仍由视图每次查询
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+from .asyncDb import Wait, run_sync
+from .invalidationBus import ALL, invalidation_bus, tag
+from .localRedis import LocalRedis
+
+
+# 记录最近多少次失效，用于判断查询期间是否发生过相关失效
+INVALIDATION_LOG_SIZE = 1000
+
+
+class ProfileCache:
+    def __init__(self, max_entries=5000):
+        self._store = LocalRedis(max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._tag_keys = {}     # 标签 -> {(类型, id), ...}
+        self._key_tags = {}     # (类型, id) -> 该缓存项的标签
+        self._loading = {}      # (类型, id) -> threading.Event，正在查库的键
+        self._seq = 0           # 失效序号，每次 invalidate 加一
+        self._invalidations = deque(maxlen=INVALIDATION_LOG_SIZE)   # (序号, 标签集合)
+
+    @property
+    def ttl(self):
+        return getattr(settings, "PROFILE_CACHE_TTL", 300)
+
+    def get(self, kind, obj_id, loader):
+        """
+        读取缓存，未命中时执行 loader(obj_id) 查询并写入缓存
+        loader(obj_id) 是查询计划 (见 asyncDb)，结果为 (value, tags)：value 为 None 表示对象不存在 (同样会被缓存)，
+        tags 为页面依赖的其他对象的标签，自身的标签 <kind>:<id> 自动加上
+        返回值被多个请求共用，调用方不能修改
+        """
+        return run_sync(self.get_plan(kind, obj_id, loader))
+
+    def get_plan(self, kind, obj_id, loader):
+        "get 的查询计划形式，命中缓存时不查库；等待其他请求查库时 yield Wait，异步视图中不阻塞事件循环"
+        key = (kind, int(obj_id))
+        while True:
+            with self._lock:
+                entry = self._store.get(key)
+                if entry is not None and time.time() < entry["expires_at"]:
+                    return entry["value"]
+
+                event = self._loading.get(key)
+                if event is None:
+                    # 由当前请求负责查库
+                    event = self._loading[key] = threading.Event()
+                    start_seq = self._seq
+                    break
+                if entry is not None:
+                    # 已过期但未失效，别的请求正在刷新：先返回旧值
+                    return entry["value"]
+
+            # 等待正在查库的请求，超时后自己查
+            if not (yield Wait(event, getattr(settings, "PROFILE_CACHE_LOAD_TIMEOUT", 10))):
+                value, _ = yield from loader(obj_id)
+                return value
+
+        try:
+            value, tags = yield from loader(obj_id)
+            tags = set(tags) | {tag(kind, obj_id)}
+            with self._lock:
+                if not self._invalidated_since(start_seq, tags):
+                    self._put(key, value, tags)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def _invalidated_since(self, seq, tags):
+        "序号 seq 之后是否有涉及 tags 的失效 (调用方持有锁)"
+        if seq == self._seq:
+            return False
+        if not self._invalidations or self._invalidations[0][0] > seq + 1:
+            # 记录已被挤掉，无法判断，按失效处理
+            return True
+        return any(s > seq and (ALL in t or t & tags) for s, t in self._invalidations)
+
+    def _put(self, key, value, tags):
+        "写入缓存并维护标签索引 (调用方持有锁)"
+        for old in self._key_tags.get(key, ()):
+            keys = self._tag_keys.get(old)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[old]
+        self._key_tags[key] = tags
+        for t in tags:
+            self._tag_keys.setdefault(t, set()).add(key)
+        # 过期后再保留一个 TTL，供刷新期间返回旧值
+        self._store.set(key, {"value": value, "expires_at": time.time() + self.ttl}, ex=self.ttl * 2)
+
+    def invalidate(self, tags):
+        """删除带有任一标签的缓存项，tags 包含 ALL ("*") 时清空全部；由失效总线调用"""
+        tags = set(tags)
+        with self._lock:
+            self._seq += 1
+            self._invalidations.append((self._seq, tags))
+            if ALL in tags:
+                self._store.flushall()
+                self._tag_keys.clear()
+                self._key_tags.clear()
+                return
+            for t in tags:
+                for key in self._tag_keys.pop(t, ()):
+                    self._store.delete(key)
+                    for other in self._key_tags.pop(key, ()):
+                        keys = self._tag_keys.get(other)
+                        if keys is not None:
+                            keys.discard(key)
+
+    def clear(self):
+        self.invalidate({ALL})
+
+
+profile_cache = ProfileCache(max_entries=getattr(settings, "PROFILE_CACHE_MAX_ENTRIES", 5000))
+invalidation_bus.subscribe(profile_cache.invalidate)
@@ -0,0 +1,114 @@
+# 最近播放记录 (防刷窗口)
+# record_play 判断 "同一用户同一首歌 60 秒内是否播放过" 时不再查询 PlayHistory，
+# 而是在 Redis 风格的键值存储里用 SET NX EX 原子地占位：
+#   键 play:recent:<user_id>:<song_id> 在窗口内存在即视为重复提交
+#
+# 存储后端可替换：
+#   - 配置了 RECENT_PLAY_REDIS_URL 且安装了 redis 包时使用 Redis，多个进程共享同一个窗口
+#   - 否则使用进程内的 LocalRedis (有容量上限的 LRU + TTL)；它只能挡住本进程内的重复提交，
+#     所以本进程窗口内没播放过时再查一次 PlayHistory (play_user_song_time_idx)，其他进程和重启前的播放也算在内。
+#     其他进程还在缓冲、尚未写库的播放 (最多 PLAY_FLUSH_INTERVAL 秒) 查不到，需要严格去重时配置 Redis
+import threading
+from django.conf import settings
+from django.db import connection
+
+from .localRedis import LocalRedis
+
+
+# 同一用户同一首歌在该时间 (秒) 内重复提交只记录一次
+PLAY_DEDUP_WINDOW = 60
+
+KEY_PREFIX = "play:recent"
+
+
+def played_recently(user_id, song_id, window):
+    "PlayHistory 中该用户 window 秒内是否播放过这首歌"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1
+            FROM PlayHistory
+            WHERE user_id = %s AND song_id = %s AND play_time > DATE_SUB(NOW(), INTERVAL %s SECOND)
+            LIMIT 1
+            """,
+            [user_id, song_id, window],
+        )
+        return cursor.fetchone() is not None
+
+
+class RecentPlayTracker:
+    def __init__(self, client, window=PLAY_DEDUP_WINDOW, check_history=False):
+        """
+        :param client: 支持 set(name, value, ex=, nx=) 的客户端，redis.Redis 或 LocalRedis
+        :param check_history: client 只在本进程内有效时为 True，本进程内没有标记时再查 PlayHistory
+        """
+        self.client = client
+        self.window = window
+        self.check_history = check_history
+
+    @staticmethod
+    def key(user_id, song_id):
+        return f"{KEY_PREFIX}:{int(user_id)}:{int(song_id)}"
+
+    def check_and_mark(self, user_id, song_id):
+        "窗口内没有播放过则记下本次并返回 True，否则返回 False"
+        try:
+            if not self.client.set(self.key(user_id, song_id), 1, ex=self.window, nx=True):
+                return False
+        except Exception as e:
+            # 存储不可用时不影响播放，放行本次记录
+            print(f"[RecentPlays] 防刷检查失败，放行本次播放: {e}")
+            return True
+
+        if self.check_history:
+            try:
+                recent = played_recently(user_id, song_id, self.window)
+            except Exception as e:
+                print(f"[RecentPlays] 查询播放记录失败，放行本次播放: {e}")
+                return True
+            if recent:
+                # 撤销刚才的标记：那次播放早于现在，标记会把窗口延长；下次重复提交再查一次即可
+                self.forget(user_id, song_id)
+                return False
+        return True
+
+    def forget(self, user_id, song_id):
+        "撤销一次标记，例如播放记录最终没能入队时"
+        try:
+            self.client.delete(self.key(user_id, song_id))
+        except Exception as e:
+            print(f"[RecentPlays] 撤销防刷标记失败: {e}")
+
+
+def create_tracker():
+    url = getattr(settings, "RECENT_PLAY_REDIS_URL", None)
+    if url:
+        try:
+            import redis
+        except ImportError:
+            print("[RecentPlays] 未安装 redis 包，改用进程内存储 + 查询播放记录")
+        else:
+            return RecentPlayTracker(redis.Redis.from_url(url))
+    return RecentPlayTracker(LocalRedis(max_entries=getattr(settings, "RECENT_PLAY_MAX_ENTRIES", 100000)),
+                             check_history=True)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    "首次使用时按配置创建"
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = create_tracker()
+    return _tracker
+
+
+def set_tracker(tracker):
+    "替换存储后端，如测试时换成全新的 LocalRedis"
+    global _tracker
+    with _tracker_lock:
+        _tracker = tracker
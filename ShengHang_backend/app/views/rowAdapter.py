@@ -0,0 +1,61 @@
+# 查询结果的行适配器
+# dictfetchall 每行都 zip 出一个新的 dict，再交给 JSON 编码器逐个读出来，结果较大时大部分内存和时间花在这些 dict 上。
+# 这里提供三种更紧凑的形式：
+#   - fetch_rows：每行是一个带 __slots__ 的 dataclass 实例 (同一组列名共用一个类)，按属性读取 row.song_id；
+#     实例没有 __dict__，内存约为 dict 的 40%，创建也更快，适合在 Python 里逐行加工或长时间保存的结果
+#   - fetch_columns：按列返回 {列名: [值, ...]}，图表的横轴 / 纵轴直接可用，整个结果只有每列一个 list
+#   - fetch_table：{"columns": [...], "rows": [[...], ...]}，数据库驱动返回的元组原样交给编码器，每行不再分配对象
+# 直接返回给前端时优先用 columns / table：orjson (3.8) 编码 __slots__ 对象比编码 dict 慢好几倍，
+# 所以按对象返回的接口仍用 dictfetchall；需要修改行内容的地方 (如排序后再补字段) 也用 dictfetchall
+# 各种形式与 dictfetchall 的对比见 manage.py bench_rows
+import functools
+import keyword
+from dataclasses import make_dataclass
+
+from .tools import dictfetchall
+
+
+def columns_of(cursor):
+    return tuple(col[0] for col in cursor.description)
+
+
+@functools.lru_cache(maxsize=256)
+def row_class(columns):
+    """
+    一组列名对应的行类 (带 __slots__ 的 dataclass)
+    列名必须是合法的标识符且不重复，表达式列和同名列请在 SQL 里用 AS 起别名
+    """
+    for name in columns:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f"列名 {name!r} 不能作为属性名，请在 SQL 中用 AS 起别名")
+    if len(set(columns)) != len(columns):
+        raise ValueError(f"查询结果中有重复的列名 {columns}，请在 SQL 中用 AS 起别名")
+    return make_dataclass("Row", columns, slots=True)
+
+
+def fetch_rows(cursor):
+    "查询结果转换为行对象列表，按属性读取"
+    cls = row_class(columns_of(cursor))
+    return [cls(*row) for row in cursor.fetchall()]
+
+
+def fetch_columns(cursor):
+    "按列返回查询结果 {列名: [值, ...]}"
+    columns = columns_of(cursor)
+    rows = cursor.fetchall()
+    if not rows:
+        return {name: [] for name in columns}
+    return {name: list(values) for name, values in zip(columns, zip(*rows))}
+
+
+def fetch_table(cursor):
+    """列名 + 原始行 {"columns": [...], "rows": [[...], ...]}"""
+    return {"columns": list(columns_of(cursor)), "rows": cursor.fetchall()}
+
+
+# 接口的 format 参数 -> 读取函数 (按对象返回时用 dict，见文件开头)
+FORMATS = {
+    "rows": dictfetchall,
+    "columns": fetch_columns,
+    "table": fetch_table,
+}
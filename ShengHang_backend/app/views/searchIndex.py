@@ -0,0 +1,362 @@
+# 搜索索引模块
+# 在进程内为歌曲 / 专辑 / 歌手 / 歌单名称建立 n-gram 倒排索引，
+# 代替 LIKE '%关键词%' 对整张表的扫描
+#
+# - 单字 + 二元组 (bigram) 建索引，中文标题不需要分词也能检索
+# - 首次使用时在后台线程里从数据库建索引，建好之前 (冷启动) 返回 None，由视图回退到 SQL LIKE
+# - 本进程的增删改通过 upsert / remove 立即维护
+# - 其他进程的修改经失效总线 (invalidationBus) 通知：收到 song:5 这样的标签后，在后台线程里从数据库重新读取这几条，
+#   读取完成之前这一类的搜索回退到 SQL，不会返回过期的结果；
+#   级联删除等无法逐条维护的修改调用 mark_stale，广播 search-index:<类型>，所有进程整类重建
+# - 超过 SEARCH_INDEX_MAX_AGE 秒后在后台重建一次，兜底漏掉的通知
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+
+from .invalidationBus import ALL, invalidation_bus
+
+
+# 每类对象的索引数据来源：(表, 主键, 被检索的名称)
+INDEX_SOURCES = {
+    "song": ("Song", "song_id", "song_title"),
+    "album": ("Album", "album_id", "album_title"),
+    "singer": ("Singer", "singer_id", "singer_name"),
+    "songlist": ("Songlist", "songlist_id", "songlist_title"),
+}
+
+# 整类重建的失效标签前缀
+STALE_TAG = "search-index"
+
+
+def source_sql(kind):
+    table, id_column, name_column = INDEX_SOURCES[kind]
+    return f"SELECT {id_column}, {name_column} FROM {table}"
+
+NGRAM_SIZE = 2
+
+# 建索引失败 (如数据库不可用) 后，间隔多少秒再重试
+BUILD_RETRY_INTERVAL = 30
+
+
+def normalize(text):
+    "统一大小写和首尾空白，近似 MySQL 默认排序规则下 LIKE 的大小写不敏感"
+    return (text or "").strip().lower()
+
+
+def ngrams(text):
+    "文本的所有单字和二元组"
+    grams = set(text)
+    for i in range(len(text) - NGRAM_SIZE + 1):
+        grams.add(text[i:i + NGRAM_SIZE])
+    return grams
+
+
+def query_grams(term):
+    "查询词用于求交集的 gram：单字查询用单字，否则用二元组 (更有区分度)"
+    if len(term) < NGRAM_SIZE:
+        return {term}
+    return {term[i:i + NGRAM_SIZE] for i in range(len(term) - NGRAM_SIZE + 1)}
+
+
+# ================================
+# 单类对象的倒排索引
+# ================================
+class InvertedIndex:
+    def __init__(self):
+        self.docs = {}          # id -> 归一化后的名称
+        self.postings = {}      # gram -> {id, ...}
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        text = normalize(text)
+        self.docs[doc_id] = text
+        for gram in ngrams(text):
+            self.postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        text = self.docs.pop(doc_id, None)
+        if text is None:
+            return
+        for gram in ngrams(text):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, term):
+        """
+        返回名称中包含 term 的 id 列表，按相关度排序：
+        完全相同 > 前缀匹配 > 其他位置匹配，同一档内匹配位置越靠前、名称越短越靠前
+        """
+        term = normalize(term)
+        if not term:
+            return []
+
+        # 先按 gram 求交集得到候选，从最短的倒排表开始
+        posting_lists = []
+        for gram in query_grams(term):
+            ids = self.postings.get(gram)
+            if not ids:
+                return []
+            posting_lists.append(ids)
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for ids in posting_lists[1:]:
+            candidates &= ids
+
+        # gram 全部命中不代表连续出现，再做一次子串校验，与 LIKE 语义保持一致
+        ranked = []
+        for doc_id in candidates:
+            text = self.docs[doc_id]
+            pos = text.find(term)
+            if pos < 0:
+                continue
+            tier = 0 if text == term else (1 if pos == 0 else 2)
+            ranked.append((tier, pos, len(text), doc_id))
+        ranked.sort()
+        return [doc_id for _, _, _, doc_id in ranked]
+
+
+# ================================
+# 进程内的全部索引
+# ================================
+class CatalogSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {}      # kind -> InvertedIndex (已建好的)
+        self._built_at = {}     # kind -> 建好的时间
+        self._building = set()  # 正在后台建的 kind
+        self._pending = {}      # kind -> 建索引期间收到的增量操作，建好后补上
+        self._generation = {}   # kind -> mark_stale 的次数，用于丢弃过期的建索引结果
+        self._failed_at = {}    # kind -> 上次建索引失败的时间，失败后一段时间内不再重试
+        self._to_refresh = {}   # kind -> {id, ...} 其他进程修改过、等待重新读取的对象
+        self._refreshing = {}   # kind -> {id, ...} 正在重新读取的对象
+        self._refresh_wakeup = threading.Event()
+        self._refresh_thread = None
+
+    # --------------------------
+    # 查询
+    # --------------------------
+    def search(self, kind, term):
+        """
+        :return: 按相关度排好序的 id 列表；
+                 索引未就绪、已关闭或命中数超过 SEARCH_INDEX_MAX_RESULTS 时返回 None，调用方应回退到 SQL
+        """
+        if not getattr(settings, "SEARCH_INDEX_ENABLED", True):
+            return None
+
+        with self._lock:
+            index = self._indexes.get(kind)
+            built_at = self._built_at.get(kind, 0)
+            refreshing = bool(self._to_refresh.get(kind) or self._refreshing.get(kind))
+
+        max_age = getattr(settings, "SEARCH_INDEX_MAX_AGE", 600)
+        if index is None or time.time() - built_at > max_age:
+            self._build_in_background(kind)
+        if index is None or refreshing:
+            return None
+
+        with self._lock:
+            ids = index.search(term)
+
+        if len(ids) > getattr(settings, "SEARCH_INDEX_MAX_RESULTS", 5000):
+            return None
+        return ids
+
+    # --------------------------
+    # 增量维护
+    # --------------------------
+    def upsert(self, kind, doc_id, text):
+        self._apply(kind, ("upsert", int(doc_id), text))
+
+    def remove(self, kind, doc_id):
+        self._apply(kind, ("remove", int(doc_id), None))
+
+    def mark_stale(self, *kinds):
+        "级联删除等无法逐条维护的修改：所有进程丢弃这几类索引 (回退 SQL) 并在后台重建"
+        invalidation_bus.publish({f"{STALE_TAG}:{kind}" for kind in kinds})
+
+    def _mark_stale(self, kinds):
+        with self._lock:
+            for kind in kinds:
+                self._indexes.pop(kind, None)
+                self._built_at.pop(kind, None)
+                self._generation[kind] = self._generation.get(kind, 0) + 1
+        for kind in kinds:
+            self._build_in_background(kind)
+
+    def _apply(self, kind, op):
+        with self._lock:
+            if kind in self._building:
+                self._pending.setdefault(kind, []).append(op)
+            index = self._indexes.get(kind)
+            if index is not None:
+                self._apply_op(index, op)
+
+    @staticmethod
+    def _apply_op(index, op):
+        action, doc_id, text = op
+        if action == "upsert":
+            index.add(doc_id, text)
+        else:
+            index.remove(doc_id)
+
+    # --------------------------
+    # 失效总线 (包括其他进程的修改)
+    # --------------------------
+    def invalidate(self, tags):
+        """
+        invalidation_bus 的订阅者
+        song:5 等对象标签：后台重新读取这几条；search-index:<类型> / ALL：整类重建
+        """
+        stale = set()
+        refresh = {}
+        for item in tags:
+            if item == ALL:
+                stale.update(INDEX_SOURCES)
+                continue
+            kind, _, value = item.partition(":")
+            if kind == STALE_TAG and value in INDEX_SOURCES:
+                stale.add(value)
+            elif kind in INDEX_SOURCES and value.isdigit():
+                refresh.setdefault(kind, set()).add(int(value))
+
+        if stale:
+            self._mark_stale(stale)
+        refresh = {kind: ids for kind, ids in refresh.items() if kind not in stale}
+        if not refresh:
+            return
+        with self._lock:
+            for kind, ids in refresh.items():
+                self._to_refresh.setdefault(kind, set()).update(ids)
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(target=self._run_refresh, name="search-index-refresh",
+                                                        daemon=True)
+                self._refresh_thread.start()
+        self._refresh_wakeup.set()
+
+    def _run_refresh(self):
+        while True:
+            self._refresh_wakeup.wait()
+            self._refresh_wakeup.clear()
+            with self._lock:
+                batch, self._to_refresh = self._to_refresh, {}
+                self._refreshing = batch
+            try:
+                for kind, ids in batch.items():
+                    self._refresh(kind, ids)
+            except Exception as e:
+                # 读不到最新数据时整类重建，重建好之前回退到 SQL
+                print(f"[SearchIndex] 更新索引失败，整类重建: {e}")
+                self._mark_stale(set(batch))
+            finally:
+                with self._lock:
+                    self._refreshing = {}
+                # 后台线程有自己的数据库连接，用完关闭
+                connection.close()
+
+    def _refresh(self, kind, ids):
+        "从数据库重新读取这些对象：存在的更新名称，不存在的 (已删除) 从索引中移除"
+        ids = sorted(ids)
+        _, id_column, _ = INDEX_SOURCES[kind]
+        with connection.cursor() as cursor:
+            cursor.execute(f"{source_sql(kind)} WHERE {id_column} IN ({', '.join(['%s'] * len(ids))})", ids)
+            found = dict(cursor.fetchall())
+        for doc_id in ids:
+            if doc_id in found:
+                self._apply(kind, ("upsert", doc_id, found[doc_id]))
+            else:
+                self._apply(kind, ("remove", doc_id, None))
+
+    # --------------------------
+    # 建索引
+    # --------------------------
+    def _build_in_background(self, kind):
+        with self._lock:
+            if kind in self._building:
+                return
+            if time.time() - self._failed_at.get(kind, 0) < BUILD_RETRY_INTERVAL:
+                return
+            self._building.add(kind)
+            self._pending[kind] = []
+        thread = threading.Thread(target=self._build, args=(kind,), daemon=True)
+        thread.start()
+
+    def _build(self, kind):
+        with self._lock:
+            generation = self._generation.get(kind, 0)
+
+        index = InvertedIndex()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(source_sql(kind))
+                for doc_id, text in cursor.fetchall():
+                    index.add(doc_id, text)
+        except Exception as e:
+            print(f"[SearchIndex] 建立 {kind} 索引失败: {e}")
+            with self._lock:
+                self._building.discard(kind)
+                self._pending.pop(kind, None)
+                self._failed_at[kind] = time.time()
+            return
+        finally:
+            # 后台线程有自己的数据库连接，用完关闭
+            connection.close()
+
+        with self._lock:
+            self._building.discard(kind)
+            pending = self._pending.pop(kind, [])
+            stale = self._generation.get(kind, 0) != generation
+            if not stale:
+                for op in pending:
+                    self._apply_op(index, op)
+                self._indexes[kind] = index
+                self._built_at[kind] = time.time()
+
+        # 建索引期间数据发生了级联修改，读到的快照可能已过期，重新建
+        if stale:
+            self._build_in_background(kind)
+
+
+search_index = CatalogSearchIndex()
+invalidation_bus.subscribe(search_index.invalidate)
+
+
+# ================================
+# 视图中使用的辅助函数
+# ================================
+def id_filter(column, ids):
+    "把索引返回的 id 列表转成 WHERE 条件"
+    if not ids:
+        return "1 = 0", []
+    return f"{column} IN ({', '.join(['%s'] * len(ids))})", list(ids)
+
+
+def match_filter(kind, term, id_column, like_column):
+    """
+    名称模糊匹配条件：索引可用时用 id IN (...)，否则回退到 LIKE
+    :return: (sql 片段, 参数, 按相关度排序的 id 列表或 None)
+    """
+    ids = search_index.search(kind, term)
+    if ids is None:
+        return f"{like_column} LIKE %s", [f"%{term}%"], None
+    sql, params = id_filter(id_column, ids)
+    return sql, params, ids
+
+
+def relevance_order(column, ranked_ids, last_values):
+    """
+    按相关度分页：游标中记录上一页最后一行的名次，本页只取名次在其之后的候选
+    :return: (WHERE 条件, 参数, ORDER BY 片段, 参数, {id: 名次})
+    """
+    start = last_values[0] + 1 if last_values else 0
+    candidates = ranked_ids[start:]
+    where_sql, where_params = id_filter(column, candidates)
+    if candidates:
+        order_sql = f"FIELD({column}, {', '.join(['%s'] * len(candidates))})"
+    else:
+        order_sql = column
+    ranks = {doc_id: start + i for i, doc_id in enumerate(candidates)}
+    return where_sql, where_params, order_sql, list(candidates), ranks
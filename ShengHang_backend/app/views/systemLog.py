@@ -0,0 +1,113 @@
+# 系统日志异步写入
+# 原先 add_system_log 在请求里同步 INSERT 一行，批量操作要多等好几次写库，写失败时只打印一行错误、日志就丢了。这里改为：
+#   - add_system_log / add_system_logs 只把日志放进延迟写队列 (同时落盘，见 writeBehind)，action_time 取调用时刻：
+#     写库时用数据库当前时间 NOW() 减去入队至今经过的时间，与原先 INSERT 时使用 NOW() 的时钟一致 (同 playBuffer)
+#   - 在事务中调用时，事务提交后才入队，回滚掉的操作不会留下日志
+#   - 后台线程攒够 SYSTEM_LOG_FLUSH_SIZE 条或每隔 SYSTEM_LOG_FLUSH_INTERVAL 秒写一次库，多行 INSERT
+#   - 队列最多 SYSTEM_LOG_MAX_PENDING 条，满了请求先阻塞等待写库 (背压)，超时后照常入队；
+#     数据库不可达时日志留在落盘文件中按退避间隔重试，进程重启后也会补写
+#   - 入队前按 SystemLog 的列校验：超长的文字截断，不是整数的 target_id 记为 NULL (原值写进 action)，
+#     保证一条日志不会因为数据本身写不进去；万一仍然写不进去，只有这一条移到死信文件 (见 writeBehind)
+import datetime
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+
+from app.models import SystemLog
+from .writeBehind import WriteBehindQueue
+
+
+# 单条 INSERT 语句最多插入的行数
+LOG_INSERT_BATCH_SIZE = 500
+
+# SystemLog.target_id 是 INT 列
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def flush_system_logs(items):
+    now = time.time()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT NOW(6)")
+            db_now = cursor.fetchone()[0]
+            for start in range(0, len(items), LOG_INSERT_BATCH_SIZE):
+                chunk = items[start:start + LOG_INSERT_BATCH_SIZE]
+                params = []
+                for item in chunk:
+                    if "ts" in item:
+                        action_time = db_now - datetime.timedelta(seconds=max(0.0, now - item["ts"]))
+                    else:
+                        # 旧版本落盘的日志直接带 action_time
+                        action_time = item["action_time"]
+                    params += [item["action"], item["target_table"], item["target_id"], item["result"],
+                               action_time]
+                cursor.execute(
+                    "INSERT INTO SystemLog (action, target_table, target_id, result, action_time) VALUES "
+                    + ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk)),
+                    params,
+                )
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_log_queue():
+    "首次使用时创建队列 (此时才读取配置并恢复落盘文件)"
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue(
+                    "system_log",
+                    flush_system_logs,
+                    interval=getattr(settings, "SYSTEM_LOG_FLUSH_INTERVAL", 1.0),
+                    max_size=getattr(settings, "SYSTEM_LOG_FLUSH_SIZE", 200),
+                    spill_dir=getattr(settings, "SYSTEM_LOG_SPILL_DIR", os.path.join(settings.BASE_DIR, "spill")),
+                    max_pending=getattr(settings, "SYSTEM_LOG_MAX_PENDING", 10000),
+                    block_timeout=getattr(settings, "SYSTEM_LOG_BLOCK_TIMEOUT", 0.5),
+                )
+    return _queue
+
+
+def _max_length(column):
+    return SystemLog._meta.get_field(column).max_length
+
+
+def _clean_entry(action, target_table, target_id, result):
+    "按 SystemLog 的列整理一条日志，返回可以直接写库的字段"
+    action = str(action)
+    if target_id is not None:
+        try:
+            value = int(target_id)
+        except (TypeError, ValueError):
+            value = None
+        if value is None or not INT_MIN <= value <= INT_MAX or isinstance(target_id, (bool, float)):
+            # 如客户端传来的非法 id：不写进 target_id，原值记在 action 里
+            action += f" (target_id={target_id!r})"
+            value = None
+        target_id = value
+    return {
+        "action": action[:_max_length("action")],
+        "target_table": None if target_table is None else str(target_table)[:_max_length("target_table")],
+        "target_id": target_id,
+        "result": str(result)[:_max_length("result")],
+    }
+
+
+def enqueue_logs(entries):
+    """
+    :param entries: [(action, target_table, target_id, result), ...]
+    """
+    now = time.time()
+    items = [{**_clean_entry(*entry), "ts": now} for entry in entries]
+
+    def put():
+        queue = get_log_queue()
+        for item in items:
+            queue.put(item)
+
+    # 不在事务中时立即执行
+    transaction.on_commit(put)
@@ -1,9 +1,16 @@
 # 存储各种工具方法
+import base64
 import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import connection
-from django.http import JsonResponse
+from django.http import HttpResponse
 import hashlib
 
+from .asyncDb import Query, run_sync
+from .fastJson import dumps
+from .systemLog import enqueue_logs
+
 # ================================
 # 工具函数
 # ================================
@@ -11,9 +18,9 @@ import hashlib
 def hash_password(pw: str) -> str:
     return hashlib.sha256(pw.encode('utf-8')).hexdigest()
 
-# 中文输出
+# 中文输出 (编码器见 fastJson，data 可以是已经编码好的 RawJSON)
 def json_cn(data, status=200):
-    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    return HttpResponse(dumps(data), status=status, content_type="application/json")
 
 # 管理员权限检查
 ADMIN_USER_ID = 1  # 可以改成实际管理员 id
@@ -45,6 +52,115 @@ def dictfetchall(cursor):
     ]
 
 
+# ============================================================
+# 辅助工具：批量查询多首歌曲的歌手
+# ============================================================
+# 单条 IN (...) 语句中 song_id 的最大个数，超过则分批查询
+SINGER_BATCH_SIZE = 1000
+
+def fetch_singers_by_song_ids(cursor, song_ids):
+    """
+    一次查出多首歌曲的歌手，避免在循环里逐首查询 (N+1)
+    查询次数为 ceil(去重后歌曲数 / SINGER_BATCH_SIZE)，与结果行数无关
+    :return: {song_id: [{"singer_id": .., "singer_name": ..}, ...]}，没有歌手的歌曲对应空列表
+    """
+    return run_sync(singers_plan(song_ids), cursor)
+
+def singers_plan(song_ids):
+    "fetch_singers_by_song_ids 的查询计划 (见 asyncDb)"
+    unique_ids = list(dict.fromkeys(song_ids))
+    singers = {song_id: [] for song_id in unique_ids}
+
+    for start in range(0, len(unique_ids), SINGER_BATCH_SIZE):
+        chunk = unique_ids[start:start + SINGER_BATCH_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        sql = f"""
+            SELECT ss.song_id, sg.singer_id, sg.singer_name
+            FROM Song_Singer ss
+            JOIN Singer sg ON sg.singer_id = ss.singer_id
+            WHERE ss.song_id IN ({placeholders})
+        """
+        for song_id, singer_id, singer_name in (yield Query(sql, chunk)):
+            singers[song_id].append({"singer_id": singer_id, "singer_name": singer_name})
+
+    return singers
+
+
+# ============================================================
+# 辅助工具：游标 (keyset) 分页
+# ============================================================
+# 不使用 OFFSET：游标中记录上一页最后一行的 (排序值, 主键)，
+# 下一页直接从该位置往后取，翻到第几页耗时都一样
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def get_page_size(data, default=DEFAULT_PAGE_SIZE):
+    "读取 page_size 参数，限制在 1 ~ MAX_PAGE_SIZE 之间"
+    try:
+        page_size = int(data.get("page_size", default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+def encode_cursor(order_key, values):
+    """
+    生成不透明的分页游标
+    :param order_key: 排序方式标识，如 "play_count:DESC"，防止游标被用于另一种排序
+    :param values: 上一页最后一行的 [排序值, 主键]
+    """
+    raw = json.dumps({"o": order_key, "k": values}, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token, order_key, rank=False):
+    """
+    解析分页游标，返回 [排序值, 主键]；token 为空返回 None
+    游标格式错误或与当前排序方式不一致时抛出 ValueError
+    :param rank: 排序值是相关度名次 (relevance_order)，必须是非负整数
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        values = payload["k"]
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if payload.get("o") != order_key or not isinstance(values, list) or len(values) != 2:
+        raise ValueError("分页游标与当前排序方式不匹配")
+    # 游标来自客户端，值的类型也要检查：排序值是标量，主键 / 名次是整数
+    sort_value, last_id = values
+    if not _is_int(last_id) or not (sort_value is None or isinstance(sort_value, (str, int, float))):
+        raise ValueError("无效的分页游标")
+    if rank and not (_is_int(sort_value) and sort_value >= 0):
+        raise ValueError("无效的分页游标")
+    return values
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def keyset_condition(sort_expr, id_expr, direction, last_values):
+    """
+    生成 "位于上一页最后一行之后" 的 WHERE 条件
+    排序必须是 ORDER BY sort_expr direction, id_expr direction
+    :return: (sql 片段, 参数列表)
+    """
+    op = "<" if direction == "DESC" else ">"
+    last_sort, last_id = last_values
+    sql = f"({sort_expr} {op} %s OR ({sort_expr} = %s AND {id_expr} {op} %s))"
+    return sql, [last_sort, last_sort, last_id]
+
+def split_page(rows, page_size, order_key, key_func):
+    """
+    查询时多取一行 (LIMIT page_size + 1) 用来判断是否还有下一页
+    :param key_func: 从一行中取出 [排序值, 主键]
+    :return: (本页数据, 下一页游标或 None)
+    """
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(order_key, key_func(rows[-1]))
+
+
 # 把秒转成 mm:ss 格式
 def format_time(sec):
     if sec is None:
@@ -55,22 +171,24 @@ def format_time(sec):
 # 通用日志记录函数
 def add_system_log(action, target_table=None, target_id=None, result='success'):
     """
+    记录系统日志，由后台线程批量写库 (见 systemLog)
     :param action: 操作具体内容，如 "添加歌手: 周杰伦"
     :param target_table: 操作的表名，如 "Singer"
     :param target_id: 操作的记录ID，如 10
     :param result: 'success' 或 'fail'
     """
-    try:
-        sql = """
-              INSERT INTO SystemLog (action, target_table, target_id, result, action_time)
-              VALUES (%s, %s, %s, %s, %s) \
-              """
-        now = datetime.datetime.now()
+    add_system_logs([(action, target_table, target_id, result)])
 
-        # 使用一个新的 cursor，防止干扰外部事务
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [action, target_table, target_id, result, now])
 
+def add_system_logs(entries):
+    """
+    批量记录系统日志
+    :param entries: [(action, target_table, target_id, result), ...]
+    """
+    if not entries:
+        return
+    try:
+        enqueue_logs(entries)
     except Exception as e:
         # 日志记录失败不应该影响主业务流程，所以这里只打印错误，不抛出异常
-        print(f"日志记录失败: {e}")
\ No newline at end of file
+        print(f"日志记录失败: {e}")
@@ -1,9 +1,15 @@
 # 用户管理模块
 from django.views.decorators.csrf import csrf_exempt
-from django.db import connection
+from django.db import connection, transaction
 import datetime
 import json
 from .tools import *
+from .searchIndex import search_index
+from .playRollup import delete_user_rollups
+from .favoriteLeaderboard import favorite_leaderboard, decrement_user_favorite_counts
+from .moderationQueue import dequeue_user_comments
+from .commentStats import uncount_user_comments
+from .likeBuffer import delete_user_like_records
 
 
 
@@ -250,8 +256,23 @@ def delete_account(request):
     # --------------------------
     sql_delete = "DELETE FROM User WHERE user_id = %s"
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_delete, [user_id])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # 收藏记录随账号一起删除，先把对应对象的收藏数减掉
+            decrement_user_favorite_counts(cursor, user_id)
+            # 评论随账号一起删除，先移出审核队列、从评论计数中减掉
+            dequeue_user_comments(cursor, user_id)
+            uncount_user_comments(cursor, user_id)
+            # 点赞记录没有外键约束，需要单独删除
+            delete_user_like_records(cursor, user_id)
+            cursor.execute(sql_delete, [user_id])
+            # 按天聚合的播放数据没有外键约束，需要单独删除
+            delete_user_rollups(cursor, user_id)
+
+    favorite_leaderboard.invalidate()
+
+    # 用户的歌单随账号一起删除，歌单索引需要重建
+    search_index.mark_stale("songlist")
 
     # --------------------------
     # 5. 注销 session
@@ -0,0 +1,304 @@
+# 延迟写 (write-behind) 缓冲队列
+# 请求里只把数据追加到内存队列，由后台线程按时间间隔或队列长度批量写入数据库
+#
+# - 入队的同时追加写入本地落盘文件 (spill file)，进程崩溃后重启时会把未写入数据库的数据补写
+# - 写库失败时数据留在队列和落盘文件中，下一轮重试
+# - 数据本身有问题 (外键不存在、超长等，见 DATA_ERRORS) 导致整批写入失败时，把这一批对半拆开分别重写，
+#   单独一条也写不进去的数据移到死信文件 ({name}.dead.jsonl)，不再重试，其余数据照常写入；
+#   因此 flush_func 必须是原子的 (整批在一个事务中，失败时全部回滚)
+# - 语义为 "至少一次"：写库成功后、清理落盘文件前崩溃，重启后这一批会被重复写入
+# - 可选的长度上限 (max_pending)：队列满时 put 先阻塞等待后台写库腾出空间 (背压)，
+#   超过 block_timeout 仍未腾出时照常入队 (数据已落盘，不丢弃)，只在统计里记一次溢出
+# - 写库连续失败 (如数据库不可达) 时后台线程按指数退避重试，数据留在内存和落盘文件中
+import atexit
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from django.db import DataError, IntegrityError, connection
+
+
+# 写库失败后的最长重试间隔 (秒)
+MAX_RETRY_BACKOFF = 60
+
+# 表示 "这批数据本身写不进去" 的异常，重试也不会成功；其他异常 (数据库不可达等) 整批留在队列中稍后重试
+DATA_ERRORS = (DataError, IntegrityError, KeyError, TypeError, ValueError)
+
+
+class WriteBehindQueue:
+    def __init__(self, name, flush_func, interval=2.0, max_size=500, spill_dir=None, tick_func=None,
+                 max_pending=None, block_timeout=1.0, data_errors=DATA_ERRORS):
+        """
+        :param name: 队列名称，用于落盘文件名和日志
+        :param flush_func: flush_func(items) 把一批数据写入数据库，抛出异常表示失败
+        :param interval: 两次写库之间的最长间隔 (秒)
+        :param max_size: 队列长度达到该值时立即写库
+        :param spill_dir: 落盘文件所在目录，为 None 时不落盘
+        :param tick_func: 后台线程每轮写库之后调用 (无论本轮有没有数据)，用于顺带执行的定期任务
+        :param max_pending: 队列长度上限，为 None 时不限制
+        :param block_timeout: 队列满时 put 最多等待多少秒
+        :param data_errors: 视为数据错误的异常类型，见 DATA_ERRORS
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.interval = interval
+        self.max_size = max_size
+        self.tick_func = tick_func
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.data_errors = data_errors
+
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()     # 同一时间只有一个线程在写库
+        self._items = []
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._failures = 0                      # 连续写库失败次数
+        self._overflows = 0                     # 队列满且等待超时的次数
+
+        self._spill_path = None
+        self._spill_file = None
+        self._dead_path = None
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spill_path = os.path.join(spill_dir, f"{name}.{os.getpid()}.jsonl")
+            self._dead_path = os.path.join(spill_dir, f"{name}.dead.jsonl")
+            self._recover(spill_dir)
+
+        atexit.register(self.flush)
+
+    # --------------------------
+    # 入队
+    # --------------------------
+    def put(self, item):
+        "item 必须能被 json 序列化"
+        with self._lock:
+            if self.max_pending is not None and len(self._items) >= self.max_pending:
+                self._wait_not_full()
+            self._items.append(item)
+            self._spill([item])
+            size = len(self._items)
+        self._ensure_thread()
+        if size >= self.max_size:
+            self._wakeup.set()
+
+    def _wait_not_full(self):
+        "队列已满：唤醒后台线程写库并等待腾出空间 (调用方持有锁)"
+        self._ensure_thread_locked()
+        self._wakeup.set()
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._items) >= self.max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._overflows += 1
+                if self._overflows == 1 or self._overflows % 1000 == 0:
+                    print(f"[WriteBehind] {self.name} 队列已满 ({len(self._items)} 条)，"
+                          f"累计溢出 {self._overflows} 次，数据已落盘不会丢失")
+                return
+            self._not_full.wait(remaining)
+
+    def pending(self):
+        with self._lock:
+            return len(self._items)
+
+    # --------------------------
+    # 写库
+    # --------------------------
+    def flush(self):
+        """
+        把当前队列中的数据全部写入数据库，返回写入条数
+        写不进去的单条数据移到死信文件；其他原因失败时未写入的数据放回队列，稍后重试
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._items
+                self._items = []
+            if not batch:
+                return 0
+
+            written, retry, dead = self._write(batch)
+            if dead:
+                self._dead_letter(dead)
+
+            with self._lock:
+                if retry:
+                    self._items = retry + self._items
+                    self._failures += 1
+                else:
+                    self._failures = 0
+                # 落盘文件中只保留还没写入的数据
+                if written or dead:
+                    self._rewrite_spill(self._items)
+                    self._not_full.notify_all()
+            return written
+
+    def _write(self, batch):
+        """
+        写入一批数据，数据错误时对半拆开分别写入，找出单独写也失败的数据
+        :return: (写入条数, 需要重试的数据, [(死信数据, 异常), ...])
+        """
+        written = 0
+        dead = []
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                self.flush_func(part)
+                written += len(part)
+            except self.data_errors as e:
+                if len(part) == 1:
+                    print(f"[WriteBehind] {self.name} 丢弃无法写入的数据 (已移到死信文件): {e}")
+                    dead.append((part[0], e))
+                else:
+                    mid = len(part) // 2
+                    parts += [part[mid:], part[:mid]]
+            except Exception as e:
+                print(f"[WriteBehind] {self.name} 写入 {len(part)} 条失败，稍后重试: {e}")
+                retry = part + [item for rest in reversed(parts) for item in rest]
+                return written, retry, dead
+        return written, [], dead
+
+    def _dead_letter(self, dead):
+        "追加写入死信文件，人工排查后可以修正再补写；不落盘的队列只打印"
+        if not self._dead_path:
+            for item, error in dead:
+                print(f"[WriteBehind] {self.name} 死信: {item!r} ({error})")
+            return
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with open(self._dead_path, "a", encoding="utf-8") as f:
+            for item, error in dead:
+                f.write(json.dumps({"item": item, "error": str(error), "time": now}, ensure_ascii=False) + "\n")
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            self._ensure_thread_locked()
+
+    def _ensure_thread_locked(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            if self._failures:
+                # 连续失败时按指数退避，数据库恢复前不反复重试
+                time.sleep(min(self.interval * 2 ** self._failures, MAX_RETRY_BACKOFF))
+            else:
+                self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if self.tick_func is not None:
+                    self.tick_func()
+            except Exception as e:
+                print(f"[WriteBehind] {self.name} 后台任务出错: {e}")
+            finally:
+                # 后台线程有自己的数据库连接，每轮用完关闭
+                connection.close()
+
+    # --------------------------
+    # 落盘文件
+    # --------------------------
+    def _spill(self, items):
+        if not self._spill_path:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self._spill_path, "a", encoding="utf-8")
+        for item in items:
+            self._spill_file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._spill_file.flush()
+
+    def _rewrite_spill(self, items):
+        if not self._spill_path:
+            return
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if not items:
+            if os.path.exists(self._spill_path):
+                os.remove(self._spill_path)
+            return
+        tmp_path = self._spill_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._spill_path)
+
+    def _recover(self, spill_dir):
+        """
+        接管已退出进程留下的落盘文件，把其中的数据重新入队
+        多个进程同时启动时可能都发现同一个文件：先把文件改名为带自己 pid 的认领文件
+        ({name}.{pid}.{随机串}.claim，rename 是原子的，只有一个进程能成功)，再读取；
+        认领后、补写前崩溃留下的认领文件，由下一个进程按认领者 pid 同样接管
+        """
+        prefix = f"{self.name}."
+        recovered = []
+        claimed = []
+        for filename in sorted(os.listdir(spill_dir)):
+            if not filename.startswith(prefix):
+                continue
+            rest = filename[len(prefix):]
+            if rest.endswith(".jsonl"):
+                pid = rest[:-len(".jsonl")]
+            elif rest.endswith(".claim"):
+                pid = rest.split(".", 1)[0]
+            else:
+                continue
+            if not pid.isdigit() or (int(pid) != os.getpid() and _process_alive(int(pid))):
+                continue
+
+            path = os.path.join(spill_dir, filename)
+            claim_path = os.path.join(spill_dir, f"{prefix}{os.getpid()}.{uuid.uuid4().hex}.claim")
+            try:
+                os.rename(path, claim_path)
+            except FileNotFoundError:
+                # 已被其他进程认领
+                continue
+            except OSError as e:
+                print(f"[WriteBehind] 认领落盘文件 {path} 出错: {e}")
+                continue
+            claimed.append(claim_path)
+            try:
+                with open(claim_path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError as e:
+                print(f"[WriteBehind] 读取落盘文件 {claim_path} 出错: {e}")
+                continue
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    recovered.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半，跳过该行，其余数据照常恢复
+                    print(f"[WriteBehind] 跳过落盘文件 {path} 中不完整的一行")
+
+        if recovered:
+            print(f"[WriteBehind] {self.name} 从落盘文件恢复 {len(recovered)} 条数据")
+            with self._lock:
+                self._items = recovered + self._items
+                self._rewrite_spill(self._items)
+            self._ensure_thread()
+        # 数据已写入自己的落盘文件，再删除认领文件
+        for claim_path in claimed:
+            try:
+                os.remove(claim_path)
+            except FileNotFoundError:
+                pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -261,10 +261,10 @@ const SonglistAPI = {
         method: 'POST'
     }),
 
-    // 搜索歌单
-    searchSonglist: (title) => apiRequest('/songlist/search_songlist/', {
+    // 搜索歌单 (cursor 为上一页返回的 next_cursor)
+    searchSonglist: (title, cursor = null) => apiRequest('/songlist/search_songlist/', {
         method: 'POST',
-        body: { songlist_title: title }
+        body: { songlist_title: title, cursor }
     }),
 
     // 点赞歌单
@@ -345,8 +345,10 @@ const CommentAPI = {
     }),
 
     // 获取目标的评论
-    getCommentsByTarget: (targetType, targetId, sortBy = 'time') => 
-        apiRequest(`/comment/get_comments_by_target/?target_type=${targetType}&target_id=${targetId}&sort_by=${sortBy}`, {
+    // cursor 为上一页返回的 next_cursor
+    getCommentsByTarget: (targetType, targetId, sortBy = 'time', cursor = null) => 
+        apiRequest(`/comment/get_comments_by_target/?target_type=${targetType}&target_id=${targetId}&sort_by=${sortBy}` +
+            (cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''), {
             method: 'GET'
         }),
 